@@ -0,0 +1,95 @@
+"""
+Micro-benchmark: filtrado de las series de Finnhub con el bucle original frente a series_window.
+
+Genera un payload sintético con la forma de /stock/metric (series annual y quarterly, puntos
+ordenados de más reciente a más antiguo, como los devuelve Finnhub), comprueba que los dos
+filtros dan el mismo resultado y mide el tiempo medio de cada uno.
+
+Uso:
+    python benchmark_series_window.py                 # 300 métricas x 120 puntos
+    python benchmark_series_window.py 1000 400 20     # métricas, puntos por serie, repeticiones
+"""
+from datetime import date, datetime, timedelta
+import sys
+import time
+
+from series_window import filtrar_series
+
+
+def filter_data_legacy(data: dict) -> dict:
+    # Copia del filtro anterior (filter_data_10_years) como referencia
+    if not isinstance(data, dict):
+        return data
+    ten_years = datetime.now() - timedelta(days=1825)
+    filter_data = {}
+    current_date = datetime.now()
+    for key, value in data.items():
+        if key == 'metric' and isinstance(value, dict):
+            filter_data[key] = value
+    for key, value in data.items():
+        if key == 'series' and isinstance(value, dict):
+            filter_data[key] = {}
+            for series_key, series_value in value.items():
+                if isinstance(series_value, dict):
+                    filter_data[key][series_key] = {}
+                    for third_key, third_value in series_value.items():
+                        if isinstance(third_value, list) and len(third_value) > 0:
+                            if isinstance(third_value[0], dict) and 'period' in third_value[0]:
+                                filter_list = []
+                                for item in third_value:
+                                    try:
+                                        data_period = datetime.strptime(item['period'], '%Y-%m-%d')
+                                        if ten_years <= data_period <= current_date:
+                                            filter_list.append(item)
+                                    except (ValueError, KeyError):
+                                        continue
+                                filter_data[key][series_key][third_key] = filter_list
+                            else:
+                                filter_data[key][series_key][third_key] = third_value
+                        else:
+                            filter_data[key][series_key][third_key] = third_value
+                else:
+                    filter_data[key][series_key] = series_value
+    return filter_data
+
+
+def payload_sintetico(metricas: int, puntos: int) -> dict:
+    hoy = date.today()
+    anual = [(hoy - timedelta(days=365 * i)).isoformat() for i in range(puntos)]
+    trimestral = [(hoy - timedelta(days=91 * i)).isoformat() for i in range(puntos)]
+    return {
+        "metric": {f"m{i}": float(i) for i in range(metricas)},
+        "series": {
+            "annual": {f"m{i}": [{"period": p, "v": float(j)} for j, p in enumerate(anual)] for i in range(metricas)},
+            "quarterly": {f"m{i}": [{"period": p, "v": float(j)} for j, p in enumerate(trimestral)] for i in range(metricas)},
+        },
+        "symbol": "TEST",
+    }
+
+
+def medir(funcion, data: dict, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(data)
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    metricas = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    puntos = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    repeticiones = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    data = payload_sintetico(metricas, puntos)
+    if filter_data_legacy(data) != filtrar_series(data, years=5):
+        raise SystemExit("Los dos filtros no devuelven lo mismo")
+
+    total = 2 * metricas * puntos
+    original = medir(filter_data_legacy, data, repeticiones)
+    nuevo = medir(lambda d: filtrar_series(d, years=5), data, repeticiones)
+    print(f"Payload: {metricas} métricas x 2 series x {puntos} puntos = {total} puntos")
+    print(f"Bucle original:  {original * 1000:8.2f} ms")
+    print(f"series_window:   {nuevo * 1000:8.2f} ms  ({original / nuevo:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
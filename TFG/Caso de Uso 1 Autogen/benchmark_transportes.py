@@ -0,0 +1,123 @@
+"""
+Prueba de carga: throughput de N análisis concurrentes con transporte stdio frente a HTTP.
+
+- stdio: cada análisis tiene su propio cliente y, por tanto, su propio proceso del servidor MCP
+  (igual que cada agente con MCP_TRANSPORT=stdio).
+- streamable-http: se arranca un único servidor HTTP y todos los análisis se conectan a él.
+
+Cada análisis repite las llamadas MCP del flujo del agente: list_tools, búsqueda del símbolo
+y extracción de datos de Finnhub (sin LLM). Sin FINHUB_API_KEY las tools devuelven error,
+pero el coste del transporte y del servidor se sigue midiendo.
+
+Uso:
+    python benchmark_transportes.py                # 8 análisis concurrentes de "Apple"
+    python benchmark_transportes.py 16 Apple Tesla Microsoft
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from mcp.client.stdio import StdioServerParameters
+from mcp_session import ENTORNO_SERVIDOR_STDIO, PersistentMCPSession
+
+server_params = StdioServerParameters(command="python", args=["-m", "server"], env=ENTORNO_SERVIDOR_STDIO)
+HOST = os.getenv("FASTMCP_HOST", "127.0.0.1")
+PORT = int(os.getenv("FASTMCP_PORT", "8000"))
+
+
+async def analisis(sesion: PersistentMCPSession, company: str) -> float:
+    inicio = time.perf_counter()
+    await sesion.arun(lambda session: session.list_tools())
+    resultado = await sesion.arun(
+        lambda session: session.call_tool("search_symbols_companys_USA_tool", {"company": company}))
+
+    symbol = company.upper()
+    try:
+        symbol = json.loads(resultado.content[0].text).get("symbol", symbol)
+    except (AttributeError, IndexError, TypeError, ValueError):
+        pass
+
+    await sesion.arun(
+        lambda session: session.call_tool("extract_financial_information_company_tool", {"symbol": symbol}))
+    return time.perf_counter() - inicio
+
+
+async def ejecutar_carga(sesiones: list, empresas: list) -> tuple:
+    inicio = time.perf_counter()
+    latencias = await asyncio.gather(*[
+        analisis(sesion, empresas[i % len(empresas)]) for i, sesion in enumerate(sesiones)
+    ])
+    return time.perf_counter() - inicio, latencias
+
+
+def esperar_puerto(host: str, port: int, timeout: float = 30) -> bool:
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def imprimir_resultados(nombre: str, total: float, latencias: list):
+    print(f"{nombre}")
+    print(f"  Análisis: {len(latencias)}")
+    print(f"  Tiempo total: {total:.2f} s")
+    print(f"  Throughput: {len(latencias) / total:.2f} análisis/s")
+    print(f"  Latencia media por análisis: {sum(latencias) / len(latencias):.2f} s")
+    print(f"  Latencia máxima: {max(latencias):.2f} s")
+
+
+def medir_stdio(num_analisis: int, empresas: list) -> tuple:
+    sesiones = [PersistentMCPSession(server_params) for _ in range(num_analisis)]
+    try:
+        return asyncio.run(ejecutar_carga(sesiones, empresas))
+    finally:
+        for sesion in sesiones:
+            sesion.close()
+
+
+def medir_http(num_analisis: int, empresas: list) -> tuple:
+    entorno = {**os.environ, "FASTMCP_HOST": HOST, "FASTMCP_PORT": str(PORT)}
+    servidor = subprocess.Popen([sys.executable, "-m", "server", "--transport", "streamable-http"], env=entorno,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sesiones = []
+    try:
+        if not esperar_puerto(HOST, PORT):
+            raise RuntimeError(f"El servidor HTTP no respondió en {HOST}:{PORT}")
+        # El servidor ya está caliente: se excluye su arranque, que solo se paga una vez
+        url = f"http://{HOST}:{PORT}/mcp"
+        sesiones = [PersistentMCPSession(transport="streamable-http", server_url=url)
+                    for _ in range(num_analisis)]
+        return asyncio.run(ejecutar_carga(sesiones, empresas))
+    finally:
+        for sesion in sesiones:
+            sesion.close()
+        servidor.terminate()
+        servidor.wait(timeout=10)
+
+
+def main():
+    num_analisis = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    empresas = sys.argv[2:] or ["Apple"]
+    print(f"{num_analisis} análisis concurrentes sobre: {', '.join(empresas)}\n")
+
+    total, latencias = medir_stdio(num_analisis, empresas)
+    imprimir_resultados("stdio (un servidor por cliente)", total, latencias)
+    throughput_stdio = len(latencias) / total
+
+    total, latencias = medir_http(num_analisis, empresas)
+    imprimir_resultados("streamable-http (servidor compartido)", total, latencias)
+    throughput_http = len(latencias) / total
+
+    print(f"\nThroughput HTTP / stdio: x{throughput_http / throughput_stdio:.1f}")
+
+
+if __name__ == "__main__":
+    main()
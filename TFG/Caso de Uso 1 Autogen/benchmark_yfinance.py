@@ -0,0 +1,67 @@
+"""
+Benchmark de yfinance: modo completo (ticker.info + histórico) frente a modo rápido
+(histórico de un año + fast_info.shares, sin ticker.info).
+
+Para cada símbolo se repite la descarga en los dos modos, alternándolos para que la caché de
+yfinance (cookie, crumb, zona horaria) no favorezca a ninguno, y se muestran la mediana y la
+media de cada modo y los campos que rellena cada uno. Necesita conexión a Internet.
+
+Uso:
+    python benchmark_yfinance.py                      # AAPL MSFT TSLA, 3 repeticiones
+    python benchmark_yfinance.py 5 AAPL NVDA KO       # repeticiones y símbolos
+"""
+import statistics
+import sys
+import time
+
+import yfinance as yf
+
+from price_history import descargar_historico, descargar_rapido
+
+CAMPOS = ("longName", "currentPrice", "volume", "averageVolume", "marketCap", "fiftyTwoWeekHigh",
+          "fiftyTwoWeekLow", "profitMargins", "returnOnEquity", "revenueGrowth")
+
+
+def modo_completo(symbol: str) -> dict:
+    ticker = yf.Ticker(symbol)
+    info = ticker.info
+    descargar_historico(ticker)
+    return info
+
+
+def modo_rapido(symbol: str) -> dict:
+    info, _ = descargar_rapido(yf.Ticker(symbol))
+    return info
+
+
+def medir(funcion, symbol: str) -> tuple:
+    inicio = time.perf_counter()
+    info = funcion(symbol)
+    return time.perf_counter() - inicio, info
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    symbols = sys.argv[2:] or ["AAPL", "MSFT", "TSLA"]
+
+    # Primera llamada fuera de la medida: cookie y crumb de Yahoo
+    modo_completo(symbols[0])
+
+    tiempos = {"completo": [], "rápido": []}
+    campos = {}
+    for _ in range(repeticiones):
+        for symbol in symbols:
+            for nombre, funcion in (("completo", modo_completo), ("rápido", modo_rapido)):
+                segundos, info = medir(funcion, symbol)
+                tiempos[nombre].append(segundos)
+                campos[nombre] = sum(info.get(campo) is not None for campo in CAMPOS)
+
+    for nombre, valores in tiempos.items():
+        print(f"{nombre:9s} mediana {statistics.median(valores) * 1000:7.0f} ms  "
+              f"media {statistics.mean(valores) * 1000:7.0f} ms  "
+              f"campos {campos[nombre]}/{len(CAMPOS)}")
+    print(f"Aceleración (mediana): {statistics.median(tiempos['completo']) / statistics.median(tiempos['rápido']):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Proyección de campos sobre la respuesta de Finnhub /stock/metric.
+
+metric=all devuelve más de cien claves en "metric" y decenas de series, y todo acababa en el
+contexto del LLM aunque el agente solo necesitara los ratios de valoración. Con fields se pide
+solo lo que se va a usar, como grupos de métricas o claves concretas:
+    "valuation"                     grupo predefinido (ver GRUPOS)
+    "valuation,leverage"            varios grupos separados por comas
+    "peTTM,roeTTM"                  claves exactas de "metric" o nombres de series
+    "roe*"                          patrones con * y ?
+Cada grupo incluye las claves de "metric" y los nombres de las series equivalentes, así que la
+proyección se aplica a la vez a "metric", "series" y a la tabla "features". El resto de campos
+de la respuesta (symbol, metricType) se mantienen. Sin fields la respuesta no cambia.
+"""
+from fnmatch import fnmatchcase
+from typing import Iterable, Optional, Union
+
+# Grupos de métricas: claves de "metric" y nombres de series de Finnhub
+GRUPOS = {
+    "valuation": (
+        "marketCapitalization", "enterpriseValue", "peTTM", "peAnnual", "peExclExtraTTM", "peBasicExclExtraTTM",
+        "peNormalizedAnnual", "pbAnnual", "pbQuarterly", "psTTM", "psAnnual", "ptbvAnnual", "ptbvQuarterly",
+        "pcfShareTTM", "pcfShareAnnual", "pfcfShareTTM", "pfcfShareAnnual", "currentEv/freeCashFlowTTM",
+        "currentEv/freeCashFlowAnnual", "evEbitdaTTM", "evRevenueTTM", "pe", "pb", "ps", "ev", "pfcf",
+        "ptbv", "evEbitda", "evRevenue",
+    ),
+    "profitability": (
+        "grossMarginTTM", "grossMargin5Y", "grossMarginAnnual", "operatingMarginTTM", "operatingMargin5Y",
+        "operatingMarginAnnual", "netProfitMarginTTM", "netProfitMargin5Y", "netProfitMarginAnnual",
+        "pretaxMarginTTM", "pretaxMargin5Y", "pretaxMarginAnnual", "roeTTM", "roe5Y", "roeRfy", "roaTTM",
+        "roa5Y", "roaRfy", "roiTTM", "roi5Y", "roiAnnual", "epsTTM", "epsAnnual", "epsBasicExclExtraItemsTTM",
+        "grossMargin", "operatingMargin", "netMargin", "pretaxMargin", "fcfMargin", "roe", "roa", "roic",
+        "rotc", "eps",
+    ),
+    "growth": (
+        "epsGrowth3Y", "epsGrowth5Y", "epsGrowthTTMYoy", "epsGrowthQuarterlyYoy", "revenueGrowth3Y",
+        "revenueGrowth5Y", "revenueGrowthTTMYoy", "revenueGrowthQuarterlyYoy", "bookValueShareGrowth5Y",
+        "tbvCagr5Y", "focfCagr5Y", "ebitdaCagr5Y", "ebitdaInterimCagr5Y", "capexCagr5Y", "netMarginGrowth5Y",
+        "dividendGrowthRate5Y",
+    ),
+    "leverage": (
+        "totalDebt/totalEquityAnnual", "totalDebt/totalEquityQuarterly", "longTermDebt/equityAnnual",
+        "longTermDebt/equityQuarterly", "netInterestCoverageTTM", "netInterestCoverageAnnual",
+        "totalDebtToEquity", "totalDebtToTotalAsset", "totalDebtToTotalCapital", "longtermDebtTotalEquity",
+        "longtermDebtTotalAsset", "longtermDebtTotalCapital", "netDebtToTotalEquity", "netDebtToTotalCapital",
+    ),
+    "liquidity": (
+        "currentRatioAnnual", "currentRatioQuarterly", "quickRatioAnnual", "quickRatioQuarterly",
+        "cashFlowPerShareTTM", "cashFlowPerShareAnnual", "cashPerSharePerShareAnnual",
+        "cashPerSharePerShareQuarterly", "currentRatio", "quickRatio", "cashRatio",
+    ),
+    "efficiency": (
+        "assetTurnoverTTM", "assetTurnoverAnnual", "inventoryTurnoverTTM", "inventoryTurnoverAnnual",
+        "receivablesTurnoverTTM", "receivablesTurnoverAnnual", "revenueEmployeeTTM", "netIncomeEmployeeTTM",
+        "assetTurnover", "inventoryTurnover", "receivablesTurnover", "payablesTurnover", "ccc", "dso", "dio", "dpo",
+    ),
+    "dividends": (
+        "dividendYieldIndicatedAnnual", "currentDividendYieldTTM", "dividendPerShareAnnual",
+        "dividendPerShareTTM", "dividendIndicatedAnnual", "payoutRatioTTM", "payoutRatioAnnual",
+        "dividendGrowthRate5Y", "payoutRatio",
+    ),
+    "market": (
+        "beta", "52WeekHigh", "52WeekLow", "52WeekHighDate", "52WeekLowDate", "52WeekPriceReturnDaily",
+        "13WeekPriceReturnDaily", "26WeekPriceReturnDaily", "5DayPriceReturnDaily", "monthToDatePriceReturnDaily",
+        "yearToDatePriceReturnDaily", "priceRelativeToS&P50013Week", "priceRelativeToS&P50026Week",
+        "priceRelativeToS&P50052Week", "priceRelativeToS&P500Ytd", "10DayAverageTradingVolume",
+        "3MonthAverageTradingVolume", "3MonthADReturnStd",
+    ),
+}
+
+
+def _peticiones(fields: Union[str, Iterable[str], None]) -> list:
+    if fields is None:
+        return []
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return [campo.strip() for campo in fields if campo and campo.strip()]
+
+
+def seleccion(fields: Union[str, Iterable[str], None]) -> Optional[tuple]:
+    """
+    (claves exactas, patrones) pedidos en fields, con los grupos ya expandidos; None si no se ha
+    pedido ninguna proyección.
+    """
+    peticiones = _peticiones(fields)
+    if not peticiones:
+        return None
+    claves, patrones = set(), []
+    for peticion in peticiones:
+        if peticion.lower() in GRUPOS:
+            claves.update(GRUPOS[peticion.lower()])
+        elif any(comodin in peticion for comodin in "*?["):
+            patrones.append(peticion)
+        else:
+            claves.add(peticion)
+    return claves, tuple(patrones)
+
+
+def necesita_detalle(fields: Union[str, Iterable[str], None]) -> bool:
+    """
+    True si se piden fundamentales (cualquier cosa fuera del grupo "market"): en el modo rápido de
+    yfinance, el respaldo de Yahoo Finance tiene que pedir entonces ticker.info (detalle=True).
+    """
+    return any(peticion.lower() != "market" for peticion in _peticiones(fields))
+
+
+def _incluida(clave: str, claves: set, patrones: tuple) -> bool:
+    return clave in claves or any(fnmatchcase(clave, patron) for patron in patrones)
+
+
+def _filtrar(valores: dict, claves: set, patrones: tuple) -> dict:
+    return {clave: valor for clave, valor in valores.items() if _incluida(clave, claves, patrones)}
+
+
+def proyectar(data: dict, fields: Union[str, Iterable[str], None]) -> dict:
+    """Copia de la respuesta de Finnhub con solo los campos pedidos en "metric", "series" y "features"."""
+    filtro = seleccion(fields)
+    if filtro is None or not isinstance(data, dict):
+        return data
+    claves, patrones = filtro
+
+    resultado = dict(data)
+    if isinstance(data.get("metric"), dict):
+        resultado["metric"] = _filtrar(data["metric"], claves, patrones)
+    if isinstance(data.get("series"), dict):
+        resultado["series"] = {frecuencia: _filtrar(metricas, claves, patrones) if isinstance(metricas, dict) else metricas
+                               for frecuencia, metricas in data["series"].items()}
+    if isinstance(data.get("features"), dict):
+        resultado["features"] = {
+            frecuencia: {**tabla, "metricas": _filtrar(tabla.get("metricas", {}), claves, patrones)}
+            if isinstance(tabla, dict) else tabla
+            for frecuencia, tabla in data["features"].items()
+        }
+    return resultado
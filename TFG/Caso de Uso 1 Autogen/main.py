@@ -51,13 +51,17 @@ def get_system_message() -> str:
 
         2. **extract_financial_information_company_tool**
         - Descripción: Dado un símbolo bursátil, extrae los datos financieros completos de la empresa.
-        - Parámetros: {"symbol": "Símbolo bursátil de la empresa"}
+        - Parámetros: {"symbol": "Símbolo bursátil de la empresa", "fields": "opcional: grupos (valuation, profitability, growth, leverage, liquidity, efficiency, dividends, market) o claves separados por comas"}
 
         3. **extract_information_company_yfinance_tool**
         - Descripción: Dado un símbolo bursátil, extrae información financiera utilizando la API de Yahoo Finance.
         - Parámetros: {"symbol": "Símbolo bursátil de la empresa"}
 
-        4. **transform_data_to_pdf_tool**
+        4. **extract_financial_data_combined_tool**
+        - Descripción: Dado un símbolo bursátil, consulta Finnhub y Yahoo Finance en paralelo y devuelve un único registro con el proveedor usado ("source") y sus datos ("finnhub" o "yfinance").
+        - Parámetros: {"symbol": "Símbolo bursátil de la empresa", "fields": "opcional, como en extract_financial_information_company_tool", "max_points": "opcional: sesiones como máximo del histórico de precios"}
+
+        5. **transform_data_to_pdf_tool**
         - Descripción: Transforma los datos financieros obtenidos en un informe PDF.
         - Parámetros: {"data": dict con el análisis detallado. Ejemplo:
             {
@@ -77,11 +81,12 @@ def get_system_message() -> str:
 
         FLUJO OBLIGATORIO:
         1. Buscar símbolo con search_symbols_companys_USA_tool
-        2. Extraer datos con extract_financial_information_company_tool y si no funciona, utilizar extract_information_company_yfinance_tool.
+        2. Extraer datos con extract_financial_data_combined_tool (Finnhub con Yahoo Finance como respaldo, en una sola llamada).
         3. Realizar análisis completo basado en los datos obtenidos, incluyendo:
             - Evaluar métricas financieras clave
-           - Identificar tendencias y patrones
-           - Calcular ratios importantes
+           - Identificar tendencias y patrones a partir de la tabla "features" de Finnhub (CAGR, YoY, QoQ, pendiente de la tendencia, volatilidad y cv por serie; ya vienen calculados, no los recalcules)
+           - Con datos de Yahoo Finance, usar el resumen "indicators" (medias móviles, RSI, ATR, volatilidad, drawdown máximo y beta frente al índice) en lugar de recorrer "historical_prices"
+           - Usar los ratios importantes de "metric"
            - Dar recomendación de inversión (1-10)
            - Justificar tu recomendación
         4. CREAR un diccionario con TU ANÁLISIS (NO los datos brutos):
@@ -182,7 +187,10 @@ async def main():
         "Busca su símbolo bursátil, extrae sus datos financieros y genera un informe claro y muy detallado con SOLO tu analisis de la empresas."
     )
 
-    await executor.a_initiate_chat(assistant, message=prompt, max_turns=10) #Esta función inicia una conversación entre el usuario y el asistente, pasando un mensaje inicial y estableciendo un límite de turnos.
+    try:
+        await executor.a_initiate_chat(assistant, message=prompt, max_turns=10) #Esta función inicia una conversación entre el usuario y el asistente, pasando un mensaje inicial y estableciendo un límite de turnos.
+    finally:
+        assistant.close_mcp_session() # Cierra la sesión MCP persistente y el proceso del servidor
 
 if __name__ == "__main__":
     process = psutil.Process()
@@ -0,0 +1,202 @@
+from mcp.client.session import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client, StdioServerParameters
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+from typing import Any, Awaitable, Callable, Optional
+
+import anyio
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+
+# Transportes soportados (los mismos nombres que acepta FastMCP.run en el servidor)
+TRANSPORTES_MCP = ("stdio", "streamable-http", "sse")
+URL_POR_DEFECTO = {
+    "streamable-http": "http://127.0.0.1:8000/mcp",
+    "sse": "http://127.0.0.1:8000/sse",
+}
+# Entorno de los servidores lanzados por stdio. load_dotenv() no pisa variables ya definidas, así que el servidor
+# hijo no puede coger del .env un transporte HTTP y dejar al cliente esperando en stdio
+ENTORNO_SERVIDOR_STDIO = {"MCP_SERVER_TRANSPORT": "stdio", "MCP_TRANSPORT": "stdio"}
+
+
+class PersistentMCPSession:
+    """
+    Sesión MCP de larga duración.
+    Arranca el servidor MCP la primera vez que se usa (de forma perezosa) y reutiliza la misma
+    ClientSession en todas las llamadas, en lugar de lanzar un proceso nuevo por cada llamada.
+    La sesión vive en un hilo propio con su event loop, así que se puede usar tanto desde
+    código síncrono como asíncrono. Si la conexión falla, se reconecta automáticamente.
+
+    Con transport="stdio" el servidor es un proceso privado de este cliente. Con "streamable-http"
+    o "sse" se conecta a un servidor ya arrancado en server_url, compartido por muchos agentes.
+    """
+
+    def __init__(
+        self,
+        server_params: Optional[StdioServerParameters] = None,
+        transport: str = "stdio",
+        server_url: Optional[str] = None,
+        max_reintentos: int = 1,
+    ):
+        if transport not in TRANSPORTES_MCP:
+            raise ValueError(f"Transporte MCP no soportado: {transport}. Usa uno de {TRANSPORTES_MCP}")
+        if transport == "stdio" and server_params is None:
+            raise ValueError("El transporte stdio necesita server_params")
+
+        self.server_params = server_params
+        self.transport = transport
+        self.server_url = server_url or URL_POR_DEFECTO.get(transport)
+        self.max_reintentos = max_reintentos  # Número de reconexiones por llamada si falla la sesión
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._atexit_registrado = False  # close() se registra una sola vez aunque el loop se recree
+
+        # Estos atributos solo se usan desde el hilo del event loop
+        self._session: Optional[ClientSession] = None
+        self._owner_task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    # ------------------------------------------------------------------
+    # Event loop en segundo plano
+    # ------------------------------------------------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._thread_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="mcp-session", daemon=True)
+                self._thread.start()
+                if not self._atexit_registrado:
+                    atexit.register(self.close)
+                    self._atexit_registrado = True
+            return self._loop
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida de la conexión (se ejecuta dentro del loop)
+    # ------------------------------------------------------------------
+    def _open_transport(self):
+        # Devuelve el context manager del transporte que conecta con el servidor MCP
+        if self.transport == "streamable-http":
+            return streamablehttp_client(self.server_url)
+        if self.transport == "sse":
+            return sse_client(self.server_url)
+        return stdio_client(self.server_params)
+
+    async def _hold_session(self, ready: asyncio.Future, stop_event: asyncio.Event):
+        # El transporte y ClientSession deben abrirse y cerrarse en la misma tarea,
+        # por eso esta tarea mantiene los contextos abiertos hasta que se pide cerrar.
+        try:
+            async with self._open_transport() as streams:
+                read, write = streams[0], streams[1]
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self._session = session
+                    ready.set_result(session)
+                    await stop_event.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"Conexión MCP cerrada con error: {e}")
+        finally:
+            self._session = None
+
+    async def _ensure_session(self) -> ClientSession:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._session is not None:
+                return self._session
+
+            ready = asyncio.get_running_loop().create_future()
+            self._stop_event = asyncio.Event()
+            self._owner_task = asyncio.create_task(
+                self._hold_session(ready, self._stop_event))
+            return await ready
+
+    async def _disconnect(self):
+        owner_task, stop_event = self._owner_task, self._stop_event
+        self._owner_task = None
+        self._stop_event = None
+        self._session = None
+        if stop_event is not None:
+            stop_event.set()
+        if owner_task is not None:
+            try:
+                await asyncio.wait_for(owner_task, timeout=10)
+            except Exception:
+                owner_task.cancel()
+
+    def _es_error_de_conexion(self, error: Exception) -> bool:
+        # Distingue una conexión caída (hay que reconectar) de un error normal de la tool
+        if isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, OSError)):
+            return True
+        if isinstance(error, McpError) and error.error.code == CONNECTION_CLOSED:
+            return True
+        return self._owner_task is None or self._owner_task.done()
+
+    async def _run(self, operation: Callable[[ClientSession], Awaitable[Any]]) -> Any:
+        for intento in range(self.max_reintentos + 1):
+            session = await self._ensure_session()
+            try:
+                return await operation(session)
+            except Exception as e:
+                if intento >= self.max_reintentos or not self._es_error_de_conexion(e):
+                    raise
+                # La sesión se ha caído: se descarta y se vuelve a conectar
+                print(f"Sesión MCP perdida ({type(e).__name__}: {e}), reconectando...")
+                if self._session is session or self._session is None:
+                    await self._disconnect()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def submit(self, operation: Callable[[ClientSession], Awaitable[Any]]) -> concurrent.futures.Future:
+        """Envía una operación sobre la sesión al loop de fondo y devuelve un Future."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._run(operation), loop)
+
+    def run(self, operation: Callable[[ClientSession], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Ejecuta una operación sobre la sesión y espera el resultado (uso síncrono)."""
+        return self.submit(operation).result(timeout)
+
+    async def arun(self, operation: Callable[[ClientSession], Awaitable[Any]]) -> Any:
+        """Ejecuta una operación sobre la sesión desde otro event loop (uso asíncrono)."""
+        return await asyncio.wrap_future(self.submit(operation))
+
+    def call_tool(self, name: str, args: dict, timeout: Optional[float] = None) -> Any:
+        return self.run(lambda session: session.call_tool(name, args), timeout)
+
+    def list_tools(self, timeout: Optional[float] = None) -> Any:
+        return self.run(lambda session: session.list_tools(), timeout)
+
+    def read_resource(self, uri: str, timeout: Optional[float] = None) -> Any:
+        return self.run(lambda session: session.read_resource(uri), timeout)
+
+    def close(self):
+        """Cierra la sesión (y el servidor MCP si es stdio) y detiene el hilo del loop."""
+        with self._thread_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if loop is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._disconnect(), loop).result(timeout=15)
+        except Exception as e:
+            print(f"Error cerrando la sesión MCP: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+        self._connect_lock = None
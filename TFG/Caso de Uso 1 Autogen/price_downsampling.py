@@ -0,0 +1,120 @@
+"""
+Reducción del histórico de precios a un número máximo de puntos.
+
+Con periodos largos (YFINANCE_HISTORY_PERIOD=1y, 5y...) historical_prices tiene cientos o miles
+de sesiones, que llenan el contexto del LLM y no caben en un gráfico del PDF. Aquí se eligen como
+mucho N sesiones conservando los picos y los valles del cierre:
+- "lttb" (Largest-Triangle-Three-Buckets): divide la serie en N - 2 grupos y de cada uno toma
+  la sesión que forma el triángulo de mayor área con la elegida en el grupo anterior y la media
+  del siguiente. Es el que mejor conserva la forma visual.
+- "minmax": divide la serie en N / 2 grupos y toma el mínimo y el máximo de cada uno, en orden.
+  Garantiza que están todos los extremos locales.
+En los dos se conservan siempre la primera y la última sesión, y las filas elegidas se copian
+enteras (fecha, OHLC y volumen), así que el resultado sigue siendo un HistoricalPrices válido.
+
+El límite se configura con YFINANCE_MAX_POINTS (0 para no reducir) y YFINANCE_DOWNSAMPLING, y se
+puede cambiar en cada llamada a la tool (max_points). El gráfico de precios del PDF usa la misma
+reducción con PDF_CHART_POINTS puntos.
+"""
+from dotenv import load_dotenv
+from typing import Optional
+import os
+
+import numpy as np
+
+load_dotenv()
+
+# Configuración de la reducción (se puede ajustar en el .env)
+YFINANCE_MAX_POINTS = int(os.getenv("YFINANCE_MAX_POINTS", "120"))  # Sesiones como máximo en historical_prices
+YFINANCE_DOWNSAMPLING = os.getenv("YFINANCE_DOWNSAMPLING", "lttb").lower()  # "lttb" o "minmax"
+PDF_CHART_POINTS = int(os.getenv("PDF_CHART_POINTS", "200"))  # Puntos del gráfico de precios del PDF
+
+METODOS = ("lttb", "minmax")
+
+
+def _limites(n: int, grupos: int) -> np.ndarray:
+    # Bordes de grupos de tamaño casi igual sobre las posiciones [1, n - 1) (sin la primera ni la última)
+    return np.linspace(1, n - 1, grupos + 1).astype("int64")
+
+
+def indices_lttb(x: np.ndarray, y: np.ndarray, puntos: int) -> np.ndarray:
+    """Posiciones elegidas por LTTB (ordenadas, con la primera y la última)."""
+    n = len(y)
+    if puntos >= n or puntos < 3:
+        return np.arange(n) if puntos >= n else np.array([0, n - 1])[:max(puntos, 0)]
+
+    bordes = _limites(n, puntos - 2)
+    # Media de cada grupo (x, y) de una vez; para el último grupo el "siguiente" es la última sesión
+    tamaños = np.diff(bordes)
+    media_x = np.add.reduceat(x[1:n - 1], bordes[:-1] - 1) / tamaños
+    media_y = np.add.reduceat(y[1:n - 1], bordes[:-1] - 1) / tamaños
+    siguiente_x = np.append(media_x[1:], x[-1])
+    siguiente_y = np.append(media_y[1:], y[-1])
+
+    elegidos = np.empty(puntos, dtype="int64")
+    elegidos[0], elegidos[-1] = 0, n - 1
+    anterior = 0
+    # Cada grupo depende del punto elegido en el anterior, así que se recorren los grupos; dentro de
+    # cada uno, el área de todos los candidatos se calcula a la vez
+    for g in range(puntos - 2):
+        inicio, fin = bordes[g], bordes[g + 1]
+        area = np.abs((x[anterior] - siguiente_x[g]) * (y[inicio:fin] - y[anterior])
+                      - (x[anterior] - x[inicio:fin]) * (siguiente_y[g] - y[anterior]))
+        anterior = inicio + int(np.argmax(area))
+        elegidos[g + 1] = anterior
+    return elegidos
+
+
+def indices_minmax(y: np.ndarray, puntos: int) -> np.ndarray:
+    """Posiciones del mínimo y el máximo de cada grupo (ordenadas, con la primera y la última)."""
+    n = len(y)
+    if puntos >= n or puntos < 4:
+        return np.arange(n) if puntos >= n else np.array([0, n - 1])[:max(puntos, 0)]
+
+    grupos = (puntos - 2) // 2
+    bordes = _limites(n, grupos)
+    posiciones = np.arange(1, n - 1)
+    grupo = np.searchsorted(bordes, posiciones, side="right") - 1
+    # Orden por (grupo, valor): el primero de cada grupo es el mínimo y el último el máximo
+    orden = np.lexsort((y[1:n - 1], grupo))
+    inicios = np.searchsorted(grupo[orden], np.arange(grupos))
+    finales = np.searchsorted(grupo[orden], np.arange(grupos), side="right") - 1
+    elegidos = np.concatenate([[0], posiciones[orden[inicios]], posiciones[orden[finales]], [n - 1]])
+    return np.unique(elegidos)
+
+
+def reducir_historico(historico: Optional[dict], puntos: int = None, metodo: str = None) -> Optional[dict]:
+    """
+    Devuelve el histórico en columnas ({"dates", "open", ..., "volume"}) con como mucho `puntos`
+    sesiones, elegidas sobre el cierre. No modifica el original; si ya cabe, lo devuelve tal cual.
+    """
+    puntos = YFINANCE_MAX_POINTS if puntos is None else puntos
+    metodo = (metodo or YFINANCE_DOWNSAMPLING).lower()
+    if not historico or puntos <= 0 or len(historico.get("dates", [])) <= puntos:
+        return historico
+    if metodo not in METODOS:
+        raise ValueError(f"Método de reducción desconocido: {metodo} (usa {', '.join(METODOS)})")
+
+    n = len(historico["dates"])
+    cierre = np.array([np.nan if v is None else v for v in historico.get("close", [])], dtype="float64")
+    if len(cierre) != n:
+        return historico
+    # Los huecos se rellenan con el último cierre conocido para que no ganen ni pierdan en el área
+    validos = ~np.isnan(cierre)
+    if not validos.any():
+        return historico
+    ultimo_valido = np.maximum.accumulate(np.where(validos, np.arange(n), 0))
+    cierre = cierre[ultimo_valido]
+    cierre[np.isnan(cierre)] = cierre[validos][0]
+
+    if metodo == "lttb":
+        elegidos = indices_lttb(np.arange(n, dtype="float64"), cierre, puntos)
+    else:
+        elegidos = indices_minmax(cierre, puntos)
+    return {campo: [valores[i] for i in elegidos] if isinstance(valores, list) and len(valores) == n else valores
+            for campo, valores in historico.items()}
+
+
+def es_historico(valor) -> bool:
+    """True si el valor tiene la forma de HistoricalPrices en columnas (para el PDF)."""
+    return isinstance(valor, dict) and isinstance(valor.get("dates"), list) and isinstance(valor.get("close"), list)
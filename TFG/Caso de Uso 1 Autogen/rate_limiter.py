@@ -0,0 +1,323 @@
+"""
+Limitador de peticiones por proveedor (token bucket) para Finnhub y NewsAPI.
+
+Los planes gratuitos tienen cuotas por minuto muy estrictas. Con muchos análisis concurrentes
+las peticiones se disparan a la vez, llegan los 429 y los agentes gastan turnos del LLM
+reaccionando a mensajes de error. Cada proveedor tiene un bucket compartido por todas las
+funciones del proceso:
+- Las peticiones esperan en una cola con prioridad (PRIORIDAD_ALTA antes que PRIORIDAD_BAJA, y
+  por orden de llegada dentro de la misma prioridad).
+- Ante un 429 se vacía el bucket durante el Retry-After (o un backoff exponencial con jitter)
+  para que el resto de peticiones también esperen, y la petición se reintenta.
+- Con RATE_LIMIT_SHARED=true el estado del bucket vive en SQLite y lo comparten todos los
+  procesos (varios servidores MCP, análisis en lote...). Desde asyncio, cada intento de coger
+  token se hace en un hilo para no parar el event loop mientras SQLite espera el bloqueo.
+- Se guardan métricas del tiempo de espera en cola, de los 429 y de los reintentos.
+"""
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from typing import Optional
+from urllib.parse import urlparse
+import asyncio
+import atexit
+import heapq
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+load_dotenv()
+
+PRIORIDAD_ALTA = 0  # Peticiones de un análisis en curso
+PRIORIDAD_NORMAL = 5
+PRIORIDAD_BAJA = 10  # Refrescos en segundo plano, descargas de índices...
+
+# Límites por defecto de los planes gratuitos (peticiones por minuto y ráfaga máxima)
+LIMITES_POR_DEFECTO = {
+    "finnhub": (60, 30),
+    "newsapi": (30, 5),
+}
+PROVEEDOR_POR_HOST = {
+    "finnhub.io": "finnhub",
+    "newsapi.org": "newsapi",
+}
+
+# Configuración (se puede ajustar en el .env)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "false").lower() in ("1", "true", "yes")
+RATE_LIMIT_PATH = os.path.expanduser(
+    os.getenv("RATE_LIMIT_PATH", os.path.join("~", ".cache", "tfg", "rate_limits.sqlite")))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))  # Reintentos tras un 429
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "2"))  # Segundos base del backoff exponencial
+RATE_LIMIT_MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "60"))
+
+# Prioridad de las peticiones que se hagan en el contexto actual (tarea asyncio o hilo)
+_prioridad_actual: ContextVar[int] = ContextVar("prioridad_rate_limit", default=PRIORIDAD_NORMAL)
+
+
+@contextmanager
+def prioridad(valor: int):
+    """Ejecuta el bloque con otra prioridad: with prioridad(PRIORIDAD_BAJA): await fetch()"""
+    token = _prioridad_actual.set(valor)
+    try:
+        yield
+    finally:
+        _prioridad_actual.reset(token)
+
+
+def proveedor_de_url(url: str) -> Optional[str]:
+    host = urlparse(url).hostname or ""
+    for dominio, proveedor in PROVEEDOR_POR_HOST.items():
+        if host == dominio or host.endswith("." + dominio):
+            return proveedor
+    return None
+
+
+def espera_backoff(intento: int, retry_after: Optional[str] = None) -> float:
+    """Segundos a esperar tras un 429: el Retry-After del proveedor o backoff exponencial con jitter."""
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), RATE_LIMIT_MAX_BACKOFF) + random.uniform(0, 1)
+    except ValueError:
+        pass
+    # "Full jitter": evita que todas las peticiones rechazadas reintenten a la vez
+    return random.uniform(0, min(RATE_LIMIT_BACKOFF * 2 ** intento, RATE_LIMIT_MAX_BACKOFF))
+
+
+class TokenBucket:
+    """Token bucket de un proveedor con cola de prioridad, usable desde asyncio y desde hilos."""
+
+    def __init__(self, nombre: str, por_minuto: float, rafaga: int, compartido: bool = RATE_LIMIT_SHARED,
+                 path: str = RATE_LIMIT_PATH):
+        self.nombre = nombre
+        self.ritmo = por_minuto / 60.0  # Tokens por segundo
+        self.rafaga = rafaga
+        self.compartido = compartido
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._tokens = float(rafaga)
+        self._actualizado = time.monotonic()
+        self._bloqueado_hasta = 0.0  # Tras un 429 no se entregan tokens hasta este instante
+        self._cola: list = []
+        self._secuencia = itertools.count()
+
+        self.metricas = {"peticiones": 0, "esperas": 0, "espera_total": 0.0, "espera_max": 0.0,
+                         "respuestas_429": 0, "reintentos": 0}
+        if compartido:
+            self._crear_tabla()
+
+    # ------------------------------------------------------------------
+    # Estado del bucket (en memoria o en SQLite si se comparte entre procesos)
+    # ------------------------------------------------------------------
+    def _crear_tabla(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=10)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    nombre TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    actualizado REAL NOT NULL,
+                    bloqueado_hasta REAL NOT NULL
+                )""")
+            conn.commit()
+
+    def _tomar_local(self) -> float:
+        ahora = time.monotonic()
+        if ahora < self._bloqueado_hasta:
+            return self._bloqueado_hasta - ahora
+        self._tokens = min(self.rafaga, self._tokens + max(0.0, ahora - self._actualizado) * self.ritmo)
+        self._actualizado = ahora
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.ritmo
+
+    def _tomar_compartido(self) -> float:
+        # time.time y no monotonic: el instante tiene que tener sentido para todos los procesos
+        ahora = time.time()
+        with closing(sqlite3.connect(self.path, timeout=10, isolation_level=None)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                fila = conn.execute(
+                    "SELECT tokens, actualizado, bloqueado_hasta FROM buckets WHERE nombre = ?",
+                    (self.nombre,)).fetchone()
+                tokens, actualizado, bloqueado_hasta = fila if fila else (float(self.rafaga), ahora, 0.0)
+                if ahora < bloqueado_hasta:
+                    conn.execute("COMMIT")
+                    return bloqueado_hasta - ahora
+                tokens = min(self.rafaga, tokens + max(0.0, ahora - actualizado) * self.ritmo)
+                if tokens >= 1:
+                    tokens -= 1
+                    espera = 0.0
+                else:
+                    espera = (1 - tokens) / self.ritmo
+                conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)",
+                             (self.nombre, tokens, ahora, bloqueado_hasta))
+                conn.execute("COMMIT")
+                return espera
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _tomar(self) -> float:
+        """Intenta coger un token: 0 si lo consigue o los segundos que faltan para el siguiente."""
+        if self.compartido:
+            try:
+                return self._tomar_compartido()
+            except sqlite3.Error as e:
+                print(f"Error en el limitador compartido de {self.nombre}, se usa el local: {e}", file=sys.stderr)
+                self.compartido = False
+        return self._tomar_local()
+
+    # ------------------------------------------------------------------
+    # Cola de prioridad
+    # ------------------------------------------------------------------
+    def _turno(self, ticket: tuple) -> float:
+        # Solo la primera petición de la cola intenta coger token; las demás esperan
+        # aproximadamente lo que tardarán en llegar los tokens de las que tienen delante
+        with self._lock:
+            if self._cola and self._cola[0] == ticket:
+                espera = self._tomar()
+                if espera == 0:
+                    heapq.heappop(self._cola)
+                return espera
+            delante = sum(1 for t in self._cola if t < ticket)
+            # Como mucho 1 s, por si la cola cambia (llega una petición más prioritaria o se cancela otra)
+            return min(max((delante + 1 - self._tokens) / self.ritmo, 0.01), 1.0)
+
+    def _encolar(self, prioridad_peticion: Optional[int]) -> tuple:
+        if prioridad_peticion is None:
+            prioridad_peticion = _prioridad_actual.get()
+        ticket = (prioridad_peticion, next(self._secuencia))
+        with self._lock:
+            heapq.heappush(self._cola, ticket)
+        return ticket
+
+    def _abandonar(self, ticket: tuple):
+        with self._lock:
+            if ticket in self._cola:
+                self._cola.remove(ticket)
+                heapq.heapify(self._cola)
+
+    def _registrar_espera(self, espera: float):
+        with self._lock:
+            self.metricas["peticiones"] += 1
+            if espera > 0.001:
+                self.metricas["esperas"] += 1
+            self.metricas["espera_total"] += espera
+            self.metricas["espera_max"] = max(self.metricas["espera_max"], espera)
+
+    async def adquirir(self, prioridad_peticion: Optional[int] = None) -> float:
+        """Espera (sin bloquear el event loop) a que haya un token. Devuelve el tiempo esperado."""
+        inicio = time.monotonic()
+        ticket = self._encolar(prioridad_peticion)
+        try:
+            while True:
+                # En modo compartido _turno abre una transacción de SQLite (con su timeout de bloqueo)
+                espera = await asyncio.to_thread(self._turno, ticket) if self.compartido else self._turno(ticket)
+                if espera == 0:
+                    break
+                await asyncio.sleep(espera)
+        except BaseException:
+            self._abandonar(ticket)
+            raise
+        esperado = time.monotonic() - inicio
+        self._registrar_espera(esperado)
+        return esperado
+
+    def adquirir_sync(self, prioridad_peticion: Optional[int] = None) -> float:
+        """Versión bloqueante de adquirir, para el código síncrono (Caso de uso 2)."""
+        inicio = time.monotonic()
+        ticket = self._encolar(prioridad_peticion)
+        try:
+            while True:
+                espera = self._turno(ticket)
+                if espera == 0:
+                    break
+                time.sleep(espera)
+        except BaseException:
+            self._abandonar(ticket)
+            raise
+        esperado = time.monotonic() - inicio
+        self._registrar_espera(esperado)
+        return esperado
+
+    def penalizar(self, segundos: float):
+        """Tras un 429: no se entregan más tokens durante los segundos indicados."""
+        with self._lock:
+            self.metricas["respuestas_429"] += 1
+            self._tokens = 0.0
+            self._bloqueado_hasta = max(self._bloqueado_hasta, time.monotonic() + segundos)
+            # El bucket empieza a rellenarse cuando termina el bloqueo
+            self._actualizado = self._bloqueado_hasta
+            if self.compartido:
+                try:
+                    with closing(sqlite3.connect(self.path, timeout=10)) as conn:
+                        conn.execute(
+                            "INSERT INTO buckets VALUES (?, 0, ?, ?) ON CONFLICT(nombre) DO UPDATE SET "
+                            "tokens = 0, bloqueado_hasta = MAX(bloqueado_hasta, excluded.bloqueado_hasta), "
+                            "actualizado = MAX(bloqueado_hasta, excluded.bloqueado_hasta)",
+                            (self.nombre, time.time() + segundos, time.time() + segundos))
+                        conn.commit()
+                except sqlite3.Error:
+                    pass
+
+    def registrar_reintento(self):
+        with self._lock:
+            self.metricas["reintentos"] += 1
+
+    def resumen(self) -> dict:
+        with self._lock:
+            m = dict(self.metricas)
+            m["en_cola"] = len(self._cola)
+        m["espera_media"] = m["espera_total"] / m["peticiones"] if m["peticiones"] else 0.0
+        return m
+
+
+_buckets: dict = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(proveedor: str) -> TokenBucket:
+    """Bucket compartido del proveedor; los límites se leen de <PROVEEDOR>_RATE_PER_MIN y <PROVEEDOR>_BURST."""
+    with _buckets_lock:
+        bucket = _buckets.get(proveedor)
+        if bucket is None:
+            por_minuto, rafaga = LIMITES_POR_DEFECTO.get(proveedor, (60, 10))
+            bucket = TokenBucket(
+                proveedor,
+                float(os.getenv(f"{proveedor.upper()}_RATE_PER_MIN", str(por_minuto))),
+                int(os.getenv(f"{proveedor.upper()}_BURST", str(rafaga))),
+            )
+            if not _buckets:
+                atexit.register(_imprimir_metricas)
+            _buckets[proveedor] = bucket
+        return bucket
+
+
+def get_rate_limiter_for_url(url: str) -> Optional[TokenBucket]:
+    """Bucket del proveedor de la URL, o None si no está limitado (o el limitador está desactivado)."""
+    if not RATE_LIMIT_ENABLED:
+        return None
+    proveedor = proveedor_de_url(url)
+    return get_rate_limiter(proveedor) if proveedor else None
+
+
+def metricas_rate_limit() -> dict:
+    return {nombre: bucket.resumen() for nombre, bucket in _buckets.items()}
+
+
+def _imprimir_metricas():
+    # Se escribe en stderr: en los servidores MCP por stdio, stdout es el canal del protocolo
+    for nombre, m in metricas_rate_limit().items():
+        if not m["peticiones"]:
+            continue
+        print(f"Rate limit {nombre}: {m['peticiones']} peticiones, {m['esperas']} en cola "
+              f"(espera media {m['espera_media']:.2f} s, máxima {m['espera_max']:.2f} s), "
+              f"{m['respuestas_429']} respuestas 429, {m['reintentos']} reintentos", file=sys.stderr)
@@ -0,0 +1,152 @@
+"""
+Ventanas temporales sobre las series de Finnhub /stock/metric.
+
+La respuesta de metric=all trae, en data["series"]["annual"|"quarterly"][métrica], listas de
+puntos {"period": "YYYY-MM-DD", "v": valor} ordenadas por fecha. Filtrarlas elemento a elemento
+con datetime.strptime es lo más caro de procesar el payload, así que aquí:
+- La columna "period" de cada serie se convierte una sola vez en un array datetime64[D].
+- Si la serie está ordenada (ascendente o descendente, Finnhub usa la más reciente primero) la
+  ventana se obtiene con dos búsquedas binarias (np.searchsorted) y un slice de la lista.
+- Si no está ordenada se usa una máscara vectorizada; si algún periodo no es una fecha válida se
+  vuelve al filtrado elemento a elemento, que descarta solo esos puntos.
+
+La ventana puede ser de años, de trimestres o los últimos N puntos (o una combinación):
+    filtrar_series(data, years=5)
+    filtrar_series(data, quarters=8)
+    filtrar_series(data, last=12)
+El resultado tiene la misma forma que el antiguo filter_data_10_years: "metric" tal cual y
+"series" con cada lista recortada (los puntos son los mismos dicts, no copias).
+"""
+from datetime import date, datetime, timedelta
+from typing import Optional
+import calendar
+
+import numpy as np
+
+ASCENDENTE = 1
+DESCENDENTE = -1
+DESORDENADA = 0
+
+
+def _restar_meses(fecha: date, meses: int) -> date:
+    total = fecha.year * 12 + fecha.month - 1 - meses
+    año, mes = divmod(total, 12)
+    dia = min(fecha.day, calendar.monthrange(año, mes + 1)[1])
+    return date(año, mes + 1, dia)
+
+
+def limites_ventana(years: float = None, quarters: int = None, hasta: date = None) -> tuple:
+    """
+    Devuelve (desde, hasta) como datetime64[D]. La ventana incluye los periodos posteriores a
+    desde (None si no hay límite inferior) y hasta el día hasta incluido (hoy por defecto).
+    """
+    hasta = hasta or date.today()
+    desde = None
+    if years is not None:
+        # Igual que el filtro original: 365 días por año (5 años = 1825 días)
+        desde = hasta - timedelta(days=round(365 * years))
+    if quarters is not None:
+        desde_trimestres = _restar_meses(hasta, 3 * int(quarters))
+        desde = desde_trimestres if desde is None else max(desde, desde_trimestres)
+    return (None if desde is None else np.datetime64(desde, "D")), np.datetime64(hasta, "D")
+
+
+def columna_periodos(puntos: list) -> Optional[np.ndarray]:
+    """Columna "period" de una serie como datetime64[D], o None si algún punto no es válido."""
+    try:
+        periodos = np.array([p["period"] for p in puntos], dtype="datetime64[D]")
+    except (KeyError, TypeError, ValueError):
+        return None
+    if np.isnat(periodos).any():
+        return None
+    return periodos
+
+
+def orden(periodos: np.ndarray) -> int:
+    if len(periodos) < 2 or (periodos[1:] >= periodos[:-1]).all():
+        return ASCENDENTE
+    if (periodos[1:] <= periodos[:-1]).all():
+        return DESCENDENTE
+    return DESORDENADA
+
+
+def recortar(puntos: list, periodos: np.ndarray, desde, hasta, last: int = None) -> list:
+    """Puntos de la serie dentro de la ventana (y como mucho los last más recientes)."""
+    sentido = orden(periodos)
+
+    if sentido == ASCENDENTE:
+        inicio = 0 if desde is None else int(np.searchsorted(periodos, desde, side="right"))
+        fin = int(np.searchsorted(periodos, hasta, side="right"))
+        if last is not None:
+            inicio = max(inicio, fin - last)
+        return puntos[inicio:fin]
+
+    if sentido == DESCENDENTE:
+        # Se busca sobre la vista invertida (ascendente) y se traducen los índices
+        invertidos = periodos[::-1]
+        n = len(periodos)
+        inicio = n - int(np.searchsorted(invertidos, hasta, side="right"))
+        fin = n if desde is None else n - int(np.searchsorted(invertidos, desde, side="right"))
+        if last is not None:
+            fin = min(fin, inicio + last)
+        return puntos[inicio:fin]
+
+    mascara = periodos <= hasta
+    if desde is not None:
+        mascara &= periodos > desde
+    indices = np.flatnonzero(mascara)
+    if last is not None and len(indices) > last:
+        # Los last más recientes, manteniendo el orden original de la lista
+        recientes = np.argsort(periodos[indices], kind="stable")[-last:]
+        indices = np.sort(indices[recientes])
+    return [puntos[i] for i in indices]
+
+
+def _recortar_lento(puntos: list, desde, hasta, last: int = None) -> list:
+    # Series con algún periodo inválido: se descartan solo esos puntos, como el filtro original
+    validos = []
+    for punto in puntos:
+        try:
+            periodo = np.datetime64(datetime.strptime(punto["period"], "%Y-%m-%d").date(), "D")
+        except (ValueError, KeyError, TypeError):
+            continue
+        if (desde is None or periodo > desde) and periodo <= hasta:
+            validos.append(punto)
+    if last is not None and len(validos) > last:
+        periodos = columna_periodos(validos)
+        return recortar(validos, periodos, None, hasta, last)
+    return validos
+
+
+def filtrar_series(data: dict, years: float = None, quarters: int = None, last: int = None,
+                   hasta: date = None) -> dict:
+    """Recorta todas las series temporales de una respuesta de /stock/metric a la ventana pedida."""
+    if not isinstance(data, dict):
+        return data
+
+    desde, hasta = limites_ventana(years, quarters, hasta)
+    filter_data = {}
+    if isinstance(data.get("metric"), dict):
+        filter_data["metric"] = data["metric"]
+
+    series = data.get("series")
+    if not isinstance(series, dict):
+        return filter_data
+
+    filter_data["series"] = {}
+    for series_key, series_value in series.items():
+        if not isinstance(series_value, dict):
+            filter_data["series"][series_key] = series_value
+            continue
+        filter_data["series"][series_key] = {}
+        for metrica, puntos in series_value.items():
+            if not (isinstance(puntos, list) and puntos and isinstance(puntos[0], dict) and "period" in puntos[0]):
+                # Listas vacías o datos sin fechas: se copian tal cual
+                filter_data["series"][series_key][metrica] = puntos
+                continue
+            periodos = columna_periodos(puntos)
+            if periodos is None:
+                filter_data["series"][series_key][metrica] = _recortar_lento(puntos, desde, hasta, last)
+            else:
+                filter_data["series"][series_key][metrica] = recortar(puntos, periodos, desde, hasta, last)
+    return filter_data
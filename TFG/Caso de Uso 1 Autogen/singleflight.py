@@ -0,0 +1,99 @@
+"""
+Agrupación de peticiones idénticas en vuelo (single-flight).
+
+Cuando varios análisis de la misma empresa se ejecutan a la vez, cada uno llamaba por su cuenta
+a Finnhub y a yfinance. Con SingleFlight, las llamadas concurrentes con la misma clave comparten
+una única petición y su resultado:
+- La primera llamada lanza la petición; las que llegan mientras está en vuelo esperan a la misma.
+- Si la petición falla, la excepción se propaga a todas las llamadas que la esperaban, pero no se
+  recuerda: la siguiente llamada vuelve a intentarlo.
+- Si se cancela una de las llamadas, la petición sigue para las demás; solo se cancela cuando ya
+  no queda nadie esperándola.
+El resultado es el mismo objeto para todas las llamadas, así que no se debe modificar.
+"""
+from typing import Any, Awaitable, Callable, Hashable
+import asyncio
+import atexit
+import sys
+import threading
+import weakref
+
+
+class SingleFlight:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola petición."""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        # Las tareas pertenecen a un event loop, así que hay un registro de peticiones por loop
+        self._en_vuelo = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.metricas = {"llamadas": 0, "ejecuciones": 0, "agrupadas": 0, "errores": 0}
+
+    def _contar(self, clave: str):
+        with self._lock:
+            self.metricas[clave] += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta fn() o, si ya hay una petición en vuelo con la misma clave, espera a su resultado."""
+        loop = asyncio.get_running_loop()
+        en_vuelo = self._en_vuelo.setdefault(loop, {})
+        self._contar("llamadas")
+
+        vuelo = en_vuelo.get(key)
+        if vuelo is None:
+            self._contar("ejecuciones")
+            vuelo = {"tarea": loop.create_task(fn()), "esperando": 0}
+            en_vuelo[key] = vuelo
+            vuelo["tarea"].add_done_callback(lambda _: self._terminar(en_vuelo, key, vuelo))
+        else:
+            self._contar("agrupadas")
+
+        vuelo["esperando"] += 1
+        try:
+            # shield: cancelar a quien espera no cancela la petición compartida
+            return await asyncio.shield(vuelo["tarea"])
+        except asyncio.CancelledError:
+            if vuelo["esperando"] == 1 and not vuelo["tarea"].done():
+                vuelo["tarea"].cancel()
+            raise
+        finally:
+            vuelo["esperando"] -= 1
+
+    def _terminar(self, en_vuelo: dict, key: Hashable, vuelo: dict):
+        # Se olvida la petición en cuanto termina: los errores no se recuerdan
+        if en_vuelo.get(key) is vuelo:
+            del en_vuelo[key]
+        tarea = vuelo["tarea"]
+        if not tarea.cancelled() and tarea.exception() is not None:
+            self._contar("errores")
+
+    def resumen(self) -> dict:
+        with self._lock:
+            return dict(self.metricas)
+
+
+_grupos: dict = {}
+_grupos_lock = threading.Lock()
+
+
+def get_singleflight(nombre: str) -> SingleFlight:
+    """Grupo single-flight compartido del proceso (uno por tipo de petición: "finnhub_metric", "yfinance"...)."""
+    with _grupos_lock:
+        grupo = _grupos.get(nombre)
+        if grupo is None:
+            if not _grupos:
+                atexit.register(_imprimir_metricas)
+            grupo = _grupos[nombre] = SingleFlight(nombre)
+        return grupo
+
+
+def metricas_singleflight() -> dict:
+    return {nombre: grupo.resumen() for nombre, grupo in _grupos.items()}
+
+
+def _imprimir_metricas():
+    # Se escribe en stderr: en los servidores MCP por stdio, stdout es el canal del protocolo
+    for nombre, m in metricas_singleflight().items():
+        if m["agrupadas"]:
+            print(f"Single-flight {nombre}: {m['llamadas']} llamadas, {m['ejecuciones']} peticiones, "
+                  f"{m['agrupadas']} agrupadas, {m['errores']} errores", file=sys.stderr)
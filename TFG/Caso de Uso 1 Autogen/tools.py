@@ -1,10 +1,25 @@
 from dotenv import load_dotenv
-import os, requests
+import asyncio
+import os
+import sys
 import yfinance as yf
-from datetime import datetime, timedelta
-from nameclass import CompanyParams, SymbolResponse, SearchSymbolsResponse, FinancialInformationResponse, SymbolInput, YFinanceData
+from datetime import datetime
+from nameclass import CompanyParams, SymbolResponse, SearchSymbolsResponse, FinancialInformationResponse, SymbolInput, YFinanceData, CombinedFinancialData
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
+from http_client import get_json, run_blocking
+from finnhub_cache import get_metric_cached
+from symbol_index import get_symbol_resolver, NO_ENCONTRADO
+from singleflight import get_singleflight
+from fixtures import con_fixture_sync
+from series_window import filtrar_series
+from series_store import guardar_series
+from series_features import con_features
+from finnhub_fields import proyectar, necesita_detalle
+from price_history import descargar_historico, descargar_rapido, YFINANCE_HISTORY_PERIOD, YFINANCE_MODE
+from yfinance_session import con_sesion_yfinance
+from price_indicators import indicadores_yfinance, INDICATORS_ENABLED, INDICATORS_PERIOD, INDICATORS_INDEX
+from price_downsampling import reducir_historico, es_historico, PDF_CHART_POINTS
 
 #Cargar las variables de entorno desde el archivo .env
 load_dotenv()
@@ -12,10 +27,11 @@ load_dotenv()
 # Función asíncrona para hacer la búsqueda de símbolos de empresas
 async def make_search_to_function_search_symbols(comp: CompanyParams) -> SearchSymbolsResponse:
     try:
-        url= f"https://finnhub.io/api/v1/search?q={comp.company}&token={os.getenv('FINHUB_API_KEY')}"
-        response=requests.get(url)
-        #print(response)
-        data=response.json()
+        url= "https://finnhub.io/api/v1/search"
+        # Petición asíncrona con el cliente HTTP compartido (no bloquea el event loop del servidor MCP)
+        # Las búsquedas concurrentes de la misma empresa comparten una sola petición
+        data=await get_singleflight("finnhub_search").do(
+            comp.company, lambda: get_json(url, params={"q": comp.company, "token": os.getenv('FINHUB_API_KEY')}))
         return SearchSymbolsResponse(**data)
     except Exception as e:
         print(f"Error al buscar símbolos: {str(e)}")
@@ -23,7 +39,15 @@ async def make_search_to_function_search_symbols(comp: CompanyParams) -> SearchS
 
 # Función asíncrona para buscar símbolos de empresas en la bolsa de valores de USA
 async def search_symbols_companys_USA(comp:CompanyParams) -> SymbolResponse:
-    
+    # Primero se resuelve con el índice local de símbolos, sin llamadas de red
+    resolver=get_symbol_resolver()
+    symbol=await resolver.resolve(comp.company)
+    if symbol==NO_ENCONTRADO:
+        return f"No se encontraron resultados para {comp.company} en la bolsa de valores de USA."
+    if symbol:
+        return SymbolResponse(symbol=symbol)
+
+    # Sin coincidencia fiable en el índice, se busca en Finnhub
     data=await make_search_to_function_search_symbols(comp)
     # Si no se encuentran resultados, se busca el nombre de la empresa en mayúsculas
     if data.count== 0 or data.result == []:
@@ -31,31 +55,80 @@ async def search_symbols_companys_USA(comp:CompanyParams) -> SymbolResponse:
         # Realizar la búsqueda nuevamente con el nombre de la empresa en mayúsculas
         data= await make_search_to_function_search_symbols(CompanyParams(company=company_mayus))
     # Si aún no se encuentran resultados, se devuelve un mensaje indicando que no se encontraron resultados
-        if data['count']== 0 or data['result'] == []:
+        if data.count== 0 or data.result == []:
+            resolver.recordar(comp.company, None)
             return f"No se encontraron resultados para {comp.company} en la bolsa de valores de USA."
-  
+
+    resolver.recordar(comp.company, data.result[0]['symbol'])
     return SymbolResponse(symbol=data.result[0]['symbol'])
 
 
 # Función asíncrona para extraer información financiera de una empresa
 async def extract_information_company_newsapi(company:CompanyParams):
     headers = {"Authorization": f"Bearer {os.getenv('NEWSAPI_API_KEY')}"}
-    url=f"https://newsapi.org/v2/everything?q={company}"
-    response=requests.get(url,headers=headers)
-    data=response.json()
+    url="https://newsapi.org/v2/everything"
+    data=await get_singleflight("newsapi").do(
+        str(company), lambda: get_json(url, params={"q": company}, headers=headers))
     return data
 
-#Función asíncrona para extraer información financiera de una empresa utilizando yfinance
-async def extract_information_company_yfinance(symbol:SymbolInput) -> YFinanceData:
+# Descarga los datos de yfinance. Es bloqueante, por eso se ejecuta en el pool de hilos de yfinance
+def download_yfinance_data(symbol: str):
+    # Con FIXTURES_MODE=record/replay los datos se graban o se leen de disco
+    return con_fixture_sync("yfinance", {"symbol": symbol, "period": YFINANCE_HISTORY_PERIOD, "mode": YFINANCE_MODE},
+                            lambda: con_sesion_yfinance(lambda: fetch_yfinance_data(symbol)))
+
+# Solo ticker.info, para pedir bajo demanda los campos caros en el modo rápido
+def download_yfinance_info(symbol: str):
+    return con_fixture_sync("yfinance", {"symbol": symbol, "info": True},
+                            lambda: con_sesion_yfinance(lambda: yf.Ticker(symbol).info))
+
+# Indicadores técnicos del símbolo sobre INDICATORS_PERIOD (el histórico sale de la caché de precios)
+def download_yfinance_indicators(symbol: str):
+    return con_fixture_sync("yfinance", {"symbol": symbol, "indicators": INDICATORS_PERIOD, "index": INDICATORS_INDEX},
+                            lambda: con_sesion_yfinance(lambda: indicadores_yfinance(symbol)))
+
+# Los indicadores son un extra: si fallan se devuelven los datos de yfinance sin ellos
+async def yfinance_indicators(symbol: str):
+    if not INDICATORS_ENABLED:
+        return None
     try:
-        #Crear un objeto Ticker de yfinance para el símbolo proporcionado
-        ticker = yf.Ticker(symbol)
+        return await get_singleflight("yfinance_indicadores").do(
+            symbol.upper(), lambda: run_blocking(download_yfinance_indicators, symbol))
+    except Exception as e:
+        print(f"No se pudieron calcular los indicadores de {symbol}: {str(e)}", file=sys.stderr)
+        return None
+
+# Llamadas reales a yfinance
+def fetch_yfinance_data(symbol: str):
+    #Crear un objeto Ticker de yfinance para el símbolo proporcionado
+    ticker = yf.Ticker(symbol)
+    if YFINANCE_MODE == "fast":
+        # Modo rápido: sin ticker.info, precio, volumen y 52 semanas salen del histórico
+        return descargar_rapido(ticker)
 
-        #Obtener información general de la empresa
-        info = ticker.info
+    #Obtener información general de la empresa
+    info = ticker.info
 
-        # Obtiener el historial de precios de la acción para el último mes y lo convierte a un diccionario
-        historical_prices = ticker.history(period="1mo").to_dict(orient='records')
+    # Histórico de precios en columnas (fechas + OHLCV) en lugar de un dict por fila
+    historical_prices = descargar_historico(ticker)
+    return info, historical_prices
+
+#Función asíncrona para extraer información financiera de una empresa utilizando yfinance
+async def extract_information_company_yfinance(symbol:SymbolInput, detalle: bool = False, max_points: int = None) -> YFinanceData:
+    try:
+        # Las descargas concurrentes del mismo símbolo comparten una sola llamada a yfinance
+        datos = get_singleflight("yfinance").do(
+            symbol.upper(), lambda: run_blocking(download_yfinance_data, symbol))
+        if YFINANCE_MODE == "fast" and detalle:
+            # Los campos caros de ticker.info (márgenes, ROE, crecimiento...) solo se piden si hacen falta
+            (info, historical_prices), info_detalle, indicators = await asyncio.gather(
+                datos, get_singleflight("yfinance_info").do(symbol.upper(), lambda: run_blocking(download_yfinance_info, symbol)),
+                yfinance_indicators(symbol))
+            info = {**info, **info_detalle}
+        else:
+            (info, historical_prices), indicators = await asyncio.gather(datos, yfinance_indicators(symbol))
+        # Como mucho max_points sesiones (YFINANCE_MAX_POINTS por defecto), conservando picos y valles
+        historical_prices = reducir_historico(historical_prices, max_points)
 
         #Retorna un objeto YFinanceData con la información extraída
         return YFinanceData(
@@ -82,7 +155,8 @@ async def extract_information_company_yfinance(symbol:SymbolInput) -> YFinanceDa
             profit_margin=info.get("profitMargins"),
             operating_margin=info.get("operatingMargins"),
             earnings_growth=info.get("earningsGrowth"),
-            revenue_growth=info.get("revenueGrowth")
+            revenue_growth=info.get("revenueGrowth"),
+            indicators=indicators
             
 
         )
@@ -99,7 +173,7 @@ async def extract_information_company_yfinance(symbol:SymbolInput) -> YFinanceDa
             beta=None,
             fifty_two_week_high=None,
             fifty_two_week_low=None,
-            historical_prices=[],
+            historical_prices=None,
             current_price=None,
             volume=None,
             avg_volume=None,
@@ -223,6 +297,42 @@ async def transform_data_to_pdf(data: dict) -> str:
         c.line(left_margin, y_pos, right_margin, y_pos)
         return y_pos - 15 #Retorna posición con espacio adicional
     
+    # Gráfico de línea del cierre (historical_prices), reducido a PDF_CHART_POINTS puntos
+    def add_price_chart(prices, y_pos, chart_height=150):
+        if y_pos - chart_height < 100:
+            c.showPage()
+            y_pos = height - 80
+        
+        puntos = reducir_historico(prices, PDF_CHART_POINTS)
+        serie = [(fecha, cierre) for fecha, cierre in zip(puntos["dates"], puntos["close"]) if cierre is not None]
+        if len(serie) < 2:
+            return add_text("  Sin precios suficientes para el gráfico", y_pos, font_size=10)
+        
+        # Eje x proporcional a la fecha: tras la reducción las sesiones no están equiespaciadas
+        fechas = [datetime.fromisoformat(fecha) for fecha, _ in serie]
+        duracion = (fechas[-1] - fechas[0]).total_seconds() or 1
+        minimo = min(cierre for _, cierre in serie)
+        maximo = max(cierre for _, cierre in serie)
+        rango = (maximo - minimo) or 1
+        base = y_pos - chart_height
+        
+        c.setStrokeColorRGB(0.2, 0.4, 0.7)
+        c.setLineWidth(1)
+        path = c.beginPath()
+        for i, (fecha, (_, cierre)) in enumerate(zip(fechas, serie)):
+            x = left_margin + (fecha - fechas[0]).total_seconds() / duracion * max_width
+            y = base + (cierre - minimo) / rango * chart_height
+            if i == 0:
+                path.moveTo(x, y)
+            else:
+                path.lineTo(x, y)
+        c.drawPath(path, stroke=1, fill=0)
+        
+        c.setFont("Helvetica", 8)
+        c.drawString(left_margin, base - 12, f"{serie[0][0]}   mín {minimo:.2f}   máx {maximo:.2f}")
+        c.drawRightString(right_margin, base - 12, serie[-1][0])
+        return base - 30
+    
     # Título principal con más espacio
     y_position = height - 80
     y_position = add_text("ANÁLISIS FINANCIERO DETALLADO", y_position, 
@@ -270,8 +380,14 @@ async def transform_data_to_pdf(data: dict) -> str:
             y_position = add_text(f"{section_title}:", y_position, 
                                  font_size=12, is_section=True)
             
-            if isinstance(value, dict):
+            if es_historico(value):
+                y_position = add_price_chart(value, y_position)
+            elif isinstance(value, dict):
                 for sub_key, sub_value in value.items():
+                    if es_historico(sub_value):
+                        y_position = add_text(f"  • {sub_key.replace('_', ' ').title()}:", y_position, font_size=10)
+                        y_position = add_price_chart(sub_value, y_position)
+                        continue
                     formatted_key = sub_key.replace('_', ' ').title()
                     y_position = add_text(f"  • {formatted_key}: {sub_value}", 
                                          y_position, font_size=10)
@@ -299,62 +415,110 @@ async def transform_data_to_pdf(data: dict) -> str:
 
 
 def filter_data_10_years(data:dict)->dict:
-
-    #Valida que los datos de entrada sean un diccionario
-    if not isinstance(data, dict):
-        return data
-    
-    ten_years=datetime.now() - timedelta(days=1825)  # 5 años atrás
-    filter_data = {}
-    current_date = datetime.now() # Obtener la fecha actual
-    #Copa las métricas generales
-    for key, value in data.items():
-        if key=='metric' and isinstance(value,dict):
-            filter_data[key]= value
-        else:
-            continue   
-    #Procesa las series temporales
-    for key, value in data.items():
-        if key=='series' and isinstance(value,dict) :
-            filter_data[key]= {}
-            #Procesa cada serie de datos
-            for series_key, series_value in value.items():
-                if isinstance(series_value,dict):
-                    filter_data[key][series_key]={}
-                    for third_key, third_value in series_value.items():
-                        if isinstance(third_value,list) and len(third_value)>0:
-                            if isinstance(third_value[0],dict) and 'period' in third_value[0]:
-                                filter_list=[]
-                                for item in third_value:
-                                    try:
-                                        data_period= datetime.strptime(item['period'],'%Y-%m-%d')
-                                        if ten_years <= data_period <= current_date:
-                                            filter_list.append(item)
-                                    except (ValueError, KeyError):
-                                        continue
-
-                                #Guarda la lista filtrada
-                                filter_data[key][series_key][third_key] = filter_list
-                            else:
-                                 # Si no tiene fechas, copia los datos tal como están
-                                filter_data[key][series_key][third_key] = third_value
-                        else:
-                            # Para listas vacías o datos no temporales, copia directamente
-                            filter_data[key][series_key][third_key] = third_value
-                else:
-                    # Para datos que no son diccionarios, copia directamente
-                    filter_data[key][series_key] = series_value
-    return filter_data
+    # Últimos 5 años de cada serie: los periodos se convierten una vez a datetime64 y se recortan por búsqueda binaria
+    return filtrar_series(data, years=5)
         
 
 # Función asíncrona para extraer información financiera de una empresa utilizando la API de Finnhub
-async def extract_financial_information_company(symbol:str) -> FinancialInformationResponse:  
+async def extract_financial_information_company(symbol:str, fields: str = None) -> FinancialInformationResponse:  
     try:
-        url= f"https://finnhub.io/api/v1/stock/metric?symbol={symbol}&metric=all&token={os.getenv('FINHUB_API_KEY')}"
-        response=requests.get(url)
-        data=response.json()
-        filter_data=filter_data_10_years(data)
+        url= "https://finnhub.io/api/v1/stock/metric"
+        # Los fundamentales cambian como mucho cada trimestre: se sirven desde la caché en disco
+        data=await get_singleflight("finnhub_metric").do(
+            symbol.upper(), lambda: get_metric_cached(symbol, lambda: get_json(url, params={"symbol": symbol, "metric": "all", "token": os.getenv('FINHUB_API_KEY')})))
+        # Las series completas se añaden al almacén columnar en disco (series_store.py)
+        await run_blocking(guardar_series, symbol, data)
+        # Solo los grupos o claves pedidos en fields (valuation, profitability, leverage...); sin fields, todo
+        # Las series se resumen en una tabla de indicadores (CAGR, YoY, pendiente...) en lugar de enviarlas al LLM
+        filter_data=con_features(filter_data_10_years(proyectar(data, fields)))
         return FinancialInformationResponse(data=filter_data)
     except Exception as e:
         print(f"Error al extraer información financiera de {symbol} desde Finnhub: {str(e)}")
 
+
+# Tiempo máximo (segundos) de la extracción combinada Finnhub + Yahoo Finance
+HEDGE_DEADLINE = float(os.getenv("HEDGE_DEADLINE", "20"))
+# Segundos que se sigue esperando a Finnhub cuando Yahoo Finance ya tiene datos válidos
+HEDGE_GRACE = float(os.getenv("HEDGE_GRACE", "2"))
+
+
+def finnhub_data_is_valid(result) -> bool:
+    # Hay métricas de Finnhub con valor, o series (o su tabla de indicadores) con datos: si fields
+    # solo pide series ("pe,eps", "roe"...), la proyección deja "metric" vacío
+    data = getattr(result, "data", None)
+    if not isinstance(data, dict):
+        return False
+    metric = data.get("metric")
+    if isinstance(metric, dict) and any(value is not None for value in metric.values()):
+        return True
+    series = data.get("series")
+    if isinstance(series, dict) and any(isinstance(metricas, dict) and metricas for metricas in series.values()):
+        return True
+    features = data.get("features")
+    return isinstance(features, dict) and any(
+        isinstance(tabla, dict) and tabla.get("metricas") for tabla in features.values())
+
+
+def yfinance_data_is_valid(result) -> bool:
+    return result is not None and (result.company_name is not None or result.current_price is not None)
+
+
+async def wait_provider(task: asyncio.Task, deadline: float, provider: str, symbol: str):
+    # Espera al proveedor hasta el instante límite; None si falla o no llega a tiempo
+    try:
+        return await asyncio.wait_for(task, timeout=max(0, deadline - asyncio.get_running_loop().time()))
+    except asyncio.TimeoutError:
+        print(f"{provider} no respondió a tiempo para {symbol}", file=sys.stderr)
+    except Exception as e:
+        print(f"Error al extraer información de {symbol} desde {provider}: {str(e)}", file=sys.stderr)
+    return None
+
+
+def finished_result(task: asyncio.Task):
+    # Resultado de una tarea ya terminada, o None si sigue en marcha o falló
+    if task.done() and not task.cancelled() and task.exception() is None:
+        return task.result()
+    return None
+
+
+# Función asíncrona que extrae los datos de los dos proveedores en paralelo
+async def extract_financial_data_combined(symbol: str, deadline: float = HEDGE_DEADLINE, max_points: int = None,
+                                          fields: str = None) -> CombinedFinancialData:
+    """
+    Lanza Finnhub y Yahoo Finance a la vez y devuelve un único registro. Se prefiere Finnhub si
+    trae datos válidos; si falla, Yahoo Finance ya está en marcha y no se suma su latencia.
+    El proveedor que no se usa se cancela.
+    """
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + deadline
+    tarea_finnhub = asyncio.create_task(extract_financial_information_company(symbol, fields=fields))
+    # Si se piden fundamentales, el respaldo de Yahoo Finance también los trae en el modo rápido
+    tarea_yahoo = asyncio.create_task(extract_information_company_yfinance(
+        symbol, detalle=necesita_detalle(fields), max_points=max_points))
+    try:
+        await asyncio.wait({tarea_finnhub, tarea_yahoo}, timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+        if not tarea_finnhub.done() and yfinance_data_is_valid(finished_result(tarea_yahoo)):
+            # Yahoo Finance ya ha respondido: a Finnhub solo se le da un margen corto
+            limite = min(limite, loop.time() + HEDGE_GRACE)
+
+        finnhub = await wait_provider(tarea_finnhub, limite, "Finnhub", symbol)
+        if finnhub_data_is_valid(finnhub):
+            # Si Yahoo Finance ya terminó, sus datos se añaden sin esperar más
+            yahoo = finished_result(tarea_yahoo)
+            return CombinedFinancialData(
+                symbol=symbol,
+                source="finnhub",
+                finnhub=finnhub.data,
+                yfinance=yahoo.model_dump() if yfinance_data_is_valid(yahoo) else None,
+            )
+
+        yahoo = await wait_provider(tarea_yahoo, limite, "Yahoo Finance", symbol)
+        if yfinance_data_is_valid(yahoo):
+            return CombinedFinancialData(symbol=symbol, source="yfinance", yfinance=yahoo.model_dump())
+
+        return CombinedFinancialData(
+            symbol=symbol, error=f"Ni Finnhub ni Yahoo Finance devolvieron datos válidos para {symbol}")
+    finally:
+        for tarea in (tarea_finnhub, tarea_yahoo):
+            if not tarea.done():
+                tarea.cancel()
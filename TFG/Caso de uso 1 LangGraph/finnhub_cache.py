@@ -0,0 +1,314 @@
+"""
+Caché en disco (SQLite) para las respuestas de Finnhub /stock/metric.
+
+Los fundamentales cambian como mucho una vez por trimestre, así que no tiene sentido descargar
+el payload completo de metric=all en cada análisis del mismo ticker. La caché:
+- Guarda la respuesta completa por símbolo, comprimida con zlib.
+- Dentro del TTL la sirve directamente (hit) sin tocar la red.
+- Pasado el TTL, pero dentro de la ventana stale, la sirve igualmente y la refresca en segundo
+  plano (stale-while-revalidate). El refresco corre en el loop de fondo de http_client.py y no en
+  el de quien hace la consulta, que puede cerrarse antes de que termine (asyncio.run).
+- Limita el número de entradas y el tamaño total, expulsando las menos usadas (LRU).
+- Lleva contadores de hits/misses del proceso y acumulados en el propio fichero.
+Las lecturas y escrituras de SQLite se hacen fuera del event loop (run_blocking), y los contadores
+acumulados se guardan en bloque junto con la siguiente escritura y al salir, no con una
+transacción por hit.
+
+Por defecto el fichero está en ~/.cache/tfg, así que lo comparten todos los casos de uso.
+
+Uso desde la línea de comandos:
+    python finnhub_cache.py          # estadísticas de la caché
+    python finnhub_cache.py clear    # vaciar la caché
+"""
+from contextlib import closing
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable, Optional
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+from fixtures import fixtures_activas
+from http_client import run_blocking, run_in_background
+from rate_limiter import prioridad, PRIORIDAD_BAJA
+
+load_dotenv()
+
+# Configuración de la caché (se puede ajustar en el .env)
+FINNHUB_CACHE_ENABLED = os.getenv("FINNHUB_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+FINNHUB_CACHE_PATH = os.path.expanduser(
+    os.getenv("FINNHUB_CACHE_PATH", os.path.join("~", ".cache", "tfg", "finnhub_metric.sqlite")))
+FINNHUB_CACHE_TTL = float(os.getenv("FINNHUB_CACHE_TTL", str(7 * 24 * 3600)))  # Segundos en los que la respuesta es fresca
+FINNHUB_CACHE_STALE = float(os.getenv("FINNHUB_CACHE_STALE", str(90 * 24 * 3600)))  # Segundos extra en los que se sirve caducada mientras se refresca
+FINNHUB_CACHE_MAX_ENTRIES = int(os.getenv("FINNHUB_CACHE_MAX_ENTRIES", "2000"))  # Símbolos máximos guardados
+FINNHUB_CACHE_MAX_MB = float(os.getenv("FINNHUB_CACHE_MAX_MB", "200"))  # Tamaño máximo de los payloads comprimidos
+
+FRESCO = "fresh"
+CADUCADO = "stale"
+
+
+class FinnhubMetricCache:
+    """Caché persistente de /stock/metric por símbolo, segura entre hilos y entre procesos."""
+
+    def __init__(
+        self,
+        path: str = FINNHUB_CACHE_PATH,
+        ttl: float = FINNHUB_CACHE_TTL,
+        stale: float = FINNHUB_CACHE_STALE,
+        max_entries: int = FINNHUB_CACHE_MAX_ENTRIES,
+        max_bytes: int = int(FINNHUB_CACHE_MAX_MB * 1024 * 1024),
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._inicializada = False
+        self._stats_lock = threading.Lock()
+        self._pendientes: dict = {}  # Contadores que aún no se han sumado a los del fichero
+        self._revalidando: dict = {}  # Símbolo -> Future del refresco en curso
+        self._revalidando_lock = threading.Lock()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "revalidaciones": 0, "errores": 0}
+
+    # ------------------------------------------------------------------
+    # SQLite
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        # Una conexión por operación: son baratas y así la caché se puede usar desde cualquier hilo
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._inicializada:
+            self._crear_tablas(conn)
+        return conn
+
+    def _crear_tablas(self, conn: sqlite3.Connection):
+        with self._lock:
+            if self._inicializada:
+                return
+            # WAL permite que varios servidores MCP lean mientras otro escribe
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metric (
+                    symbol TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS metric_accessed ON metric(accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS estadisticas (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+            conn.commit()
+            self._inicializada = True
+
+    def _contar(self, clave: str):
+        # Contador del proceso; el acumulado del fichero (para comparar ejecuciones en lote) se actualiza en bloque
+        with self._stats_lock:
+            self.stats[clave] += 1
+            self._pendientes[clave] = self._pendientes.get(clave, 0) + 1
+
+    def _volcar(self, conn: sqlite3.Connection):
+        # Suma los contadores pendientes a los del fichero dentro de la transacción de conn
+        with self._stats_lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        if pendientes:
+            conn.executemany(
+                "INSERT INTO estadisticas(clave, valor) VALUES (?, ?) "
+                "ON CONFLICT(clave) DO UPDATE SET valor = valor + excluded.valor", list(pendientes.items()))
+
+    def volcar_estadisticas(self):
+        """Guarda en el fichero los contadores pendientes del proceso."""
+        try:
+            with closing(self._connect()) as conn:
+                self._volcar(conn)
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def normalizar(symbol: str) -> str:
+        return symbol.strip().upper()
+
+    # ------------------------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------------------------
+    def get(self, symbol: str) -> tuple:
+        """Devuelve (data, estado) con estado FRESCO, CADUCADO o None si no hay entrada utilizable."""
+        symbol = self.normalizar(symbol)
+        ahora = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                fila = conn.execute(
+                    "SELECT payload, fetched_at FROM metric WHERE symbol = ?", (symbol,)).fetchone()
+                if fila is None:
+                    return None, None
+
+                edad = ahora - fila[1]
+                if edad > self.ttl + self.stale:
+                    return None, None
+
+                conn.execute("UPDATE metric SET accessed_at = ? WHERE symbol = ?", (ahora, symbol))
+                conn.commit()
+                data = json.loads(zlib.decompress(fila[0]))
+                return data, (FRESCO if edad <= self.ttl else CADUCADO)
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            print(f"Error leyendo la caché de Finnhub para {symbol}: {e}", file=sys.stderr)
+            self.stats["errores"] += 1
+            return None, None
+
+    def set(self, symbol: str, data: dict):
+        """Guarda la respuesta de Finnhub y aplica la política de expulsión."""
+        symbol = self.normalizar(symbol)
+        payload = zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        ahora = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO metric(symbol, payload, size, fetched_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)", (symbol, payload, len(payload), ahora, ahora))
+                self._expulsar(conn)
+                self._volcar(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error guardando {symbol} en la caché de Finnhub: {e}", file=sys.stderr)
+            self.stats["errores"] += 1
+
+    def _expulsar(self, conn: sqlite3.Connection):
+        # Primero se borra lo que ya ni siquiera se puede servir como caducado
+        conn.execute("DELETE FROM metric WHERE fetched_at < ?", (time.time() - self.ttl - self.stale,))
+
+        entradas, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM metric").fetchone()
+        if entradas <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Después, las menos usadas hasta volver a estar dentro de los límites
+        sobran_entradas = max(0, entradas - self.max_entries)
+        sobran_bytes = max(0, total - self.max_bytes)
+        borrar = []
+        for symbol, size in conn.execute("SELECT symbol, size FROM metric ORDER BY accessed_at"):
+            if sobran_entradas <= 0 and sobran_bytes <= 0:
+                break
+            borrar.append((symbol,))
+            sobran_entradas -= 1
+            sobran_bytes -= size
+        conn.executemany("DELETE FROM metric WHERE symbol = ?", borrar)
+
+    def clear(self):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM metric")
+            conn.execute("DELETE FROM estadisticas")
+            conn.commit()
+        with self._stats_lock:
+            self._pendientes = {}
+
+    def resumen(self) -> dict:
+        """Estadísticas del proceso actual y acumuladas en el fichero de la caché."""
+        self.volcar_estadisticas()
+        with closing(self._connect()) as conn:
+            entradas, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM metric").fetchone()
+            acumuladas = dict(conn.execute("SELECT clave, valor FROM estadisticas").fetchall())
+        return {
+            "path": self.path,
+            "entradas": entradas,
+            "tamaño_kb": round(total / 1024, 1),
+            "proceso": dict(self.stats),
+            "acumuladas": acumuladas,
+        }
+
+    # ------------------------------------------------------------------
+    # Uso desde las tools
+    # ------------------------------------------------------------------
+    async def get_or_fetch(self, symbol: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Devuelve la respuesta de /stock/metric del símbolo usando la caché.
+        fetch es la corrutina que descarga la respuesta de Finnhub cuando hace falta.
+        """
+        # SQLite es bloqueante: se consulta desde el pool para no parar el event loop del servidor MCP
+        data, estado = await run_blocking(self.get, symbol)
+        if estado == FRESCO:
+            self._contar("hits")
+            return data
+        if estado == CADUCADO:
+            self._contar("stale_hits")
+            self._revalidar(symbol, fetch)
+            return data
+
+        self._contar("misses")
+        data = await fetch()
+        if self._es_cacheable(data):
+            await run_blocking(self.set, symbol, data)
+        return data
+
+    def _revalidar(self, symbol: str, fetch: Callable[[], Awaitable[Any]]):
+        # Refresco en segundo plano; solo uno a la vez por símbolo
+        symbol = self.normalizar(symbol)
+
+        async def refrescar():
+            try:
+                # El refresco no corre prisa: deja pasar antes a las peticiones de los análisis
+                with prioridad(PRIORIDAD_BAJA):
+                    data = await fetch()
+                if self._es_cacheable(data):
+                    self._contar("revalidaciones")
+                    await run_blocking(self.set, symbol, data)
+            except Exception as e:
+                print(f"Error refrescando {symbol} desde Finnhub: {e}", file=sys.stderr)
+            finally:
+                with self._revalidando_lock:
+                    self._revalidando.pop(symbol, None)
+
+        with self._revalidando_lock:
+            futuro = self._revalidando.get(symbol)
+            if futuro is not None and not futuro.done():
+                return
+            self._revalidando[symbol] = run_in_background(refrescar())
+
+    @staticmethod
+    def _es_cacheable(data: Any) -> bool:
+        # No se guardan errores de la API (token inválido, límite de peticiones, ...)
+        return isinstance(data, dict) and "error" not in data and "metric" in data
+
+
+_cache: Optional[FinnhubMetricCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_finnhub_cache() -> FinnhubMetricCache:
+    """Devuelve la caché compartida del proceso (la crea la primera vez)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            os.makedirs(os.path.dirname(FINNHUB_CACHE_PATH) or ".", exist_ok=True)
+            _cache = FinnhubMetricCache()
+            atexit.register(_imprimir_estadisticas)
+        return _cache
+
+
+async def get_metric_cached(symbol: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Punto de entrada para tools.py: respeta FINNHUB_CACHE_ENABLED y el modo record/replay."""
+    if not FINNHUB_CACHE_ENABLED or fixtures_activas():
+        return await fetch()
+    return await get_finnhub_cache().get_or_fetch(symbol, fetch)
+
+
+def _imprimir_estadisticas():
+    # Se escribe en stderr: en los servidores MCP por stdio, stdout es el canal del protocolo
+    if _cache is None or not any(_cache.stats.values()):
+        return
+    _cache.volcar_estadisticas()
+    s = _cache.stats
+    print(f"Caché Finnhub: {s['hits']} hits, {s['stale_hits']} hits caducados, {s['misses']} misses, "
+          f"{s['revalidaciones']} refrescos", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    cache = get_finnhub_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print(f"Caché vaciada: {cache.path}")
+    else:
+        print(json.dumps(cache.resumen(), indent=2, ensure_ascii=False))
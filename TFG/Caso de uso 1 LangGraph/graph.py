@@ -1,5 +1,4 @@
 import os
-import asyncio
 import json
 import re
 from langchain_openai import AzureChatOpenAI
@@ -8,10 +7,10 @@ from typing import Any, List, TypedDict, Annotated
 from langchain_core.tools import tool
 from tools import (
     search_symbols_companys_USA,
-    extract_financial_information_company,
-    extract_information_company_yfinance,
+    extract_financial_data_combined,
     transform_data_to_pdf
 )
+from http_client import run_sync
 from nameclass import CompanyParams
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langgraph.prebuilt import ToolNode
@@ -26,6 +25,7 @@ class AgentState(TypedDict):
     messages: Annotated[List[Any], "Lista de mensajes"]
     company: str
     symbol: str
+    source: str  # Proveedor de los datos financieros ("finnhub" o "yfinance"); vacío hasta extraerlos
     next_action: str
 
 
@@ -34,8 +34,7 @@ def get_system_message() -> str:
 
 FLUJO OBLIGATORIO:
 1. Buscar símbolo con search_symbols_companys_USA_tool
-2. Extraer datos con extract_financial_information_company_tool
-2.1. Si no hay datos, usar extract_information_company_yfinance_tool
+2. Extraer datos con extract_financial_data_combined_tool (consulta Finnhub y Yahoo Finance a la vez y elige el proveedor)
 4. Crear análisis con formato:
    {
      "nombre_empresa": "NOMBRE REAL de la empresa",
@@ -60,50 +59,29 @@ IMPORTANTE:
 - En terminal solo mostrar "análisis financiero completado" al final"""
 
 #Las herramientas que usaremos en el agente
+# Se ejecutan en el event loop de fondo de http_client.py y no con asyncio.run: el cliente HTTP y sus
+# conexiones se reutilizan entre llamadas, y los refrescos de la caché de Finnhub no se cancelan
 @tool
 def search_symbols_companys_USA_tool(company: str) -> dict:
     """Busca el símbolo bursátil de una empresa en USA."""
     try:
         params = CompanyParams(company=company)
         print("Simbolo")
-        result = asyncio.run(search_symbols_companys_USA(params))
+        result = run_sync(search_symbols_companys_USA(params))
         return result.model_dump()
     except Exception as e:
         return {"error": str(e)}
 
 
 @tool
-def extract_financial_information_company_tool(symbol: str) -> dict:
-    """Extrae información financiera completa de una empresa usando Finnhub."""
+def extract_financial_data_combined_tool(symbol: str, max_points: int = None, fields: str = None) -> dict:
+    """Extrae información financiera de una empresa consultando Finnhub y Yahoo Finance en paralelo (se prefiere Finnhub). max_points limita las sesiones del histórico de precios; fields (p. ej. "valuation,profitability,leverage" o claves de Finnhub separadas por comas) limita las métricas devueltas."""
     try:
-        result = asyncio.run(extract_financial_information_company(symbol))
-        data = result.model_dump()
-
-        if not data or not data.get('data') or data['data'] == {} or not data['data'].get('metric'):
-            return {
-                "error": f"No hay datos válidos en Finnhub para {symbol}",
-                "symbol": symbol,
-                "usar_yfinance": True
-            }
-
-        return data
-    except Exception as e:
-        return {
-            "error": f"Error en Finnhub para {symbol}: {str(e)}",
-            "symbol": symbol,
-            "usar_yfinance": True
-        }
-
-
-@tool
-def extract_information_company_yfinance_tool(symbol: str) -> dict:
-    """Extrae información financiera de una empresa usando Yahoo Finance."""
-    try:
-        result = asyncio.run(extract_information_company_yfinance(symbol))
-        data = result.model_dump()
-        return data
+        result = run_sync(extract_financial_data_combined(symbol, max_points=max_points, fields=fields))
+        # Sin los campos vacíos (p. ej. error=None), para que no se confundan con un error en el grafo
+        return result.model_dump(exclude_none=True)
     except Exception as e:
-        return {"error": str(e)}
+        return {"error": f"Error extrayendo datos de {symbol}: {str(e)}", "symbol": symbol}
 
 
 @tool
@@ -122,7 +100,7 @@ def transform_data_to_pdf_tool(nombre_empresa: str, symbol: str, análisis: str,
             error_msg = "Error: Análisis genérico detectado, se requiere análisis específico"
             return {"error": error_msg}
 
-        result = asyncio.run(transform_data_to_pdf(data))
+        result = run_sync(transform_data_to_pdf(data))
         return {"pdf_filename": result, "success": True}
 
     except Exception as e:
@@ -131,8 +109,7 @@ def transform_data_to_pdf_tool(nombre_empresa: str, symbol: str, análisis: str,
 ## Definimos las herramientas que usaremos en el agente
 tools = [
     search_symbols_companys_USA_tool,
-    extract_financial_information_company_tool,
-    extract_information_company_yfinance_tool,
+    extract_financial_data_combined_tool,
     transform_data_to_pdf_tool
 ]
 
@@ -153,6 +130,7 @@ def call_agent(state: AgentState) -> AgentState:  # Maneja el flujo de la conver
     messages = state["messages"]
     company = state.get("company", "")
     symbol = state.get("symbol", "")
+    source = state.get("source", "")
 
     filtered_messages = []
     for msg in messages:
@@ -165,37 +143,19 @@ def call_agent(state: AgentState) -> AgentState:  # Maneja el flujo de la conver
         filtered_messages = [SystemMessage(
             content=get_system_message())] + filtered_messages
         
-    # Verificamos si ya tenemos datos de Finnhub o Yahoo Finance
-    tiene_datos_finnhub = False
-    tiene_datos_yfinance = False
+    # El proveedor que ha usado la extracción combinada lo guarda call_tools en el estado
+    tiene_datos_finnhub = source == "finnhub"
+    tiene_datos_yfinance = source == "yfinance"
     analisis_json = None
-    finnhub_fallo = False
 
     # Revisamos los mensajes para encontrar datos relevantes
     for msg in messages:
         if hasattr(msg, 'content'):
             content = str(msg.content)
 
-            # Verificamos si hay datos de Finnhub o Yahoo Finance
-            if ("extract_financial_information_company_tool" in content and
-                "metric" in content and
-                "roe" in content.lower() and
-                "pe" in content.lower() and
-                    "error" not in content.lower()):
-                tiene_datos_finnhub = True
-            elif ("extract_financial_information_company_tool" in content and
-                  ("error" in content.lower() or "no hay datos válidos" in content.lower())):
-                finnhub_fallo = True
-
-            # Verificamos si hay datos de Yahoo Finance
-            elif ("extract_information_company_yfinance_tool" in content and
-                  "symbol" in content and
-                  "company_name" in content and
-                  "error" not in content.lower()):
-                tiene_datos_yfinance = True
             # Verificamos si hay un análisis JSON ya generado
-            elif ("nombre_empresa" in content and "symbol" in content and
-                  "análisis" in content and "puntuación" in content):
+            if ("nombre_empresa" in content and "symbol" in content and
+                    "análisis" in content and "puntuación" in content):
                 try:
                 
                     json_match = re.search(
@@ -217,19 +177,18 @@ def call_agent(state: AgentState) -> AgentState:  # Maneja el flujo de la conver
         context += f"""PASO 4: CREAR ANÁLISIS CON DATOS DE FINNHUB
         Tienes datos financieros completos de Finnhub para {company} ({symbol}).
         Crear análisis JSON detallado basado en las métricas reales extraídas.
+        Las tendencias ya vienen calculadas en la tabla "features" (CAGR, YoY, QoQ, pendiente, volatilidad y cv por serie): úsalas, no las recalcules.
         Formato: {{"nombre_empresa": "{company}", "symbol": "{symbol}", "análisis": "análisis detallado", "puntuación": "1-10", "justificación": "con datos específicos"}}"""
 
     elif tiene_datos_yfinance:
         context += f"""PASO 4: CREAR ANÁLISIS CON DATOS DE YAHOO FINANCE  
         Tienes datos financieros de Yahoo Finance para {company} ({symbol}).
         Crear análisis JSON detallado basado en los datos reales extraídos.
+        Los indicadores técnicos ya vienen calculados en "indicators" (medias móviles, RSI, ATR, volatilidad, drawdown máximo y beta): úsalos, no los recalcules a partir de "historical_prices".
         Formato: {{"nombre_empresa": "{company}", "symbol": "{symbol}", "análisis": "análisis detallado", "puntuación": "1-10", "justificación": "con datos específicos"}}"""
 
-    elif finnhub_fallo:
-        context += f"PASO 3: Finnhub falló, usar Yahoo Finance\nUsar: extract_information_company_yfinance_tool con symbol='{symbol}'"
-
     elif symbol and not tiene_datos_finnhub and not tiene_datos_yfinance:
-        context += f"PASO 2: Extraer datos de Finnhub\nUsar: extract_financial_information_company_tool con symbol='{symbol}'"
+        context += f"PASO 2: Extraer datos de Finnhub o Yahoo Finance\nUsar: extract_financial_data_combined_tool con symbol='{symbol}'"
 
     else:
         context += f"Continuar con el análisis de {company}"
@@ -249,6 +208,7 @@ def call_agent(state: AgentState) -> AgentState:  # Maneja el flujo de la conver
         "messages": state["messages"] + [response],
         "symbol": symbol,
         "company": company,
+        "source": source,
         "next_action": ""
     }
 
@@ -258,6 +218,7 @@ def call_tools(state: AgentState) -> AgentState:
     messages = state["messages"]
     ultimo_mensaje = messages[-1]
     new_symbol = state.get("symbol", "")
+    new_source = state.get("source", "")
 
     # Verificamos si el último mensaje contiene llamadas a herramientas
     if hasattr(ultimo_mensaje, 'tool_calls') and ultimo_mensaje.tool_calls:
@@ -280,22 +241,19 @@ def call_tools(state: AgentState) -> AgentState:
                 # Añadimos el mensaje de resultado a la lista de nuevos mensajes
                 new_messages.append(result_message)
 
-            elif tool_name == 'extract_financial_information_company_tool':
-                result = extract_financial_information_company_tool.invoke(
+            elif tool_name == 'extract_financial_data_combined_tool':
+                result = extract_financial_data_combined_tool.invoke(
                     tool_args)
+
+                # Proveedor elegido (se lee del resultado, no del texto del mensaje)
+                if isinstance(result, dict) and result.get('source') in ('finnhub', 'yfinance'):
+                    new_source = result['source']
                 # Verificamos si hay un error en la respuesta
                 result_message = AIMessage(
                     content=f"Resultado de {tool_name}: {result}")
                 # Añadimos el mensaje de resultado a la lista de nuevos mensajes
                 new_messages.append(result_message)
 
-            elif tool_name == 'extract_information_company_yfinance_tool':
-                result = extract_information_company_yfinance_tool.invoke(
-                    tool_args)
-                result_message = AIMessage(
-                    content=f"Resultado de {tool_name}: {result}")
-                new_messages.append(result_message)
-
             elif tool_name == 'transform_data_to_pdf_tool':
                 if tool_args and isinstance(tool_args, dict):
                     # Verificamos que los campos requeridos estén presentes y no vacíos
@@ -328,6 +286,7 @@ def call_tools(state: AgentState) -> AgentState:
             "messages": new_messages,
             "symbol": new_symbol,
             "company": state.get("company", ""),
+            "source": new_source,
             "next_action": ""
         }
 
@@ -338,6 +297,7 @@ def call_tools(state: AgentState) -> AgentState:
         "messages": result["messages"],
         "symbol": new_symbol,
         "company": state.get("company", ""),
+        "source": new_source,
         "next_action": ""
     }
 
@@ -12,6 +12,7 @@ async def run_financial_analysis(company_name: str) -> None:
         "messages": [HumanMessage(content=f"Analizar empresa: {company_name}")],
         "company": company_name,
         "symbol": "",
+        "source": "",
         "next_action": ""
     }
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class CompanyParams(BaseModel):
@@ -23,6 +23,35 @@ class SymbolInput(BaseModel):
     symbol: str
 
 
+class HistoricalPrices(BaseModel):
+    """
+    Precios históricos en columnas: una lista por campo, alineadas con dates.
+    """
+    dates: List[str] = []  # Fechas ISO (YYYY-MM-DD)
+    open: List[Optional[float]] = []  # Apertura
+    high: List[Optional[float]] = []  # Máximo
+    low: List[Optional[float]] = []  # Mínimo
+    close: List[Optional[float]] = []  # Cierre
+    volume: List[Optional[int]] = []  # Volumen
+
+    def to_numpy(self) -> dict:
+        # Arrays para analizar sin recorrer filas (None -> NaN)
+        import numpy as np
+        unidad = "D" if all(len(fecha) == 10 for fecha in self.dates) else "m"
+        arrays = {"dates": np.array(self.dates, dtype=f"datetime64[{unidad}]")}
+        for campo in ("open", "high", "low", "close", "volume"):
+            arrays[campo] = np.array([np.nan if v is None else v for v in getattr(self, campo)], dtype="float64")
+        return arrays
+
+    def to_arrow(self):
+        # pyarrow es opcional: solo hace falta si se quiere la tabla Arrow
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("HistoricalPrices.to_arrow necesita pyarrow (pip install pyarrow)") from e
+        return pa.table(self.to_numpy())
+
+
 class YFinanceData(BaseModel):
 
     symbol: str  # Símbolo bursátil de la empresa
@@ -35,7 +64,7 @@ class YFinanceData(BaseModel):
     beta: Optional[float]  # Beta (volatilidad relativa)
     fifty_two_week_high: Optional[float]  # Máximo de 52 semanas
     fifty_two_week_low: Optional[float]  # Mínimo de 52 semanas
-    historical_prices: Optional[list]  # Historial de precios (último mes)
+    historical_prices: Optional[HistoricalPrices]  # Historial de precios en columnas (YFINANCE_HISTORY_PERIOD, por defecto el último mes)
 
     current_price: Optional[float]  # Precio actual
     volume: Optional[int]  # Volumen de operaciones
@@ -48,3 +77,13 @@ class YFinanceData(BaseModel):
     operating_margin: Optional[float]  # Margen operativo
     earnings_growth: Optional[float]  # Crecimiento de ganancias
     revenue_growth: Optional[float]  # Crecimiento de ingresos
+    indicators: Optional[dict] = None  # Resumen de indicadores técnicos (SMA/EMA, RSI, ATR, volatilidad, drawdown, beta)
+
+
+class CombinedFinancialData(BaseModel):
+    # Resultado de la extracción combinada Finnhub + Yahoo Finance
+    symbol: str  # Símbolo bursátil de la empresa
+    source: Optional[str] = None  # Proveedor usado: "finnhub", "yfinance" o None si fallan los dos
+    finnhub: Optional[dict] = None  # Métricas y series de Finnhub
+    yfinance: Optional[dict] = None  # Datos de Yahoo Finance
+    error: Optional[str] = None  # Motivo si no hay datos válidos de ningún proveedor
@@ -0,0 +1,189 @@
+"""
+Métricas derivadas de las series de Finnhub, calculadas con NumPy.
+
+En lugar de pasar al LLM varios años de listas {"period", "v"} y pedirle que "identifique
+tendencias", se le pasa una tabla pequeña con una fila por métrica:
+- ultimo / fecha: último valor y su periodo.
+- cagr: crecimiento anual compuesto entre el primer y el último valor (solo si los dos son > 0).
+- yoy: variación relativa respecto a hace un año (el punto anterior en annual, 4 atrás en quarterly).
+- qoq: variación relativa respecto al trimestre anterior (solo quarterly).
+- pendiente: pendiente de la regresión lineal del valor frente al tiempo, en unidades por año.
+- volatilidad: desviación típica de las variaciones relativas entre periodos consecutivos.
+- cv: coeficiente de variación (desviación típica / |media|); en márgenes mide su estabilidad.
+- n: número de puntos usados.
+Las variaciones relativas se calculan como (nuevo - anterior) / |anterior|, así que también tienen
+sentido con valores negativos.
+
+Todas las series de una frecuencia se colocan en una matriz (métricas x periodos), alineadas por
+el punto más reciente y rellenas con NaN, y cada indicador se calcula para todas a la vez.
+"""
+from dotenv import load_dotenv
+from typing import Dict
+import os
+import warnings
+
+import numpy as np
+
+from series_window import columna_periodos
+
+load_dotenv()
+
+# Con FINNHUB_RAW_SERIES=true se siguen enviando también las series completas (para comparar)
+FINNHUB_RAW_SERIES = os.getenv("FINNHUB_RAW_SERIES", "false").lower() in ("1", "true", "yes")
+
+COLUMNAS = ("ultimo", "fecha", "cagr", "yoy", "qoq", "pendiente", "volatilidad", "cv", "n")
+# Periodos por año de cada frecuencia (para el YoY)
+PERIODOS_POR_AÑO = {"annual": 1, "quarterly": 4}
+DIAS_POR_AÑO = 365.25
+
+
+def _matriz(metricas: dict) -> tuple:
+    """
+    Convierte {métrica: [{"period", "v"}, ...]} en (nombres, fechas, valores): matrices
+    métricas x periodos en orden ascendente, alineadas a la derecha y rellenas con NaN.
+    """
+    nombres, columnas = [], []
+    for nombre, puntos in metricas.items():
+        if not (isinstance(puntos, list) and puntos and isinstance(puntos[0], dict)):
+            continue
+        periodos = columna_periodos(puntos)
+        if periodos is None:
+            continue
+        try:
+            valores = np.array([p.get("v") for p in puntos], dtype="float64")
+        except (TypeError, ValueError):
+            continue
+        orden = np.argsort(periodos, kind="stable")
+        nombres.append(nombre)
+        columnas.append((periodos[orden], valores[orden]))
+
+    largo = max((len(p) for p, _ in columnas), default=0)
+    fechas = np.full((len(columnas), largo), np.nan)
+    valores = np.full((len(columnas), largo), np.nan)
+    for i, (p, v) in enumerate(columnas):
+        # Fechas en años (float) para poder operar con NaN en la misma matriz
+        fechas[i, largo - len(p):] = p.astype("int64") / DIAS_POR_AÑO
+        valores[i, largo - len(v):] = v
+    fechas[np.isnan(valores)] = np.nan
+    return nombres, fechas, valores
+
+
+def _variacion(nuevo: np.ndarray, anterior: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultado = (nuevo - anterior) / np.abs(anterior)
+    resultado[~np.isfinite(resultado)] = np.nan
+    return resultado
+
+
+def _ultimo_indice(valores: np.ndarray) -> np.ndarray:
+    # Índice del último valor no NaN de cada fila (-1 si no hay ninguno)
+    validos = ~np.isnan(valores)
+    ultimo = valores.shape[1] - 1 - np.argmax(validos[:, ::-1], axis=1)
+    ultimo[~validos.any(axis=1)] = -1
+    return ultimo
+
+
+def _primer_indice(valores: np.ndarray) -> np.ndarray:
+    validos = ~np.isnan(valores)
+    primero = np.argmax(validos, axis=1)
+    primero[~validos.any(axis=1)] = -1
+    return primero
+
+
+def calcular_indicadores(fechas: np.ndarray, valores: np.ndarray, periodos_por_año: int) -> Dict[str, np.ndarray]:
+    """Indicadores de todas las filas de la matriz a la vez. Cada resultado es un array por métrica."""
+    filas = np.arange(valores.shape[0])
+    n = (~np.isnan(valores)).sum(axis=1)
+    ultimo_i = _ultimo_indice(valores)
+    primero_i = _primer_indice(valores)
+    ultimo = np.where(ultimo_i >= 0, valores[filas, ultimo_i], np.nan)
+    primero = np.where(primero_i >= 0, valores[filas, primero_i], np.nan)
+    fecha_ultima = np.where(ultimo_i >= 0, fechas[filas, ultimo_i], np.nan)
+    fecha_primera = np.where(primero_i >= 0, fechas[filas, primero_i], np.nan)
+
+    # CAGR entre el primer y el último valor positivos
+    años = fecha_ultima - fecha_primera
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = np.where((primero > 0) & (ultimo > 0) & (años > 0), (ultimo / primero) ** (1 / años) - 1, np.nan)
+
+    def atras(k: int) -> np.ndarray:
+        # Valor k posiciones antes del último de cada fila
+        indice = ultimo_i - k
+        return np.where(indice >= 0, valores[filas, np.clip(indice, 0, None)], np.nan)
+
+    yoy = _variacion(ultimo, atras(periodos_por_año))
+    qoq = _variacion(ultimo, atras(1)) if periodos_por_año > 1 else np.full(len(filas), np.nan)
+
+    # Pendiente de la regresión lineal por filas, ignorando los NaN
+    validos = ~np.isnan(valores)
+    # Las filas sin datos suficientes dan NaN; no hace falta avisar de cada una
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        x_media = np.nanmean(fechas, axis=1, keepdims=True)
+        y_media = np.nanmean(valores, axis=1, keepdims=True)
+        dx = np.where(validos, fechas - x_media, 0.0)
+        dy = np.where(validos, valores - y_media, 0.0)
+        pendiente = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        pendiente[n < 2] = np.nan
+
+        cambios = _variacion(valores[:, 1:], valores[:, :-1])
+        volatilidad = np.where((~np.isnan(cambios)).sum(axis=1) >= 2, np.nanstd(cambios, axis=1), np.nan)
+        cv = np.nanstd(valores, axis=1) / np.abs(y_media[:, 0])
+    cv[~np.isfinite(cv) | (n < 2)] = np.nan
+
+    return {
+        "ultimo": ultimo, "fecha": fecha_ultima, "cagr": cagr, "yoy": yoy, "qoq": qoq,
+        "pendiente": pendiente, "volatilidad": volatilidad, "cv": cv, "n": n,
+    }
+
+
+def _redondear(valor: float):
+    if valor is None or not np.isfinite(valor):
+        return None
+    return float(f"{valor:.4g}")
+
+
+def calcular_features(series: dict) -> dict:
+    """
+    Tabla de indicadores por frecuencia a partir de data["series"]:
+        {"annual": {"columnas": [...], "metricas": {"eps": [ultimo, fecha, cagr, ...], ...}}, ...}
+    """
+    if not isinstance(series, dict):
+        return {}
+
+    tabla = {}
+    for frecuencia, metricas in series.items():
+        if not isinstance(metricas, dict):
+            continue
+        nombres, fechas, valores = _matriz(metricas)
+        if not nombres:
+            continue
+        indicadores = calcular_indicadores(fechas, valores, PERIODOS_POR_AÑO.get(frecuencia, 1))
+        fechas_ultimas = indicadores["fecha"]
+        filas = {}
+        for i, nombre in enumerate(nombres):
+            if indicadores["n"][i] == 0:
+                continue
+            fila = []
+            for columna in COLUMNAS:
+                if columna == "fecha":
+                    dias = fechas_ultimas[i] * DIAS_POR_AÑO
+                    fila.append(None if np.isnan(dias) else str(np.datetime64(int(round(dias)), "D")))
+                elif columna == "n":
+                    fila.append(int(indicadores["n"][i]))
+                else:
+                    fila.append(_redondear(indicadores[columna][i]))
+            filas[nombre] = fila
+        tabla[frecuencia] = {"columnas": list(COLUMNAS), "metricas": filas}
+    return tabla
+
+
+def con_features(data: dict) -> dict:
+    """Sustituye data["series"] por la tabla de indicadores data["features"]."""
+    if not isinstance(data, dict) or "series" not in data:
+        return data
+    resultado = {clave: valor for clave, valor in data.items() if clave != "series"}
+    resultado["features"] = calcular_features(data["series"])
+    if FINNHUB_RAW_SERIES:
+        resultado["series"] = data["series"]
+    return resultado
@@ -0,0 +1,258 @@
+"""
+Almacén columnar en disco de las series de fundamentales de Finnhub (/stock/metric).
+
+Las series annual/quarterly solo existían como listas de {"period", "v"} dentro del JSON de la
+respuesta. Aquí cada métrica se guarda como una columna compacta:
+    <SERIES_STORE_PATH>/<SÍMBOLO>/<annual|quarterly>/<métrica>.npy
+un array estructurado (period: datetime64[D], v: float64) ordenado por fecha, en formato .npy,
+que se lee con memory-map sin parsear JSON.
+
+- extract_financial_information_company escribe cada respuesta con guardar_series(): los puntos
+  nuevos se fusionan con los que ya había (si un periodo se repite gana el valor nuevo), así que
+  el histórico crece de forma incremental. Si la respuesta no ha cambiado no se escribe nada.
+- Los análisis leen solo las columnas y el rango de fechas que necesitan con leer_series().
+  El rango se busca por búsqueda binaria sobre el memory-map y se devuelve una copia, para no
+  dejar el fichero abierto (en Windows no se podría reemplazar mientras tanto).
+
+Uso desde la línea de comandos:
+    python series_store.py                          # símbolos guardados
+    python series_store.py AAPL                     # métricas de AAPL
+    python series_store.py AAPL quarterly eps pe    # valores de esas columnas
+"""
+from dotenv import load_dotenv
+from typing import Dict, Iterable, Optional
+from urllib.parse import quote, unquote
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+from series_window import columna_periodos
+
+load_dotenv()
+
+# Configuración del almacén (se puede ajustar en el .env)
+SERIES_STORE_ENABLED = os.getenv("SERIES_STORE_ENABLED", "true").lower() not in ("0", "false", "no")
+SERIES_STORE_PATH = os.path.expanduser(os.getenv("SERIES_STORE_PATH", os.path.join("~", ".cache", "tfg", "series")))
+
+COLUMNA = np.dtype([("period", "datetime64[D]"), ("v", "float64")])
+FRECUENCIAS = ("annual", "quarterly")
+
+
+def _fecha(valor) -> Optional[np.datetime64]:
+    return None if valor is None else np.datetime64(valor, "D")
+
+
+class SeriesStore:
+    """Columnas period/v por símbolo, frecuencia y métrica, en ficheros .npy memory-mappables."""
+
+    def __init__(self, path: str = SERIES_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalizar(symbol: str) -> str:
+        return symbol.strip().upper()
+
+    def _ruta(self, symbol: str, frecuencia: str, metrica: str = None) -> str:
+        carpeta = os.path.join(self.path, quote(self.normalizar(symbol), safe=""), frecuencia)
+        # Los nombres de métrica de Finnhub pueden llevar "/" (p. ej. "ev/ebitda")
+        return carpeta if metrica is None else os.path.join(carpeta, quote(metrica, safe="") + ".npy")
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    @staticmethod
+    def columna(puntos: list) -> Optional[np.ndarray]:
+        """Convierte una lista de {"period", "v"} en una columna ordenada, o None si no es una serie."""
+        if not (isinstance(puntos, list) and puntos and isinstance(puntos[0], dict)):
+            return None
+        periodos = columna_periodos(puntos)
+        if periodos is None:
+            # Algún periodo no es una fecha: se guardan solo los puntos válidos
+            puntos = [p for p in puntos if isinstance(p, dict) and columna_periodos([p]) is not None]
+            if not puntos:
+                return None
+            periodos = columna_periodos(puntos)
+        try:
+            valores = np.array([p.get("v") for p in puntos], dtype="float64")  # None -> NaN
+        except (TypeError, ValueError):
+            return None
+
+        columna = np.empty(len(puntos), dtype=COLUMNA)
+        columna["period"] = periodos
+        columna["v"] = valores
+        return columna[np.argsort(columna["period"], kind="stable")]
+
+    @staticmethod
+    def fusionar(existente: Optional[np.ndarray], nueva: np.ndarray) -> np.ndarray:
+        """Une dos columnas ordenadas; si un periodo está en las dos se queda el valor de la nueva."""
+        if existente is None or len(existente) == 0:
+            unida = nueva
+        else:
+            unida = np.concatenate([existente, nueva])
+            # El orden estable deja los puntos nuevos detrás de los antiguos con el mismo periodo
+            unida = unida[np.argsort(unida["period"], kind="stable")]
+        ultimo = np.ones(len(unida), dtype=bool)
+        ultimo[:-1] = unida["period"][1:] != unida["period"][:-1]
+        return unida[ultimo]
+
+    @staticmethod
+    def _iguales(a: Optional[np.ndarray], b: np.ndarray) -> bool:
+        return (a is not None and len(a) == len(b) and np.array_equal(a["period"], b["period"])
+                and np.array_equal(a["v"], b["v"], equal_nan=True))
+
+    def _huella(self, series: dict) -> str:
+        return hashlib.sha1(json.dumps(series, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def guardar(self, symbol: str, data: dict) -> int:
+        """Añade las series de una respuesta de /stock/metric. Devuelve cuántas columnas han cambiado."""
+        series = data.get("series") if isinstance(data, dict) else None
+        if not isinstance(series, dict):
+            return 0
+
+        ruta_huella = os.path.join(self.path, quote(self.normalizar(symbol), safe=""), "huella")
+        huella = self._huella(series)
+        try:
+            with open(ruta_huella, encoding="utf-8") as f:
+                if f.read() == huella:
+                    return 0
+        except OSError:
+            pass
+
+        cambiadas = 0
+        with self._lock:
+            for frecuencia, metricas in series.items():
+                if not isinstance(metricas, dict):
+                    continue
+                os.makedirs(self._ruta(symbol, frecuencia), exist_ok=True)
+                for metrica, puntos in metricas.items():
+                    nueva = self.columna(puntos)
+                    if nueva is None:
+                        continue
+                    existente = self._cargar(symbol, frecuencia, metrica, mmap=False)
+                    unida = self.fusionar(existente, nueva)
+                    if self._iguales(existente, unida):
+                        continue
+                    self._escribir(self._ruta(symbol, frecuencia, metrica), unida)
+                    cambiadas += 1
+            self._escribir_texto(ruta_huella, huella)
+        return cambiadas
+
+    @staticmethod
+    def _escribir(ruta: str, columna: np.ndarray):
+        # Escritura atómica: los lectores ven la columna anterior o la nueva, nunca una a medias
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "wb") as f:
+            np.save(f, columna, allow_pickle=False)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def _escribir_texto(ruta: str, texto: str):
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporal, ruta)
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def _cargar(self, symbol: str, frecuencia: str, metrica: str, mmap: bool = True) -> Optional[np.ndarray]:
+        try:
+            return np.load(self._ruta(symbol, frecuencia, metrica), mmap_mode="r" if mmap else None,
+                           allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def leer(self, symbol: str, frecuencia: str, metrica: str, desde=None, hasta=None,
+             last: int = None) -> Optional[np.ndarray]:
+        """
+        Columna de una métrica entre desde y hasta (incluidos; fechas ISO, date o datetime64),
+        como mucho los last puntos más recientes. None si la métrica no está guardada.
+        """
+        columna = self._cargar(symbol, frecuencia, metrica)
+        if columna is None:
+            return None
+        periodos = columna["period"]
+        desde, hasta = _fecha(desde), _fecha(hasta)
+        inicio = 0 if desde is None else int(np.searchsorted(periodos, desde, side="left"))
+        fin = len(periodos) if hasta is None else int(np.searchsorted(periodos, hasta, side="right"))
+        if last is not None:
+            inicio = max(inicio, fin - last)
+        # Copia del rango pedido: así se libera el memory-map al salir
+        return np.array(columna[inicio:fin])
+
+    def leer_columnas(self, symbol: str, frecuencia: str, metricas: Iterable[str] = None, desde=None,
+                      hasta=None, last: int = None) -> Dict[str, np.ndarray]:
+        """Varias columnas de un símbolo (todas las guardadas si metricas es None)."""
+        if metricas is None:
+            metricas = self.metricas(symbol, frecuencia)
+        resultado = {}
+        for metrica in metricas:
+            columna = self.leer(symbol, frecuencia, metrica, desde, hasta, last)
+            if columna is not None:
+                resultado[metrica] = columna
+        return resultado
+
+    def metricas(self, symbol: str, frecuencia: str) -> list:
+        try:
+            nombres = os.listdir(self._ruta(symbol, frecuencia))
+        except OSError:
+            return []
+        return sorted(unquote(n[:-4]) for n in nombres if n.endswith(".npy"))
+
+    def simbolos(self) -> list:
+        try:
+            return sorted(unquote(n) for n in os.listdir(self.path)
+                          if os.path.isdir(os.path.join(self.path, n)))
+        except OSError:
+            return []
+
+
+_store: Optional[SeriesStore] = None
+_store_lock = threading.Lock()
+
+
+def get_series_store() -> SeriesStore:
+    """Devuelve el almacén compartido del proceso (lo crea la primera vez)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            os.makedirs(SERIES_STORE_PATH, exist_ok=True)
+            _store = SeriesStore()
+        return _store
+
+
+def guardar_series(symbol: str, data: dict) -> int:
+    """Punto de entrada para tools.py: respeta SERIES_STORE_ENABLED y nunca interrumpe la tool."""
+    if not SERIES_STORE_ENABLED:
+        return 0
+    try:
+        return get_series_store().guardar(symbol, data)
+    except Exception as e:
+        print(f"Error guardando las series de {symbol}: {e}", file=sys.stderr)
+        return 0
+
+
+def leer_series(symbol: str, frecuencia: str = "annual", metricas: Iterable[str] = None, desde=None,
+                hasta=None, last: int = None) -> Dict[str, np.ndarray]:
+    """Columnas guardadas de un símbolo: {métrica: array con campos "period" y "v"}."""
+    return get_series_store().leer_columnas(symbol, frecuencia, metricas, desde, hasta, last)
+
+
+if __name__ == "__main__":
+    store = get_series_store()
+    if len(sys.argv) == 1:
+        print(json.dumps(store.simbolos(), ensure_ascii=False))
+    elif len(sys.argv) == 2:
+        print(json.dumps({f: store.metricas(sys.argv[1], f) for f in FRECUENCIAS}, indent=2, ensure_ascii=False))
+    else:
+        frecuencia = sys.argv[2]
+        columnas = leer_series(sys.argv[1], frecuencia, sys.argv[3:] or None)
+        for metrica, columna in columnas.items():
+            print(metrica)
+            for periodo, valor in columna:
+                print(f"  {periodo}  {valor}")
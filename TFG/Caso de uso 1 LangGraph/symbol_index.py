@@ -0,0 +1,304 @@
+"""
+Índice local de símbolos para resolver el nombre de una empresa sin llamar a Finnhub /search.
+
+La lista de símbolos de la bolsa (Finnhub /stock/symbol) se descarga una vez, se guarda
+comprimida en ~/.cache/tfg (compartida por todos los casos) y se carga en memoria con:
+- un diccionario por nombre normalizado ("Apple Inc." -> "APPLE") y otro por ticker,
+- una lista ordenada de nombres para búsquedas por prefijo,
+- un índice de trigramas para búsquedas aproximadas (errores de escritura).
+Solo cuando no hay una coincidencia fiable se recurre a la búsqueda remota. Los nombres que
+tampoco encuentra Finnhub se recuerdan un tiempo (caché negativa) para no repetir la búsqueda.
+La lectura, la construcción del índice y la escritura del fichero se hacen fuera del event loop
+(run_blocking), y las búsquedas concurrentes que encuentran el índice sin cargar comparten una
+única carga o descarga (single-flight).
+
+Uso desde la línea de comandos:
+    python symbol_index.py Apple Microsoft "Alphabet Inc" TSLA
+"""
+from collections import Counter
+from dotenv import load_dotenv
+from typing import Optional
+import bisect
+import gzip
+import json
+import os
+import sys
+import time
+import unicodedata
+
+from fixtures import fixtures_activas
+from http_client import get_json, run_blocking
+from rate_limiter import PRIORIDAD_BAJA
+from singleflight import get_singleflight
+
+load_dotenv()
+
+# Configuración del índice (se puede ajustar en el .env)
+SYMBOL_INDEX_EXCHANGE = os.getenv("SYMBOL_INDEX_EXCHANGE", "US")
+SYMBOL_INDEX_PATH = os.path.expanduser(os.getenv(
+    "SYMBOL_INDEX_PATH", os.path.join("~", ".cache", "tfg", f"symbols_{SYMBOL_INDEX_EXCHANGE}.json.gz")))
+SYMBOL_INDEX_TTL = float(os.getenv("SYMBOL_INDEX_TTL", str(7 * 24 * 3600)))  # Segundos hasta volver a descargar la lista
+SYMBOL_NEGATIVE_TTL = float(os.getenv("SYMBOL_NEGATIVE_TTL", "3600"))  # Segundos que se recuerda un nombre no encontrado
+SYMBOL_FUZZY_MIN_SCORE = float(os.getenv("SYMBOL_FUZZY_MIN_SCORE", "0.8"))  # Similitud mínima (Dice de trigramas)
+
+# Devuelto por resolve cuando el nombre ya se buscó hace poco y no existe
+NO_ENCONTRADO = "__NO_ENCONTRADO__"
+
+# Palabras que no distinguen a una empresa ("Apple Inc." y "APPLE INC" son la misma)
+SUFIJOS_EMPRESA = {
+    "INC", "INCORPORATED", "CORP", "CORPORATION", "CO", "COMPANY", "COS", "LTD", "LIMITED", "PLC",
+    "LLC", "LP", "HOLDINGS", "HOLDING", "HLDGS", "GROUP", "SA", "NV", "AG", "SE", "THE",
+    "ADR", "SPONSORED", "COMMON", "STOCK", "SHARES", "ORD", "NEW", "DE",
+}
+MARCADORES_CLASE = {"CLASS", "CL"}
+
+
+def normalizar_nombre(nombre: str) -> str:
+    """Pasa un nombre de empresa a su forma canónica: mayúsculas, sin acentos, signos ni sufijos."""
+    nombre = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii").upper()
+    tokens = "".join(c if c.isalnum() else " " for c in nombre).split()
+    resultado = []
+    saltar_siguiente = False
+    for token in tokens:
+        if saltar_siguiente:
+            saltar_siguiente = False
+            if len(token) == 1:
+                continue
+        if token in MARCADORES_CLASE:
+            # "CLASS A", "CL B": la clase de la acción no forma parte del nombre
+            saltar_siguiente = True
+            continue
+        if token in SUFIJOS_EMPRESA:
+            continue
+        resultado.append(token)
+    # Si todo eran sufijos (p. ej. "The Company"), se conserva el nombre sin ellos
+    return " ".join(resultado or tokens)
+
+
+def trigramas(texto: str) -> set:
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def prioridad(entrada: dict) -> tuple:
+    # Entre varios símbolos con el mismo nombre se prefiere la acción ordinaria cotizada en un
+    # mercado principal y con el ticker más corto (AAPL antes que AAPL.MX o un warrant)
+    mic = entrada.get("mic") or ""
+    return (
+        entrada.get("type") != "Common Stock",
+        mic.startswith("OOTC") or mic == "",
+        "." in entrada["symbol"] or "-" in entrada["symbol"],
+        len(entrada["symbol"]),
+        entrada["symbol"],
+    )
+
+
+class SymbolIndex:
+    """Índice en memoria de los símbolos de una bolsa, con búsqueda exacta, por prefijo y aproximada."""
+
+    def __init__(self, entradas: list):
+        self.por_nombre: dict = {}
+        self.por_ticker: dict = {}
+        for entrada in entradas:
+            symbol = entrada.get("symbol")
+            if not symbol:
+                continue
+            self.por_ticker[symbol.upper()] = entrada
+            nombre = normalizar_nombre(entrada.get("description") or "")
+            if nombre:
+                self.por_nombre.setdefault(nombre, []).append(entrada)
+
+        for candidatos in self.por_nombre.values():
+            candidatos.sort(key=prioridad)
+        self.nombres = sorted(self.por_nombre)
+
+        self._trigramas: dict = {}
+        for nombre in self.nombres:
+            for t in trigramas(nombre):
+                self._trigramas.setdefault(t, []).append(nombre)
+
+    def __len__(self) -> int:
+        return len(self.por_ticker)
+
+    def por_prefijo(self, prefijo: str, limite: int = 20) -> list:
+        """Nombres normalizados que empiezan por el prefijo (palabras completas o no)."""
+        inicio = bisect.bisect_left(self.nombres, prefijo)
+        resultado = []
+        for nombre in self.nombres[inicio:]:
+            if not nombre.startswith(prefijo) or len(resultado) >= limite:
+                break
+            resultado.append(nombre)
+        return resultado
+
+    def aproximados(self, nombre: str, limite: int = 5) -> list:
+        """Nombres más parecidos según el coeficiente de Dice de sus trigramas: [(puntuación, nombre)]."""
+        consulta = trigramas(nombre)
+        coincidencias = Counter()
+        for t in consulta:
+            coincidencias.update(self._trigramas.get(t, ()))
+        puntuados = [
+            (2 * comunes / (len(consulta) + len(trigramas(candidato))), candidato)
+            for candidato, comunes in coincidencias.most_common(limite * 10)
+        ]
+        puntuados.sort(reverse=True)
+        return puntuados[:limite]
+
+    def buscar(self, company: str) -> Optional[str]:
+        """Devuelve el símbolo de la empresa si hay una coincidencia fiable, o None."""
+        nombre = normalizar_nombre(company)
+        if not nombre:
+            return None
+
+        # 1. Nombre exacto
+        candidatos = self.por_nombre.get(nombre)
+        if candidatos:
+            return candidatos[0]["symbol"]
+
+        # 2. Ticker escrito tal cual ("AAPL"); solo si viene en mayúsculas, para que "Ford" no sea FORD
+        consulta = company.strip()
+        if consulta.isupper() and consulta.upper() in self.por_ticker:
+            return self.por_ticker[consulta.upper()]["symbol"]
+
+        # 3. Prefijo por palabras completas ("Amazon" -> "AMAZON COM"): fiable si solo hay
+        #    una acción ordinaria cotizada que encaje
+        cotizadas = []
+        for candidato in self.por_prefijo(nombre + " "):
+            mejor = self.por_nombre[candidato][0]
+            if not any(prioridad(mejor)[:2]):
+                cotizadas.append(mejor)
+        if len(cotizadas) == 1:
+            return cotizadas[0]["symbol"]
+
+        # 4. Aproximada: la mejor tiene que ser muy parecida y claramente mejor que la segunda
+        puntuados = self.aproximados(nombre, limite=2)
+        if puntuados and puntuados[0][0] >= SYMBOL_FUZZY_MIN_SCORE:
+            if len(puntuados) == 1 or puntuados[0][0] - puntuados[1][0] >= 0.1:
+                return self.por_nombre[puntuados[0][1]][0]["symbol"]
+        return None
+
+
+class SymbolResolver:
+    """Índice local + recuerdo de las búsquedas remotas (positivas y negativas) del proceso."""
+
+    def __init__(self, path: str = SYMBOL_INDEX_PATH, exchange: str = SYMBOL_INDEX_EXCHANGE):
+        self.path = path
+        self.exchange = exchange
+        self.index: Optional[SymbolIndex] = None
+        self._cargado_en = 0.0
+        self._remotos: dict = {}  # Nombre normalizado -> símbolo encontrado por la búsqueda remota
+        self._no_encontrados: dict = {}  # Nombre normalizado -> instante en que se buscó sin éxito
+        self.stats = {"indice": 0, "recordados": 0, "negativos": 0, "remotos": 0}
+
+    def _cargar_de_disco(self) -> bool:
+        # Bloqueante (gzip, json y construcción del índice): se llama desde run_blocking
+        try:
+            if time.time() - os.path.getmtime(self.path) > SYMBOL_INDEX_TTL:
+                return False
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                self.index = SymbolIndex(json.load(f))
+            self._cargado_en = time.time()
+            return True
+        except (OSError, ValueError):
+            return False
+
+    async def _descargar(self):
+        url = "https://finnhub.io/api/v1/stock/symbol"
+        entradas = await get_json(url, params={"exchange": self.exchange, "token": os.getenv('FINHUB_API_KEY')},
+                                  priority=PRIORIDAD_BAJA)
+        if not isinstance(entradas, list) or not entradas:
+            raise ValueError(f"Respuesta inesperada de /stock/symbol: {str(entradas)[:200]}")
+
+        # Solo se guardan los campos que usa el índice
+        campos = ("symbol", "description", "type", "mic")
+        entradas = [{k: e.get(k) for k in campos} for e in entradas]
+        self.index = await run_blocking(SymbolIndex, entradas)
+        self._cargado_en = time.time()
+        if fixtures_activas():
+            # En record/replay la lista viene de la fixture y no se mezcla con la caché del usuario
+            return
+        await run_blocking(self._guardar, entradas)
+
+    def _guardar(self, entradas: list):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporal = f"{self.path}.{os.getpid()}.tmp"
+        with gzip.open(temporal, "wt", encoding="utf-8") as f:
+            json.dump(entradas, f, separators=(",", ":"))
+        os.replace(temporal, self.path)
+
+    async def ensure_index(self) -> Optional[SymbolIndex]:
+        """Carga el índice (de disco o de Finnhub) la primera vez o cuando caduca."""
+        if self.index is not None and time.time() - self._cargado_en <= SYMBOL_INDEX_TTL:
+            return self.index
+        # Las búsquedas que llegan mientras se carga esperan a la misma carga en vez de repetirla
+        return await get_singleflight("symbol_index").do(self.path, self._cargar)
+
+    async def _cargar(self) -> Optional[SymbolIndex]:
+        if fixtures_activas() or not await run_blocking(self._cargar_de_disco):
+            try:
+                await self._descargar()
+            except Exception as e:
+                # Sin índice se sigue funcionando con la búsqueda remota; se reintenta más tarde
+                print(f"No se pudo descargar la lista de símbolos de Finnhub: {e}", file=sys.stderr)
+                self._cargado_en = time.time() - SYMBOL_INDEX_TTL + SYMBOL_NEGATIVE_TTL
+        return self.index
+
+    async def resolve(self, company: str) -> Optional[str]:
+        """
+        Devuelve el símbolo si se puede resolver en local, NO_ENCONTRADO si el nombre se buscó
+        hace poco sin éxito, o None si hay que recurrir a la búsqueda remota.
+        """
+        nombre = normalizar_nombre(company)
+        if nombre in self._remotos:
+            self.stats["recordados"] += 1
+            return self._remotos[nombre]
+
+        instante = self._no_encontrados.get(nombre)
+        if instante is not None:
+            if time.time() - instante <= SYMBOL_NEGATIVE_TTL:
+                self.stats["negativos"] += 1
+                return NO_ENCONTRADO
+            del self._no_encontrados[nombre]
+
+        index = await self.ensure_index()
+        symbol = index.buscar(company) if index is not None else None
+        if symbol:
+            self.stats["indice"] += 1
+            return symbol
+
+        self.stats["remotos"] += 1
+        return None
+
+    def recordar(self, company: str, symbol: Optional[str]):
+        """Guarda el resultado de la búsqueda remota; symbol=None lo registra como no encontrado."""
+        nombre = normalizar_nombre(company)
+        if symbol:
+            self._remotos[nombre] = symbol
+        else:
+            self._no_encontrados[nombre] = time.time()
+
+
+_resolver: Optional[SymbolResolver] = None
+
+
+def get_symbol_resolver() -> SymbolResolver:
+    """Devuelve el resolvedor compartido del proceso."""
+    global _resolver
+    if _resolver is None:
+        _resolver = SymbolResolver()
+    return _resolver
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    async def main():
+        resolver = get_symbol_resolver()
+        inicio = time.perf_counter()
+        index = await resolver.ensure_index()
+        print(f"Índice: {len(index) if index else 0} símbolos, cargado en {time.perf_counter() - inicio:.2f} s")
+        for company in sys.argv[1:]:
+            inicio = time.perf_counter()
+            symbol = await resolver.resolve(company)
+            print(f"  {company!r} -> {symbol or 'sin coincidencia fiable'} ({(time.perf_counter() - inicio) * 1e6:.0f} µs)")
+
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+"""
+Sesión de yfinance compartida por el proceso y persistida entre ejecuciones.
+
+Yahoo Finance exige una cookie y un "crumb" en cada petición. yfinance los negocia la primera vez
+que se usa en cada proceso (fc.yahoo.com + /v1/test/getcrumb), y como los servidores MCP por
+stdio se arrancan de nuevo en cada análisis, ese coste se pagaba una y otra vez. Aquí:
+- Todos los yf.Ticker del proceso usan la misma sesión HTTP de yfinance (YfData es único por
+  proceso) y sus cachés (cookie, zonas horarias) se guardan en YFINANCE_CACHE_DIR.
+- El crumb se guarda en disco junto con la cookie a la que pertenece y, al arrancar, se
+  restaura si no ha caducado (YFINANCE_CRUMB_TTL) y la cookie cargada es la misma.
+- Si Yahoo rechaza el crumb (caducado o revocado) se descarta, se negocia uno nuevo y la
+  llamada se repite una vez.
+- precalentar_en_segundo_plano() negocia cookie y crumb al arrancar el servidor, antes de la
+  primera tool.
+
+Se usan atributos internos de yfinance (YfData._crumb, YfData._cookie); si cambian en otra
+versión, la sesión sigue funcionando como antes y solo se pierde la persistencia del crumb.
+"""
+from dotenv import load_dotenv
+from typing import Any, Callable
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+import yfinance as yf
+
+load_dotenv()
+
+# Configuración de la sesión (se puede ajustar en el .env)
+YFINANCE_SESSION_PERSIST = os.getenv("YFINANCE_SESSION_PERSIST", "true").lower() not in ("0", "false", "no")
+YFINANCE_SESSION_PATH = os.path.expanduser(
+    os.getenv("YFINANCE_SESSION_PATH", os.path.join("~", ".cache", "tfg", "yfinance_sesion.json")))
+YFINANCE_CACHE_DIR = os.path.expanduser(os.getenv("YFINANCE_CACHE_DIR", os.path.join("~", ".cache", "tfg", "yfinance")))
+YFINANCE_CRUMB_TTL = float(os.getenv("YFINANCE_CRUMB_TTL", str(24 * 3600)))  # Segundos que se reutiliza un crumb guardado
+
+_lock = threading.Lock()
+_preparada = False
+_guardado = None  # (crumb, cookie) escritos por última vez
+metricas = {"crumb_restaurado": 0, "crumb_guardado": 0, "renovaciones": 0}
+
+
+def _datos():
+    # Objeto único de yfinance con la sesión, la cookie y el crumb del proceso
+    from yfinance.data import YfData
+    return YfData()
+
+
+def _valor_cookie(cookie) -> str:
+    return getattr(cookie, "value", None)
+
+
+def preparar_sesion():
+    """Configura las cachés de yfinance y restaura el crumb guardado (solo la primera vez)."""
+    global _preparada
+    with _lock:
+        if _preparada:
+            return
+        _preparada = True
+        try:
+            os.makedirs(YFINANCE_CACHE_DIR, exist_ok=True)
+            yf.set_tz_cache_location(YFINANCE_CACHE_DIR)
+        except Exception as e:
+            print(f"No se pudo usar {YFINANCE_CACHE_DIR} como caché de yfinance: {e}", file=sys.stderr)
+        if YFINANCE_SESSION_PERSIST:
+            _restaurar_crumb()
+
+
+def _restaurar_crumb():
+    global _guardado
+    try:
+        with open(YFINANCE_SESSION_PATH, encoding="utf-8") as f:
+            guardado = json.load(f)
+    except (OSError, ValueError):
+        return
+    if time.time() - guardado.get("guardado", 0) > YFINANCE_CRUMB_TTL:
+        return
+
+    try:
+        datos = _datos()
+        with datos._cookie_lock:
+            # El crumb solo vale con la cookie con la que se obtuvo: se carga la cookie persistida
+            # por yfinance y se comprueba que sea la misma
+            if datos._crumb is not None or not datos._load_cookie_curlCffi():
+                return
+            if _valor_cookie(datos._cookie) != guardado.get("cookie"):
+                datos._cookie = None
+                return
+            datos._crumb = guardado["crumb"]
+            datos._cookie_strategy = "basic"
+        _guardado = (guardado["crumb"], guardado["cookie"])
+        metricas["crumb_restaurado"] += 1
+    except (AttributeError, KeyError) as e:
+        print(f"No se pudo restaurar la sesión de yfinance: {e}", file=sys.stderr)
+
+
+def guardar_sesion():
+    """Guarda el crumb actual si ha cambiado desde la última vez."""
+    global _guardado
+    if not YFINANCE_SESSION_PERSIST:
+        return
+    try:
+        datos = _datos()
+        crumb, cookie = datos._crumb, _valor_cookie(datos._cookie)
+    except AttributeError:
+        return
+    if not crumb or not cookie:
+        # yfinance ha cambiado de estrategia (por ejemplo, tras rechazar el crumb restaurado):
+        # solo "basic" tiene una cookie concreta a la que asociar el crumb, así que el guardado ya no sirve
+        if _guardado is not None:
+            _borrar_guardado()
+        return
+    if (crumb, cookie) == _guardado:
+        return
+    try:
+        os.makedirs(os.path.dirname(YFINANCE_SESSION_PATH) or ".", exist_ok=True)
+        temporal = f"{YFINANCE_SESSION_PATH}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"crumb": crumb, "cookie": cookie, "guardado": time.time()}, f)
+        os.replace(temporal, YFINANCE_SESSION_PATH)
+        _guardado = (crumb, cookie)
+        metricas["crumb_guardado"] += 1
+    except OSError as e:
+        print(f"No se pudo guardar la sesión de yfinance: {e}", file=sys.stderr)
+
+
+def invalidar_sesion():
+    """Descarta cookie y crumb (en memoria y en disco) para que yfinance negocie unos nuevos."""
+    try:
+        datos = _datos()
+        with datos._cookie_lock:
+            datos._crumb = None
+            datos._cookie = None
+    except AttributeError:
+        pass
+    _borrar_guardado()
+
+
+def _borrar_guardado():
+    global _guardado
+    _guardado = None
+    try:
+        os.remove(YFINANCE_SESSION_PATH)
+    except OSError:
+        pass
+
+
+def _es_error_de_crumb(error: Exception) -> bool:
+    texto = str(error).lower()
+    return "crumb" in texto or "401" in texto or "unauthorized" in texto
+
+
+def con_sesion_yfinance(fetch: Callable[[], Any]) -> Any:
+    """
+    Ejecuta fetch() (llamadas bloqueantes a yfinance) con la sesión compartida. Si Yahoo rechaza
+    el crumb, se renueva y se repite una vez.
+    """
+    preparar_sesion()
+    try:
+        resultado = fetch()
+    except Exception as e:
+        if not _es_error_de_crumb(e):
+            raise
+        print(f"Yahoo Finance rechazó el crumb ({e}); se renueva", file=sys.stderr)
+        metricas["renovaciones"] += 1
+        invalidar_sesion()
+        resultado = fetch()
+    guardar_sesion()
+    return resultado
+
+
+def precalentar():
+    """Negocia cookie y crumb ya, para que la primera tool no pague esas peticiones."""
+    try:
+        preparar_sesion()
+        _datos()._get_cookie_and_crumb()
+        guardar_sesion()
+    except Exception as e:
+        print(f"No se pudo precalentar la sesión de yfinance: {e}", file=sys.stderr)
+
+
+def precalentar_en_segundo_plano():
+    threading.Thread(target=precalentar, name="yfinance-precalentar", daemon=True).start()
+
+
+def _imprimir_metricas():
+    # Se escribe en stderr: en los servidores MCP por stdio, stdout es el canal del protocolo
+    if any(metricas.values()):
+        print(f"Sesión yfinance: crumb restaurado {metricas['crumb_restaurado']}, "
+              f"guardado {metricas['crumb_guardado']}, renovaciones {metricas['renovaciones']}", file=sys.stderr)
+
+
+atexit.register(_imprimir_metricas)
@@ -105,11 +105,11 @@ resumidor_sentimientos_agent = ConversableAgent(
 
     FORMATO REQUERIDO:
     - El parámetro debe llamarse "noticias_sentimientos"
-    - Debe ser la lista completa de diccionarios que incluye título, sentimiento, confianza, etc.
+    - Debe ser la lista completa de diccionarios que incluye título, sentimiento, confianza, peso (weight), etc.
 
     EJEMPLO:
-    Si ves: [{'title': 'Noticia 1', 'sentiment': 'Positivo', 'confidence': 0.8, ...}]
-    Entonces llama: resumen_sentimientos_wrapper con noticias_sentimientos=[{'title': 'Noticia 1', 'sentiment': 'Positivo', 'confidence': 0.8, ...}]
+    Si ves: [{'title': 'Noticia 1', 'sentiment': 'Positivo', 'confidence': 0.8, 'weight': 0.5, ...}]
+    Entonces llama: resumen_sentimientos_wrapper con noticias_sentimientos=[{'title': 'Noticia 1', 'sentiment': 'Positivo', 'confidence': 0.8, 'weight': 0.5, ...}]
 
     Tu función es únicamente hacer el resumen estadístico de los sentimientos.""",
     llm_config=azure_llm_config,
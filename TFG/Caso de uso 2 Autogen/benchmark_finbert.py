@@ -0,0 +1,67 @@
+"""
+Benchmark de FinBERT en CPU: artículos por segundo según el tamaño de lote.
+
+Compara la versión anterior (pipeline de transformers llamado una vez por noticia) con la
+clasificación por lotes de finbert.py, con y sin ordenar los textos por longitud, sobre noticias
+sintéticas de longitud variable (titular + descripción, como en analizar_sentimiento_finbert).
+También comprueba que las probabilidades coinciden con las del pipeline.
+
+Uso:
+    python benchmark_finbert.py                     # 128 noticias, lotes 1 8 16 32 64
+    python benchmark_finbert.py 256 4 16 64         # número de noticias y tamaños de lote
+"""
+import random
+import sys
+import time
+
+from finbert import FINBERT_MODEL, get_clasificador
+
+PALABRAS = ("shares", "revenue", "quarter", "guidance", "investors", "profit", "loss", "growth", "market",
+            "analysts", "expect", "record", "decline", "strong", "weak", "outlook", "earnings", "beat",
+            "miss", "forecast", "demand", "supply", "costs", "margin", "rises", "falls", "company", "stock")
+
+
+def noticias_sinteticas(n: int, semilla: int = 0) -> list:
+    aleatorio = random.Random(semilla)
+    textos = []
+    for _ in range(n):
+        titulo = " ".join(aleatorio.choices(PALABRAS, k=aleatorio.randint(6, 14))).capitalize()
+        descripcion = " ".join(aleatorio.choices(PALABRAS, k=aleatorio.randint(10, 90)))
+        textos.append(f"{titulo}. {descripcion}")
+    return textos
+
+
+def medir(funcion) -> tuple:
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    tamaños = [int(valor) for valor in sys.argv[2:]] or [1, 8, 16, 32, 64]
+    textos = noticias_sinteticas(n)
+
+    from transformers import pipeline
+    clasificador = get_clasificador()
+    referencia = pipeline("sentiment-analysis", model=FINBERT_MODEL, top_k=None)
+
+    # Calentamiento fuera de la medida
+    referencia(textos[0])
+    clasificador.clasificar(textos[:8])
+
+    segundos, esperado = medir(lambda: [{r["label"].lower(): r["score"] for r in referencia(texto)[0]}
+                                        for texto in textos])
+    print(f"{'pipeline 1 a 1':22s} {n / segundos:8.1f} artículos/s")
+
+    for tamaño in tamaños:
+        for ordenar in (False, True):
+            segundos, obtenido = medir(lambda: clasificador.clasificar(textos, batch_size=tamaño, ordenar=ordenar))
+            diferencia = max(abs(obtenido[i][etiqueta] - esperado[i][etiqueta])
+                             for i in range(n) for etiqueta in esperado[i])
+            nombre = f"lote {tamaño}{' ordenado' if ordenar else ''}"
+            print(f"{nombre:22s} {n / segundos:8.1f} artículos/s   diferencia máx. con el pipeline {diferencia:.1e}")
+
+
+if __name__ == "__main__":
+    main()
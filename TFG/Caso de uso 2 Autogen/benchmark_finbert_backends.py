@@ -0,0 +1,127 @@
+"""
+Comparación de los motores de FinBERT (torch, onnx, onnx-int8): precisión frente a latencia.
+
+Cada motor se mide en un proceso aparte (para que la memoria de uno no cuente en otro) sobre un
+conjunto fijo de titulares financieros etiquetados a mano:
+- carga: segundos hasta tener el clasificador listo (sin contar la exportación a ONNX, que se
+  hace antes, una sola vez).
+- artículos/s: el conjunto repetido varias veces, en lotes de FINBERT_BATCH_SIZE.
+- memoria: pico de memoria residente del proceso (solo en Linux/macOS).
+- acierto: etiquetas correctas frente a las anotadas.
+- coincidencia y diferencia máx.: etiquetas iguales y mayor diferencia de probabilidad frente
+  al motor torch, que es la referencia.
+
+Uso:
+    python benchmark_finbert_backends.py                    # torch onnx onnx-int8, 20 repeticiones
+    python benchmark_finbert_backends.py 50 torch onnx-int8 # repeticiones y motores
+"""
+import json
+import subprocess
+import sys
+import time
+
+ARTICULOS = (
+    ("Company shares surge after quarterly earnings beat analyst expectations", "positive"),
+    ("Revenue grows 25% year over year driven by strong cloud demand", "positive"),
+    ("The firm raises full-year guidance as margins expand", "positive"),
+    ("Board approves a $10 billion share buyback and a higher dividend", "positive"),
+    ("Net profit doubles on record sales in Asia", "positive"),
+    ("Analysts upgrade the stock to buy citing accelerating growth", "positive"),
+    ("Operating margin improves for the fifth consecutive quarter", "positive"),
+    ("The company wins a multi-year contract with the US government", "positive"),
+    ("Free cash flow hits an all-time high, beating forecasts", "positive"),
+    ("Strong holiday sales lift the retailer's outlook for next year", "positive"),
+    ("Shares plunge after the company cuts its annual forecast", "negative"),
+    ("Quarterly loss widens as costs rise and demand weakens", "negative"),
+    ("Regulators open an investigation into the bank's accounting practices", "negative"),
+    ("The automaker recalls 500,000 vehicles over brake defects", "negative"),
+    ("Credit rating downgraded to junk amid rising debt levels", "negative"),
+    ("Sales fall sharply as the company loses market share to rivals", "negative"),
+    ("The chipmaker warns of lower margins due to supply shortages", "negative"),
+    ("Company announces 10,000 layoffs after a disappointing year", "negative"),
+    ("Profit misses estimates and the stock drops 12% in early trading", "negative"),
+    ("The firm suspends its dividend to preserve cash", "negative"),
+    ("The company will report second-quarter results on July 25", "neutral"),
+    ("Shareholders will vote on the proposed merger next month", "neutral"),
+    ("The firm appoints a new chief financial officer effective June 1", "neutral"),
+    ("The company's annual meeting will be held in Cupertino", "neutral"),
+    ("The stock closed unchanged at $150 on Tuesday", "neutral"),
+    ("The bank operates 1,200 branches across Europe", "neutral"),
+    ("The company files its annual report with the SEC", "neutral"),
+    ("The retailer plans to open a new store in Madrid", "neutral"),
+    ("The chief executive will speak at an industry conference", "neutral"),
+    ("The firm is headquartered in New York and employs 5,000 people", "neutral"),
+)
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def medir_backend(backend: str, repeticiones: int) -> dict:
+    """Se ejecuta en el proceso hijo: carga el motor, mide y devuelve las probabilidades."""
+    from finbert import ClasificadorFinbert, exportar_onnx
+
+    if backend != "torch":
+        # La exportación y la cuantización solo se hacen una vez: no cuentan en la carga
+        exportar_onnx(cuantizado=backend == "onnx-int8")
+    textos = [texto for texto, _ in ARTICULOS]
+
+    inicio = time.perf_counter()
+    clasificador = ClasificadorFinbert(backend=backend)
+    carga = time.perf_counter() - inicio
+    probabilidades = clasificador.clasificar(textos)
+
+    inicio = time.perf_counter()
+    clasificador.clasificar(textos * repeticiones)
+    segundos = time.perf_counter() - inicio
+
+    try:
+        import resource
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        memoria = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        memoria = None
+    return {"backend": backend, "carga": carga, "articulos_s": len(textos) * repeticiones / segundos,
+            "memoria_mb": memoria, "probabilidades": probabilidades}
+
+
+def ejecutar_en_proceso(backend: str, repeticiones: int) -> dict:
+    salida = subprocess.run([sys.executable, __file__, "--medir", backend, str(repeticiones)],
+                            capture_output=True, text=True)
+    if salida.returncode != 0:
+        raise RuntimeError(f"El motor {backend} falló:\n{salida.stderr[-2000:]}")
+    # La última línea es el JSON; las anteriores son mensajes de carga
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def prediccion(probabilidades: dict) -> str:
+    return max(probabilidades, key=probabilidades.get)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--medir":
+        print(json.dumps(medir_backend(sys.argv[2], int(sys.argv[3]))))
+        return
+
+    argumentos = sys.argv[1:]
+    repeticiones = int(argumentos.pop(0)) if argumentos and argumentos[0].isdigit() else 20
+    backends = argumentos or list(BACKENDS)
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+
+    resultados = {backend: ejecutar_en_proceso(backend, repeticiones) for backend in backends}
+    referencia = resultados["torch"]["probabilidades"]
+    etiquetas = [etiqueta for _, etiqueta in ARTICULOS]
+
+    print(f"{len(ARTICULOS)} titulares x {repeticiones} repeticiones")
+    print(f"{'motor':10s} {'carga':>8s} {'art./s':>8s} {'memoria':>9s} {'acierto':>8s} {'coincide':>9s} {'dif. máx.':>10s}")
+    for backend, resultado in resultados.items():
+        probabilidades = resultado["probabilidades"]
+        acierto = sum(prediccion(p) == e for p, e in zip(probabilidades, etiquetas)) / len(etiquetas)
+        coincide = sum(prediccion(p) == prediccion(r) for p, r in zip(probabilidades, referencia)) / len(etiquetas)
+        diferencia = max(abs(p[etiqueta] - r[etiqueta]) for p, r in zip(probabilidades, referencia) for etiqueta in r)
+        memoria = f"{resultado['memoria_mb']:.0f} MB" if resultado["memoria_mb"] is not None else "-"
+        print(f"{backend:10s} {resultado['carga']:7.1f}s {resultado['articulos_s']:8.1f} {memoria:>9s} "
+              f"{acierto:8.0%} {coincide:9.0%} {diferencia:10.1e}")
+
+
+if __name__ == "__main__":
+    main()
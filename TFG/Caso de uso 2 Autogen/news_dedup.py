@@ -0,0 +1,125 @@
+"""
+Agrupación de noticias duplicadas o casi duplicadas antes del análisis de sentimiento.
+
+NewsAPI devuelve muchas copias de la misma noticia de agencia publicadas por medios distintos
+(sourcename). Cada copia pasaba por FinBERT y contaba como una noticia más en
+resumen_sentimientos, así que una sola historia muy redifundida inclinaba el resultado. Aquí las
+noticias se agrupan en historias:
+- Duplicados exactos: misma URL (sin esquema, www, parámetros ni barra final) o mismo título
+  normalizado (minúsculas, solo letras y números).
+- Casi duplicados: MinHash con 128 permutaciones sobre los pares de palabras seguidas de título
+  + descripción. La fracción de permutaciones con el mismo mínimo estima la similitud de Jaccard
+  entre los dos textos, y dos noticias son la misma historia si llega a DEDUP_THRESHOLD. Con
+  textos tan cortos, SimHash separaba peor: una noticia retocada por otro medio y otra distinta
+  del mismo tema quedaban a una distancia parecida. Los textos de menos de DEDUP_MIN_TOKENS
+  palabras solo se agrupan por duplicado exacto, porque su firma no es fiable.
+  NewsAPI devuelve como mucho 100 artículos por petición, así que se comparan todas las parejas
+  de una vez, sin LSH.
+Cada noticia queda marcada con su grupo ("cluster", en orden de aparición) y el tamaño del grupo
+("cluster_size"). analizar_sentimiento_finbert analiza solo la primera noticia de cada grupo,
+copia su sentimiento al resto y da a cada una un peso de 1 / tamaño del grupo, de modo que en
+resumen_sentimientos cada historia cuenta una vez.
+"""
+from dotenv import load_dotenv
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import hashlib
+import os
+import re
+
+import numpy as np
+
+load_dotenv()
+
+# Configuración de la agrupación (se puede ajustar en el .env)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() not in ("0", "false", "no")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))  # Similitud de Jaccard mínima entre casi duplicados
+DEDUP_MIN_TOKENS = int(os.getenv("DEDUP_MIN_TOKENS", "8"))  # Palabras mínimas para comparar por MinHash
+
+SHINGLE = 2  # Palabras por fragmento
+PERMUTACIONES = 128
+_PRIMO = 4294967311  # Primo mayor que 2**32: h(x) = (a * x + b) mod p cabe en 64 bits
+_aleatorio = np.random.default_rng(0)
+_A = _aleatorio.integers(1, 2 ** 31, PERMUTACIONES, dtype="uint64")
+_B = _aleatorio.integers(0, 2 ** 31, PERMUTACIONES, dtype="uint64")
+
+
+def _palabras(texto: str) -> List[str]:
+    return re.findall(r"\w+", (texto or "").lower())
+
+
+def normalizar_url(url: str) -> str:
+    partes = urlsplit((url or "").strip().lower())
+    host = partes.netloc[4:] if partes.netloc.startswith("www.") else partes.netloc
+    return f"{host}{partes.path.rstrip('/')}"
+
+
+def normalizar_titulo(titulo: str) -> str:
+    return " ".join(_palabras(titulo))
+
+
+def minhash(texto: str) -> Optional[np.ndarray]:
+    """Firma MinHash (PERMUTACIONES mínimos) del texto, o None si tiene menos de DEDUP_MIN_TOKENS palabras."""
+    palabras = _palabras(texto)
+    if len(palabras) < DEDUP_MIN_TOKENS:
+        return None
+    shingles = {" ".join(palabras[i:i + SHINGLE]) for i in range(len(palabras) - SHINGLE + 1)}
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                       for s in shingles], dtype="uint64")
+    # Todas las permutaciones sobre todos los fragmentos a la vez (PERMUTACIONES x fragmentos)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIMO).min(axis=1)
+
+
+def similitudes(firmas: np.ndarray) -> np.ndarray:
+    """Jaccard estimado entre todas las parejas de firmas (n x n)."""
+    return (firmas[:, None, :] == firmas[None, :, :]).mean(axis=-1)
+
+
+def grupos(items: List[Dict], umbral: float = None) -> List[int]:
+    """Número de grupo de cada noticia (0, 1, 2... en orden de aparición)."""
+    umbral = DEDUP_THRESHOLD if umbral is None else umbral
+    padre = list(range(len(items)))
+
+    def raiz(i: int) -> int:
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    def unir(i: int, j: int):
+        i, j = raiz(i), raiz(j)
+        if i != j:
+            padre[max(i, j)] = min(i, j)
+
+    # Duplicados exactos por URL o por título
+    vistos: Dict[str, int] = {}
+    for i, item in enumerate(items):
+        for clave in (f"url:{normalizar_url(item.get('url', ''))}", f"titulo:{normalizar_titulo(item.get('title', ''))}"):
+            if clave.endswith(":"):
+                continue
+            if clave in vistos:
+                unir(vistos[clave], i)
+            else:
+                vistos[clave] = i
+
+    # Casi duplicados por MinHash
+    firmas = [minhash(f"{item.get('title') or ''}. {item.get('description') or ''}") for item in items]
+    indices = [i for i, firma in enumerate(firmas) if firma is not None]
+    if umbral <= 1 and len(indices) > 1:
+        parecidas = similitudes(np.stack([firmas[i] for i in indices])) >= umbral
+        for a, b in zip(*np.nonzero(np.triu(parecidas, k=1))):
+            unir(indices[a], indices[b])
+
+    numeros: Dict[int, int] = {}
+    return [numeros.setdefault(raiz(i), len(numeros)) for i in range(len(items))]
+
+
+def anotar_duplicados(items: List[Dict]) -> List[Dict]:
+    """Copia de las noticias con "cluster" y "cluster_size"; con DEDUP_ENABLED=false cada noticia es su propio grupo."""
+    numeros = grupos(items) if DEDUP_ENABLED else list(range(len(items)))
+    tamaños: Dict[int, int] = {}
+    for numero in numeros:
+        tamaños[numero] = tamaños.get(numero, 0) + 1
+    if len(tamaños) < len(items):
+        print(f"{len(items)} noticias agrupadas en {len(tamaños)} historias distintas ({len(items) - len(tamaños)} duplicadas)")
+    return [{**item, "cluster": numero, "cluster_size": tamaños[numero]} for item, numero in zip(items, numeros)]
@@ -0,0 +1,206 @@
+"""
+Caché en disco (SQLite) del sentimiento de cada noticia.
+
+NewsAPI devuelve casi los mismos artículos en ejecuciones seguidas sobre la misma empresa, y
+analizar_sentimiento_finbert volvía a pasarlos todos por FinBERT (y por TextBlob si salían
+neutrales). La caché guarda el resultado final de cada noticia (sentimiento, confianza y modelo
+usado) con estas claves:
+- El hash SHA-256 del texto que se analiza (título + descripción), no la URL: la misma noticia
+  publicada en varios medios se analiza una sola vez, y si el medio la edita se vuelve a analizar.
+- La versión del análisis: modelo de FinBERT, motor (torch, onnx, onnx-int8) y SENTIMENT_VERSION.
+  Al cambiar cualquiera de ellos las entradas antiguas dejan de usarse sin tener que vaciar nada.
+  Si las puntuaciones vienen del servicio de sentimiento (sentiment_service.py), el modelo y el
+  motor son los que informa el servicio, no los del .env del proceso.
+El sentimiento de un texto con un modelo dado no cambia, así que no hay TTL: solo un máximo de
+entradas, expulsando las menos usadas (LRU). Solo las noticias que no están en la caché pasan por
+FinBERT, y si no hay ninguna nueva el modelo ni siquiera se carga.
+
+Por defecto el fichero está en ~/.cache/tfg, así que lo comparten los dos casos de uso.
+
+Uso desde la línea de comandos:
+    python sentiment_cache.py          # estadísticas de la caché
+    python sentiment_cache.py clear    # vaciar la caché
+"""
+from contextlib import closing
+from dotenv import load_dotenv
+from typing import Dict, List, Optional
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from finbert import FINBERT_BACKEND, FINBERT_MODEL
+
+load_dotenv()
+
+# Configuración de la caché (se puede ajustar en el .env)
+SENTIMENT_CACHE_ENABLED = os.getenv("SENTIMENT_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+SENTIMENT_CACHE_PATH = os.path.expanduser(
+    os.getenv("SENTIMENT_CACHE_PATH", os.path.join("~", ".cache", "tfg", "sentimiento.sqlite")))
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", "200000"))  # Noticias máximas guardadas
+
+# Se sube cuando cambia la forma de decidir el sentimiento (umbrales de TextBlob, mapeo de etiquetas...)
+SENTIMENT_VERSION = "1"
+
+# Variables en una misma consulta IN (...); SQLite admite 999 en versiones antiguas
+_BLOQUE = 500
+
+
+def version_analisis(model: str = FINBERT_MODEL, backend: str = FINBERT_BACKEND) -> str:
+    return f"{model}|{backend}|{SENTIMENT_VERSION}"
+
+
+class SentimentCache:
+    """Caché persistente de sentimientos por hash del texto, segura entre hilos y entre procesos."""
+
+    def __init__(self, path: str = SENTIMENT_CACHE_PATH, max_entries: int = SENTIMENT_CACHE_MAX_ENTRIES,
+                 version: str = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version or version_analisis()
+
+        self._lock = threading.Lock()
+        self._inicializada = False
+        self.stats = {"hits": 0, "misses": 0, "errores": 0}
+
+    # ------------------------------------------------------------------
+    # SQLite
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        # Una conexión por operación: son baratas y así la caché se puede usar desde cualquier hilo
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._inicializada:
+            self._crear_tablas(conn)
+        return conn
+
+    def _crear_tablas(self, conn: sqlite3.Connection):
+        with self._lock:
+            if self._inicializada:
+                return
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sentimiento (
+                    clave TEXT PRIMARY KEY,
+                    resultado TEXT NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS sentimiento_accessed ON sentimiento(accessed_at)")
+            conn.commit()
+            self._inicializada = True
+
+    def clave(self, texto: str, version: str = None) -> str:
+        return hashlib.sha256(f"{version or self.version}\0{texto}".encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------------------------
+    def buscar(self, textos: List[str], version: str = None) -> List[Optional[dict]]:
+        """Resultado guardado de cada texto, en el mismo orden ({"sentiment", "confidence", "model"} o None)."""
+        claves = [self.clave(texto, version) for texto in textos]
+        encontrados: Dict[str, dict] = {}
+        try:
+            with closing(self._connect()) as conn:
+                unicas = list(dict.fromkeys(claves))
+                for i in range(0, len(unicas), _BLOQUE):
+                    bloque = unicas[i:i + _BLOQUE]
+                    marcas = ",".join("?" * len(bloque))
+                    for clave, resultado in conn.execute(
+                            f"SELECT clave, resultado FROM sentimiento WHERE clave IN ({marcas})", bloque):
+                        encontrados[clave] = json.loads(resultado)
+                ahora = time.time()
+                conn.executemany("UPDATE sentimiento SET accessed_at = ? WHERE clave = ?",
+                                 [(ahora, clave) for clave in encontrados])
+                conn.commit()
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error leyendo la caché de sentimientos: {e}", file=sys.stderr)
+            self.stats["errores"] += 1
+            return [None] * len(textos)
+
+        resultados = [encontrados.get(clave) for clave in claves]
+        aciertos = sum(resultado is not None for resultado in resultados)
+        self.stats["hits"] += aciertos
+        self.stats["misses"] += len(resultados) - aciertos
+        return resultados
+
+    def guardar(self, resultados: Dict[str, dict], version: str = None):
+        """Guarda {texto: resultado} y aplica la política de expulsión."""
+        if not resultados:
+            return
+        ahora = time.time()
+        filas = [(self.clave(texto, version), json.dumps(resultado, ensure_ascii=False), ahora)
+                 for texto, resultado in resultados.items()]
+        try:
+            with closing(self._connect()) as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO sentimiento(clave, resultado, accessed_at) VALUES (?, ?, ?)", filas)
+                self._expulsar(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error guardando en la caché de sentimientos: {e}", file=sys.stderr)
+            self.stats["errores"] += 1
+
+    def _expulsar(self, conn: sqlite3.Connection):
+        sobran = conn.execute("SELECT COUNT(*) FROM sentimiento").fetchone()[0] - self.max_entries
+        if sobran > 0:
+            conn.execute("DELETE FROM sentimiento WHERE clave IN "
+                         "(SELECT clave FROM sentimiento ORDER BY accessed_at LIMIT ?)", (sobran,))
+
+    def clear(self):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM sentimiento")
+            conn.commit()
+
+    def resumen(self) -> dict:
+        with closing(self._connect()) as conn:
+            entradas = conn.execute("SELECT COUNT(*) FROM sentimiento").fetchone()[0]
+        return {"path": self.path, "version": self.version, "entradas": entradas, "proceso": dict(self.stats)}
+
+
+_cache: Optional[SentimentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_sentiment_cache() -> SentimentCache:
+    """Devuelve la caché compartida del proceso (la crea la primera vez)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            os.makedirs(os.path.dirname(SENTIMENT_CACHE_PATH) or ".", exist_ok=True)
+            _cache = SentimentCache()
+            atexit.register(_imprimir_estadisticas)
+        return _cache
+
+
+def buscar_sentimientos(textos: List[str], version: str = None) -> List[Optional[dict]]:
+    """
+    Punto de entrada para tools.py: resultados guardados de cada texto (todo None si la caché está
+    desactivada). version es la del clasificador que se va a usar; por defecto, la del proceso.
+    """
+    if not SENTIMENT_CACHE_ENABLED:
+        return [None] * len(textos)
+    return get_sentiment_cache().buscar(textos, version)
+
+
+def guardar_sentimientos(resultados: Dict[str, dict], version: str = None):
+    if SENTIMENT_CACHE_ENABLED:
+        get_sentiment_cache().guardar(resultados, version)
+
+
+def _imprimir_estadisticas():
+    if _cache is None or not any(_cache.stats.values()):
+        return
+    s = _cache.stats
+    print(f"Caché de sentimientos: {s['hits']} hits, {s['misses']} misses", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    cache = get_sentiment_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print(f"Caché vaciada: {cache.path}")
+    else:
+        print(json.dumps(cache.resumen(), indent=2, ensure_ascii=False))
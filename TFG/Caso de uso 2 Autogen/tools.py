@@ -1,10 +1,15 @@
 import requests
 import os
+import sys
 from dotenv import load_dotenv
 from typing import List, Dict
 from textblob import TextBlob
 from datetime import datetime
-from transformers import pipeline
+from sentiment_service import get_clasificador, version_clasificador
+from sentiment_cache import buscar_sentimientos, guardar_sentimientos, version_analisis
+from news_dedup import anotar_duplicados
+from rate_limiter import espera_backoff, get_rate_limiter_for_url, RATE_LIMIT_MAX_RETRIES
+from fixtures import con_fixture_sync, peticion_http
 import json
 
 load_dotenv()
@@ -19,12 +24,28 @@ def extract_information_company_newsapi(company:str)-> List[Dict]:
     url=f"https://newsapi.org/v2/everything?q={company}"
     if not os.getenv('NEWSAPI_API_KEY'):
         raise ValueError("NEWSAPI_API_KEY environment variable is not set.")
-    response=requests.get(url,headers=headers)
-    print(response.status_code)
-    data=response.json()
+    def descargar():
+        # NewsAPI tiene una cuota por minuto: se espera turno en el limitador y se reintenta tras un 429
+        limitador=get_rate_limiter_for_url(url)
+        for intento in range(RATE_LIMIT_MAX_RETRIES+1):
+            if limitador is not None:
+                limitador.adquirir_sync()
+            response=requests.get(url,headers=headers)
+            if response.status_code!=429 or limitador is None or intento==RATE_LIMIT_MAX_RETRIES:
+                break
+            espera=espera_backoff(intento, response.headers.get("Retry-After"))
+            print(f"NewsAPI devolvió 429, reintentando en {espera:.1f} s", file=sys.stderr)
+            limitador.penalizar(espera)
+            limitador.registrar_reintento()
+        print(response.status_code)
+        return response.json()
+
+    # Con FIXTURES_MODE=record/replay la respuesta se graba o se lee de disco
+    data=con_fixture_sync("newsapi", peticion_http(url), descargar)
     print(f" Total artículos disponibles: {data.get('totalResults', 'N/A')}")
     print(f" Artículos recibidos: {len(data.get('articles', []))}")
-    datos =filter_newsapi_Data(data)
+    # Las copias de una misma noticia en varios medios se marcan como una sola historia (news_dedup.py)
+    datos =anotar_duplicados(filter_newsapi_Data(data))
     
     
     return datos
@@ -53,23 +74,50 @@ def filter_newsapi_Data(data: dict)->List[Dict]:
 def analizar_sentimiento_finbert(items: List[Dict]) -> List[Dict]:
     resultado= []
     try:
-        if not hasattr(analizar_sentimiento_finbert, 'classifier'):
-            print("Cargando modelo FinBERT especializado en finanzas...")
-            analizar_sentimiento_finbert.classifier = pipeline(
-                "sentiment-analysis",
-                model="ProsusAI/finbert",
-                top_k=None
-            )
-            print("Modelo FinBERT cargado correctamente")
         neutral_analizada = 0
-        print(f"Analizando {len(items)} noticias con FinBERT...")
+        # Solo se analiza la primera noticia de cada historia (news_dedup.py); el resto copia su sentimiento
+        if not all("cluster" in item and "cluster_size" in item for item in items):
+            items = anotar_duplicados(items)
+        representantes = {}
         for item in items:
+            representantes.setdefault(item["cluster"], item)
+        historias = list(representantes.values())
+        textos = [f"{item['title']}. {item.get('description', '')}" for item in historias]
+        # Las noticias ya analizadas en ejecuciones anteriores salen de la caché (sentiment_cache.py),
+        # con la versión (modelo y motor) del clasificador que se va a usar: el servicio o el proceso
+        version = version_clasificador()
+        guardados = buscar_sentimientos(textos, version)
+        pendientes = [i for i, guardado in enumerate(guardados) if guardado is None]
+        print(f"Analizando {len(pendientes)} noticias con FinBERT ({len(historias) - len(pendientes)} ya analizadas en caché)...")
+        puntuaciones = [None] * len(historias)
+        if pendientes:
+            clasificador = get_clasificador()
+            try:
+                # Todas las noticias en lotes ordenados por longitud (finbert.py), no una pasada del modelo por noticia
+                for i, scores in zip(pendientes, clasificador.clasificar([textos[i] for i in pendientes])):
+                    puntuaciones[i] = scores
+                # Lo nuevo se guarda con el modelo y el motor que lo han clasificado de verdad
+                version = version_analisis(clasificador.model, clasificador.backend)
+            except Exception as e:
+                print(f"Error al analizar el sentimiento: {e}")
+        nuevos = {}
+        for item, texto, scores, guardado in zip(historias, textos, puntuaciones, guardados):
             modelo_usado = "FinBert"
             try:
-
-                texto = f"{item['title']}. {item.get('description', '')}"
-                resultados = analizar_sentimiento_finbert.classifier(texto)[0]
-                scores = {item['label'].lower(): item['score'] for item in resultados}
+                if guardado is not None:
+                    resultado.append({
+                        "title": item["title"],
+                        "sentiment": guardado["sentiment"],
+                        "confidence": guardado["confidence"],
+                        "model": guardado["model"],
+                        "url": item["url"],
+                        "sourcename": item["sourcename"],
+                        "publishedAt": item["publishedAt"],
+                        "content": item["content"],
+                    })
+                    continue
+                if scores is None:
+                    raise ValueError("FinBERT no devolvió puntuaciones")
 
                 prediccion_sentimiento = max(scores, key=scores.get)
                 confianza= scores[prediccion_sentimiento]
@@ -108,6 +156,8 @@ def analizar_sentimiento_finbert(items: List[Dict]) -> List[Dict]:
                     "publishedAt": item["publishedAt"],
                     "content": item["content"],
                 })
+                # Los errores no se guardan: la próxima ejecución los vuelve a intentar
+                nuevos[texto] = {"sentiment": sentimiento_final, "confidence": round(confianza,3), "model": modelo_usado}
             except Exception as e:
                 print(f"Error al analizar el sentimiento: {e}")
                 resultado.append({
@@ -121,7 +171,19 @@ def analizar_sentimiento_finbert(items: List[Dict]) -> List[Dict]:
                     "content": item["content"],
                 })
 
-        return resultado
+        guardar_sentimientos(nuevos, version)
+        # Cada noticia recibe el sentimiento de su historia con peso 1 / tamaño de la historia
+        por_historia = dict(zip(representantes, resultado))
+        return [{
+            **por_historia[item["cluster"]],
+            "title": item["title"],
+            "url": item["url"],
+            "sourcename": item["sourcename"],
+            "publishedAt": item["publishedAt"],
+            "content": item["content"],
+            "cluster": item["cluster"],
+            "weight": round(1 / item["cluster_size"], 4),
+        } for item in items]
 
     except Exception as e:
         print(f"Error al cargar el modelo FinBERT: {e}")
@@ -130,17 +192,23 @@ def analizar_sentimiento_finbert(items: List[Dict]) -> List[Dict]:
 
 def resumen_sentimientos(noticias_con_sentimientos: List[Dict]) -> str:
     resumen={"Positivo": [], "Negativo": [], "Neutral": []}
+    pesos={"Positivo": 0.0, "Negativo": 0.0, "Neutral": 0.0}
 
     for item in noticias_con_sentimientos:
         sentimiento= item['sentiment']
         if sentimiento in resumen:
             resumen[sentimiento].append(item['title'])
+            # Las copias de una misma historia suman 1 entre todas (news_dedup.py)
+            pesos[sentimiento]+= item.get('weight', 1)
 
     
-    total= sum(len(valor) for valor in resumen.values())
+    total_articulos= sum(len(valor) for valor in resumen.values())
+    total= round(sum(pesos.values()))
     resultado=f"Resumen de {total} noticias analizadas\n"
+    if total < total_articulos:
+        resultado+=f"({total_articulos} artículos; las copias de una misma noticia cuentan una sola vez)\n"
     for sentimiento, titulos in resumen.items():
-        resultado+= f"{len(titulos)} {sentimiento.lower()}\n"
+        resultado+= f"{round(pesos[sentimiento])} {sentimiento.lower()}\n"
 
     if resumen["Positivo"]:
         resultado+=f"Ejemplo Positivo: {resumen['Positivo'][0]}\n"
@@ -74,6 +74,8 @@ class Agente_Extractor_Noticias(Agente_Especializado):
                 "agent":self.name,
                 "company": company,
                 "contador":len(noticias),
+                # Historias distintas: las copias de una misma noticia (news_dedup.py) cuentan una vez
+                "historias": len({noticia.get("cluster", i) for i, noticia in enumerate(noticias)}),
                 "data": noticias,
                 "status": "success"
             }
@@ -177,7 +179,8 @@ class Agente_Generador_Reportes(Agente_Especializado):
             summary_prompt = f"""
             Genera un reporte detallado de las noticias financieras analizadas y sus sentimientos.
             Empresa: {resultado_noticias['company']}
-            Total de noticias: {resultado_noticias['contador']}
+            Total de noticias (historias distintas): {resultado_noticias['historias']}
+            Artículos recibidos (incluidas las copias de una misma noticia): {resultado_noticias['contador']}
             Datos de noticias: {resultado_noticias['data']}
             Resumen de sentimientos: {resumen_sentimientos['resumen']}
 
@@ -218,7 +221,9 @@ class Agente_Generador_Reportes(Agente_Especializado):
             result={
                 "agent": self.name,
                 "company": resultado_noticias["company"],
-                "total_news": resultado_noticias["contador"],
+                # Los contadores de sentimiento suman historias, no artículos: el total tiene que ser el mismo
+                "total_news": resultado_noticias["historias"],
+                "total_articulos": resultado_noticias["contador"],
                 "fecha_analisis": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "analisis_sentimientos":{
                     "contadores": contador_sentimientos,
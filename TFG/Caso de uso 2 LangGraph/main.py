@@ -17,7 +17,7 @@ def main():
         resultado=graph.run(compañia)
         if resultado["status"]== "success":
             print(f"Empresa: {resultado['company']}")
-            print(f"Total noticias: {resultado['total_news']}")
+            print(f"Total noticias: {resultado['total_news']} ({resultado['total_articulos']} artículos)")
             print("Resumen ejecutivo")
             print(resultado['reporte_ejecutivo'])
 
@@ -0,0 +1,267 @@
+"""
+Servicio local de sentimiento: un único FinBERT en caliente para todos los análisis.
+
+Cada proceso del caso de uso 2 cargaba su propio FinBERT y solo clasificaba las noticias de su
+empresa. Con muchos análisis a la vez, cada proceso tenía su copia de los pesos en memoria y los
+núcleos quedaban parados entre peticiones pequeñas. Aquí:
+- El servidor (python sentiment_service.py) carga el modelo una vez y atiende en HTTP en
+  localhost (POST /clasificar con {"textos": [...]}, GET /estado con estadísticas).
+- Las peticiones que llegan a la vez se juntan en un micro-lote: el primer texto espera como
+  mucho SENTIMENT_SERVER_MAX_WAIT_MS a que lleguen más, hasta SENTIMENT_SERVER_MAX_BATCH textos,
+  y todo el lote se clasifica de una vez (finbert.py lo reparte en lotes por longitud). Cada
+  petición recibe solo sus resultados.
+- Con SENTIMENT_SERVER_URL en el .env, get_clasificador() devuelve un cliente con la misma
+  interfaz que ClasificadorFinbert (clasificar(textos)), así que tools.py no cambia de forma de
+  trabajar. Si el servicio no responde, se carga FinBERT en el propio proceso como antes.
+La caché de sentimientos y la agrupación de duplicados se siguen haciendo en cada proceso, antes
+de llamar al servicio: solo viajan los textos nuevos. El servidor usa su propio FINBERT_MODEL y
+FINBERT_BACKEND y los devuelve en /estado y en cada respuesta de /clasificar; la clave de la caché
+se forma con ellos (version_clasificador), así que no se mezclan puntuaciones de motores distintos
+aunque el .env del servicio y el de los análisis no coincidan.
+
+Uso:
+    python sentiment_service.py                  # servidor en SENTIMENT_SERVER_HOST:SENTIMENT_SERVER_PORT
+y en el .env de los análisis: SENTIMENT_SERVER_URL=http://127.0.0.1:8010
+"""
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import requests
+
+from finbert import get_clasificador as get_clasificador_local
+from sentiment_cache import version_analisis
+
+load_dotenv()
+
+# Configuración del servicio (se puede ajustar en el .env)
+SENTIMENT_SERVER_URL = os.getenv("SENTIMENT_SERVER_URL", "")  # Vacío: FinBERT en el propio proceso
+SENTIMENT_SERVER_HOST = os.getenv("SENTIMENT_SERVER_HOST", "127.0.0.1")
+SENTIMENT_SERVER_PORT = int(os.getenv("SENTIMENT_SERVER_PORT", "8010"))
+SENTIMENT_SERVER_MAX_BATCH = int(os.getenv("SENTIMENT_SERVER_MAX_BATCH", "64"))  # Textos máximos por micro-lote
+SENTIMENT_SERVER_MAX_WAIT_MS = float(os.getenv("SENTIMENT_SERVER_MAX_WAIT_MS", "10"))  # Espera máxima para juntar peticiones
+SENTIMENT_SERVER_TIMEOUT = float(os.getenv("SENTIMENT_SERVER_TIMEOUT", "120"))  # Segundos que el cliente espera la respuesta
+
+
+class MicroBatcher:
+    """Junta las peticiones concurrentes en lotes y las clasifica desde un único hilo."""
+
+    def __init__(self, clasificador, max_batch: int = SENTIMENT_SERVER_MAX_BATCH,
+                 max_wait_ms: float = SENTIMENT_SERVER_MAX_WAIT_MS):
+        self.clasificador = clasificador
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._cola: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.stats = {"peticiones": 0, "textos": 0, "lotes": 0, "segundos_modelo": 0.0, "errores": 0}
+        threading.Thread(target=self._bucle, name="micro-batcher", daemon=True).start()
+
+    def clasificar(self, textos: List[str]) -> List[Dict[str, float]]:
+        """Puntuaciones de los textos; bloquea hasta que su micro-lote se ha clasificado."""
+        if not textos:
+            return []
+        futuro: Future = Future()
+        self._cola.put((textos, futuro))
+        return futuro.result()
+
+    def _bucle(self):
+        while True:
+            pendientes = [self._cola.get()]
+            total = len(pendientes[0][0])
+            # La ventana empieza con la primera petición: se cierra al llenarse el lote o al agotar la espera
+            limite = time.monotonic() + self.max_wait
+            while total < self.max_batch:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    pendientes.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+                total += len(pendientes[-1][0])
+            self._procesar(pendientes)
+
+    def _procesar(self, pendientes: list):
+        textos = [texto for textos_peticion, _ in pendientes for texto in textos_peticion]
+        inicio = time.perf_counter()
+        try:
+            puntuaciones = self.clasificador.clasificar(textos)
+        except Exception as e:
+            with self._lock:
+                self.stats["errores"] += 1
+            for _, futuro in pendientes:
+                futuro.set_exception(e)
+            return
+        with self._lock:
+            self.stats["peticiones"] += len(pendientes)
+            self.stats["textos"] += len(textos)
+            self.stats["lotes"] += 1
+            self.stats["segundos_modelo"] += time.perf_counter() - inicio
+
+        posicion = 0
+        for textos_peticion, futuro in pendientes:
+            futuro.set_result(puntuaciones[posicion:posicion + len(textos_peticion)])
+            posicion += len(textos_peticion)
+
+    def resumen(self) -> dict:
+        with self._lock:
+            s = dict(self.stats)
+        s["textos_por_lote"] = round(s["textos"] / s["lotes"], 1) if s["lotes"] else 0
+        s["segundos_modelo"] = round(s["segundos_modelo"], 3)
+        return {**self.origen(), "max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000, **s}
+
+    def origen(self) -> dict:
+        """Modelo y motor con los que se clasifica (forman parte de la clave de la caché de los clientes)."""
+        return {"model": self.clasificador.model, "backend": self.clasificador.backend}
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que los clientes reutilicen la conexión entre peticiones
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self, estado: int, cuerpo: dict):
+        datos = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        if self.path != "/estado":
+            self._responder(404, {"error": "Ruta desconocida"})
+            return
+        self._responder(200, self.server.batcher.resumen())
+
+    def do_POST(self):
+        if self.path != "/clasificar":
+            self._responder(404, {"error": "Ruta desconocida"})
+            return
+        try:
+            cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            textos = cuerpo["textos"]
+            if not isinstance(textos, list) or not all(isinstance(texto, str) for texto in textos):
+                raise ValueError("textos debe ser una lista de cadenas")
+        except (KeyError, ValueError, TypeError) as e:
+            self._responder(400, {"error": f"Petición no válida: {e}"})
+            return
+        try:
+            self._responder(200, {"puntuaciones": self.server.batcher.clasificar(textos),
+                                  **self.server.batcher.origen()})
+        except Exception as e:
+            self._responder(500, {"error": str(e)})
+
+    def log_message(self, formato, *args):
+        # Una línea por petición llenaría la consola con muchos análisis a la vez
+        pass
+
+
+def servir(host: str = SENTIMENT_SERVER_HOST, port: int = SENTIMENT_SERVER_PORT):
+    """Carga FinBERT, lo calienta y atiende peticiones hasta Ctrl+C."""
+    clasificador = get_clasificador_local()
+    clasificador.clasificar(["Shares rise after earnings beat"])
+    servidor = ThreadingHTTPServer((host, port), _Manejador)
+    servidor.daemon_threads = True
+    servidor.batcher = MicroBatcher(clasificador)
+    print(f"Servicio de sentimiento en http://{host}:{port} (lotes de hasta {SENTIMENT_SERVER_MAX_BATCH} textos, "
+          f"espera máxima {SENTIMENT_SERVER_MAX_WAIT_MS:g} ms)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(json.dumps(servidor.batcher.resumen(), indent=2, ensure_ascii=False))
+
+
+class ClienteSentimiento:
+    """Cliente del servicio con la misma interfaz que ClasificadorFinbert."""
+
+    def __init__(self, url: str = SENTIMENT_SERVER_URL, timeout: float = SENTIMENT_SERVER_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+        # Modelo y motor del servicio; se actualizan con cada respuesta
+        self.model: Optional[str] = None
+        self.backend: Optional[str] = None
+
+    @property
+    def _sesion(self) -> requests.Session:
+        # Una sesión (conexión keep-alive) por hilo: requests.Session no garantiza ser segura entre hilos
+        if not hasattr(self._local, "sesion"):
+            self._local.sesion = requests.Session()
+        return self._local.sesion
+
+    def _origen(self, cuerpo: dict):
+        self.model = cuerpo.get("model")
+        self.backend = cuerpo.get("backend")
+
+    def disponible(self) -> bool:
+        try:
+            respuesta = self._sesion.get(f"{self.url}/estado", timeout=2)
+            if respuesta.status_code != 200:
+                return False
+            self._origen(respuesta.json())
+        except (requests.RequestException, ValueError):
+            return False
+        # Sin modelo y motor no se puede formar la clave de la caché: se trata como no disponible
+        return bool(self.model and self.backend)
+
+    def clasificar(self, textos: List[str]) -> List[Dict[str, float]]:
+        if not textos:
+            return []
+        respuesta = self._sesion.post(f"{self.url}/clasificar", json={"textos": textos}, timeout=self.timeout)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"El servicio de sentimiento devolvió {respuesta.status_code}: {respuesta.text[:200]}")
+        cuerpo = respuesta.json()
+        self._origen(cuerpo)
+        return cuerpo["puntuaciones"]
+
+
+_cliente: Optional[ClienteSentimiento] = None
+
+
+def _cliente_activo() -> Optional[ClienteSentimiento]:
+    """El cliente del servicio si SENTIMENT_SERVER_URL está configurado y responde; si no, None."""
+    global _cliente
+    if not SENTIMENT_SERVER_URL:
+        return None
+    if _cliente is None:
+        _cliente = ClienteSentimiento(SENTIMENT_SERVER_URL)
+    return _cliente if _cliente.disponible() else None
+
+
+def get_clasificador():
+    """
+    Clasificador para tools.py: el cliente del servicio si SENTIMENT_SERVER_URL está configurado y
+    responde; si no, el FinBERT del propio proceso.
+    """
+    cliente = _cliente_activo()
+    if cliente is not None:
+        return cliente
+    if SENTIMENT_SERVER_URL:
+        print(f"El servicio de sentimiento no responde en {SENTIMENT_SERVER_URL}; se carga FinBERT en este proceso",
+              file=sys.stderr)
+    return get_clasificador_local()
+
+
+def version_clasificador() -> str:
+    """
+    Versión para la caché de sentimientos del clasificador que se va a usar: con el servicio, su
+    modelo y su motor; sin él, los del proceso. No carga FinBERT.
+    """
+    cliente = _cliente_activo()
+    if cliente is not None:
+        return version_analisis(cliente.model, cliente.backend)
+    return version_analisis()
+
+
+if __name__ == "__main__":
+    servir()
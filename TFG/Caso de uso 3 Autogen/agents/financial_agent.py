@@ -9,8 +9,9 @@ class FinancialAgent(MCPAssistantAgent):
         Tu única responsabilidad es:
         1. Recibir el nombre de una empresa
         2. Usar search_symbols_companys_USA_tool para encontrar el símbolo
-        3. Usar extract_financial_information_company_tool para obtener datos de Finnhub
-        4. Si falla, usar extract_information_company_yfinance_tool como respaldo
+        3. Usar extract_financial_data_combined_tool para obtener los datos (Finnhub, con Yahoo Finance
+           como respaldo; los dos proveedores se consultan en paralelo)
+        4. Si source es null, no hay datos de ningún proveedor
         5. Validar que los datos sean completos y estructurados
         6. Pasar SOLO los datos al Summary Agent
 
@@ -65,43 +66,35 @@ class FinancialAgent(MCPAssistantAgent):
 
             print(f" Símbolo encontrado: {symbol}")
 
-            # Extraer información financiera de Finnhub
+            # Finnhub y Yahoo Finance se consultan en paralelo en el servidor: se usa Finnhub si trae
+            # datos válidos y, si no, Yahoo Finance, sin esperar primero a que Finnhub falle
             respuesta_financiera = self.call_tool(
-                "extract_financial_information_company_tool", {"symbol": symbol})
-            datos_Validos = False
-            if respuesta_financiera:
-                try:
-                    contenido = respuesta_financiera.content[0].text
-                    datos_parseados = json.loads(contenido)
-
-                    contenido_datos = datos_parseados.get("data")
-                    if contenido_datos and isinstance(contenido_datos, dict):
-                        if any(value for value in contenido_datos.values() if value is not None):
-                            datos_Validos = True
-                            print(" Datos financieros obtenidos correctamente de Finnhub.")
-                        else:
-                            print(" Datos financieros de Finnhub están vacíos o incompletos.")
-
-                    else:
-                        print(" Datos financieros de Finnhub no están en el formato esperado.")
-
-                except (json.JSONDecodeError, KeyError) as e:
-                    print(f" Error al parsear la respuesta de Finnhub: {e}")
-            else:
-                print(" No se obtuvo respuesta de Finnhub, intentando con YFinance.")
+                "extract_financial_data_combined_tool", {"symbol": symbol})
+            if not respuesta_financiera:
+                return {
+                    "status": "error",
+                    "message": "No se pudo obtener información financiera.",
+                    "data": None
+                }
 
-            if not datos_Validos:
-                print(" Intentando obtener datos financieros de YFinance como respaldo.")
-                respuesta_financiera = self.call_tool(
-                    "extract_information_company_yfinance_tool", {"symbol": symbol})
-                print(f"[DEBUG] Respuesta de YFinance: {respuesta_financiera}")
+            try:
+                contenido = respuesta_financiera.content[0].text
+                datos_parseados = json.loads(contenido)
+            except (json.JSONDecodeError, IndexError, AttributeError) as e:
+                return {
+                    "status": "error",
+                    "message": f"Error al parsear la respuesta financiera: {e}",
+                    "data": None
+                }
 
-                if not respuesta_financiera:
-                    return {
-                        "status": "error",
-                        "message": "No se pudo obtener información financiera de YFinance.",
-                        "data": None
-                    }
+            fuente = datos_parseados.get("source")
+            if not fuente:
+                return {
+                    "status": "error",
+                    "message": datos_parseados.get("error") or "No se pudo obtener información financiera.",
+                    "data": None
+                }
+            print(f" Datos financieros obtenidos correctamente de {'Finnhub' if fuente == 'finnhub' else 'YFinance'}.")
 
             return {
                 "status": "success",
@@ -21,6 +21,8 @@ Responde ÚNICAMENTE con un JSON válido con esta estructura exacta:
 IMPORTANTE: 
 - Tu análisis debe ser objetivo y basado únicamente en los datos proporcionados.
 - La puntuación debe reflejar la salud financiera de la empresa.
+- Las tendencias de Finnhub ya vienen calculadas en la tabla "features" (CAGR, YoY, QoQ, pendiente, volatilidad y cv por serie): úsalas, no las recalcules.
+- Los indicadores técnicos de Yahoo Finance ya vienen calculados en "indicators" (medias móviles, RSI, ATR, volatilidad, drawdown máximo y beta): úsalos en lugar de recorrer "historical_prices".
 - No debes hacer recomendaciones de compra/venta, solo análisis y que sea muy detallado.
 - Las métricas clave deben ser organizadas y fáciles de entender, para que el siguiente agente pueda generar gráficos mucho más facilmente basandose en ellas.
 Responde SOLO con JSON válido, sin texto adicional ni markdown.
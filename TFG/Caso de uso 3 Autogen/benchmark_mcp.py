@@ -0,0 +1,81 @@
+"""
+Benchmark de latencia por llamada MCP.
+
+Compara el esquema anterior (un stdio_client + ClientSession nuevos en cada llamada, es decir,
+un proceso del servidor por llamada) con la sesión persistente de PersistentMCPSession.
+
+Uso:
+    python benchmark_mcp.py                      # 10 llamadas a list_tools
+    python benchmark_mcp.py 20                   # 20 llamadas
+    python benchmark_mcp.py 5 search_symbols_companys_tool '{"company": "Apple"}'
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from mcp.client.session import ClientSession
+from mcp.client.stdio import stdio_client, StdioServerParameters
+from agents.mcp_session import ENTORNO_SERVIDOR_STDIO, PersistentMCPSession
+
+server_params = StdioServerParameters(command="python", args=["-m", "server"], env=ENTORNO_SERVIDOR_STDIO)
+
+
+def crear_operacion(tool_name, tool_args):
+    # Si no se indica tool, se mide list_tools, que no depende de APIs externas
+    if tool_name:
+        return lambda session: session.call_tool(tool_name, tool_args)
+    return lambda session: session.list_tools()
+
+
+async def llamada_sesion_nueva(operacion):
+    # Esquema anterior: se lanza el servidor y se hace el handshake en cada llamada
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            return await operacion(session)
+
+
+def medir(funcion, num_llamadas: int) -> list:
+    tiempos = []
+    for _ in range(num_llamadas):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def imprimir_resultados(nombre: str, tiempos: list):
+    tiempos_ms = [t * 1000 for t in tiempos]
+    print(f"{nombre}")
+    print(f"  Llamadas: {len(tiempos_ms)}")
+    print(f"  Primera llamada: {tiempos_ms[0]:.1f} ms")
+    print(f"  Media: {statistics.mean(tiempos_ms):.1f} ms")
+    print(f"  Mediana: {statistics.median(tiempos_ms):.1f} ms")
+    print(f"  Mínimo / Máximo: {min(tiempos_ms):.1f} / {max(tiempos_ms):.1f} ms")
+    print(f"  Total: {sum(tiempos_ms) / 1000:.2f} s")
+
+
+def main():
+    num_llamadas = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    tool_name = sys.argv[2] if len(sys.argv) > 2 else None
+    tool_args = json.loads(sys.argv[3]) if len(sys.argv) > 3 else {}
+    operacion = crear_operacion(tool_name, tool_args)
+    print(f"Operación medida: {tool_name or 'list_tools'}\n")
+
+    antes = medir(lambda: asyncio.run(llamada_sesion_nueva(operacion)), num_llamadas)
+    imprimir_resultados("Antes: sesión nueva por llamada", antes)
+
+    sesion = PersistentMCPSession(server_params)
+    try:
+        despues = medir(lambda: sesion.run(operacion), num_llamadas)
+    finally:
+        sesion.close()
+    imprimir_resultados("Después: sesión persistente", despues)
+
+    print(f"\nMejora media por llamada: x{statistics.mean(antes) / statistics.mean(despues):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Modo record/replay para las llamadas a Finnhub, NewsAPI y yfinance.
+
+Para comparar Autogen y LangGraph hace falta que los tiempos no dependan de la red. Con
+FIXTURES_MODE (en el .env, para que también lo lean los servidores MCP):
+- off (por defecto): las peticiones van a las APIs reales.
+- record: se hacen las peticiones reales y cada respuesta se guarda en FIXTURES_DIR.
+- replay: las respuestas se leen de FIXTURES_DIR sin tocar la red; si falta alguna se lanza
+  FixtureNotFoundError. FIXTURES_LATENCY simula la latencia: "0" (ninguna), un número de
+  segundos fijo o "recorded" (la latencia medida al grabar).
+
+Por defecto FIXTURES_DIR es TFG/fixtures, compartido por todos los casos, así que las dos
+variantes de un caso se pueden medir con exactamente los mismos datos. Mientras el modo está
+activo no se usan las cachés persistentes (Finnhub, índice de símbolos), para que todas las
+ejecuciones recorran el mismo camino.
+"""
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+
+load_dotenv()
+
+MODOS_FIXTURES = ("off", "record", "replay")
+FIXTURES_MODE = os.getenv("FIXTURES_MODE", "off").lower()
+FIXTURES_DIR = os.path.abspath(os.path.expanduser(os.getenv(
+    "FIXTURES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixtures"))))
+FIXTURES_LATENCY = os.getenv("FIXTURES_LATENCY", "0")
+
+if FIXTURES_MODE not in MODOS_FIXTURES:
+    raise ValueError(f"FIXTURES_MODE no válido: {FIXTURES_MODE}. Usa uno de {MODOS_FIXTURES}")
+
+# Parámetros que no forman parte de la clave (y no se guardan en disco)
+PARAMETROS_SECRETOS = {"token", "apikey", "apiKey", "api_key"}
+
+
+class FixtureNotFoundError(LookupError):
+    """En modo replay no hay ninguna respuesta grabada para la petición."""
+
+
+def fixtures_activas() -> bool:
+    return FIXTURES_MODE != "off"
+
+
+def peticion_http(url: str, params: dict = None) -> dict:
+    """Descripción de una petición HTTP sin secretos, que sirve de clave de la fixture."""
+    params = {k: v for k, v in (params or {}).items() if k not in PARAMETROS_SECRETOS}
+    return {"url": url, "params": params}
+
+
+def _ruta(tipo: str, peticion: dict) -> str:
+    clave = json.dumps(peticion, sort_keys=True, default=str)
+    nombre = hashlib.sha1(clave.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(FIXTURES_DIR, tipo, f"{nombre}.json.gz")
+
+
+def _leer(tipo: str, peticion: dict) -> dict:
+    ruta = _ruta(tipo, peticion)
+    try:
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise FixtureNotFoundError(
+            f"No hay fixture de {tipo} para {peticion} en {FIXTURES_DIR}; grábala con FIXTURES_MODE=record")
+
+
+def _guardar(tipo: str, peticion: dict, respuesta: Any, latencia: float):
+    ruta = _ruta(tipo, peticion)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    registro = {"peticion": peticion, "latencia": latencia, "grabado": time.time(), "respuesta": respuesta}
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with gzip.open(temporal, "wt", encoding="utf-8") as f:
+        json.dump(registro, f, default=str)
+    os.replace(temporal, ruta)
+
+
+def _latencia_simulada(registro: dict) -> float:
+    if FIXTURES_LATENCY == "recorded":
+        return float(registro.get("latencia") or 0)
+    return float(FIXTURES_LATENCY)
+
+
+async def con_fixture(tipo: str, peticion: dict, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Ejecuta fetch() según FIXTURES_MODE: directamente, grabando la respuesta o leyéndola de disco."""
+    if FIXTURES_MODE == "replay":
+        registro = _leer(tipo, peticion)
+        latencia = _latencia_simulada(registro)
+        if latencia > 0:
+            await asyncio.sleep(latencia)
+        return registro["respuesta"]
+
+    if FIXTURES_MODE == "record":
+        inicio = time.perf_counter()
+        respuesta = await fetch()
+        _guardar(tipo, peticion, respuesta, time.perf_counter() - inicio)
+        return respuesta
+
+    return await fetch()
+
+
+def con_fixture_sync(tipo: str, peticion: dict, fetch: Callable[[], Any]) -> Any:
+    """Versión síncrona de con_fixture (yfinance en su hilo, Caso de uso 2)."""
+    if FIXTURES_MODE == "replay":
+        registro = _leer(tipo, peticion)
+        latencia = _latencia_simulada(registro)
+        if latencia > 0:
+            time.sleep(latencia)
+        return registro["respuesta"]
+
+    if FIXTURES_MODE == "record":
+        inicio = time.perf_counter()
+        respuesta = fetch()
+        _guardar(tipo, peticion, respuesta, time.perf_counter() - inicio)
+        return respuesta
+
+    return fetch()
@@ -54,6 +54,15 @@ async def main():
     summary_agent = SummaryAgent(llm_config=llm_config)
     graphics_agent = GraphicsAgent(llm_config=llm_config)
 
+    try:
+        await ejecutar_analisis(financial_agent, summary_agent, graphics_agent)
+    finally:
+        # Cierra las sesiones MCP persistentes y los procesos del servidor
+        financial_agent.close_mcp_session()
+        graphics_agent.close_mcp_session()
+
+
+async def ejecutar_analisis(financial_agent, summary_agent, graphics_agent):
     # Pedir empresa al usuario
     company = input("Introduce el nombre de la empresa a analizar: ").strip()
     if not company:
@@ -0,0 +1,303 @@
+"""
+Caché local e incremental del histórico de precios diarios de yfinance.
+
+Cada análisis volvía a descargar el histórico con ticker.history(period=...). Aquí cada símbolo
+tiene su histórico completo en disco:
+    <PRICE_CACHE_PATH>/<SÍMBOLO>.npy    array estructurado (date, open, high, low, close, volume)
+    <PRICE_CACHE_PATH>/<SÍMBOLO>.json   metadatos (última actualización, inicio pedido, nombre)
+- La primera vez se descarga PRICE_CACHE_HISTORY (5y por defecto) o el periodo pedido si es
+  más largo.
+- Después solo se piden las sesiones nuevas (start = penúltima fecha guardada) y se añaden al
+  final. La penúltima sesión se usa para comprobar que los precios ajustados no han cambiado
+  (dividendos, splits); si han cambiado se vuelve a descargar todo.
+- Durante PRICE_CACHE_REFRESH segundos desde la última actualización no se toca la red.
+- leer_precios() sirve cualquier ventana directamente desde disco, sin red, para las tools,
+  los gráficos o los indicadores.
+
+Uso desde la línea de comandos:
+    python price_cache.py                 # símbolos guardados
+    python price_cache.py AAPL 1y         # últimas filas de la ventana pedida
+"""
+from dotenv import load_dotenv
+from typing import Optional
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from fixtures import fixtures_activas
+from price_history import desplazamiento, recortar_periodo
+
+load_dotenv()
+
+# Configuración de la caché (se puede ajustar en el .env)
+PRICE_CACHE_ENABLED = os.getenv("PRICE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+PRICE_CACHE_PATH = os.path.expanduser(os.getenv("PRICE_CACHE_PATH", os.path.join("~", ".cache", "tfg", "precios")))
+PRICE_CACHE_HISTORY = os.getenv("PRICE_CACHE_HISTORY", "5y")  # Histórico que se descarga la primera vez
+PRICE_CACHE_REFRESH = float(os.getenv("PRICE_CACHE_REFRESH", "3600"))  # Segundos sin volver a consultar la red
+
+PRECIOS = np.dtype([("date", "datetime64[D]"), ("open", "float64"), ("high", "float64"), ("low", "float64"),
+                    ("close", "float64"), ("volume", "float64")])
+COLUMNAS_YFINANCE = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+# Diferencia relativa en el cierre a partir de la cual se considera que el ajuste ha cambiado
+TOLERANCIA_AJUSTE = 1e-4
+
+
+def _inicio_periodo(period: str, hoy: pd.Timestamp) -> Optional[pd.Timestamp]:
+    # Primera fecha que cubre un periodo de yfinance; None para "max"
+    if period == "max":
+        return None
+    if period == "ytd":
+        return hoy.replace(month=1, day=1)
+    offset = desplazamiento(period)
+    return hoy - offset if offset is not None else hoy - pd.DateOffset(years=1)
+
+
+def _mas_largo(a: str, b: str) -> str:
+    hoy = pd.Timestamp.today().normalize()
+    inicio_a, inicio_b = _inicio_periodo(a, hoy), _inicio_periodo(b, hoy)
+    if inicio_a is None or inicio_b is None:
+        return "max"
+    return a if inicio_a <= inicio_b else b
+
+
+class PriceCache:
+    """Histórico diario por símbolo en disco, actualizado de forma incremental."""
+
+    def __init__(self, path: str = PRICE_CACHE_PATH, history: str = PRICE_CACHE_HISTORY,
+                 refresh: float = PRICE_CACHE_REFRESH):
+        self.path = path
+        self.history_inicial = history
+        self.refresh = refresh
+        self._locks: dict = {}
+        self._locks_lock = threading.Lock()
+        self.stats = {"sin_red": 0, "incrementales": 0, "completas": 0, "filas_nuevas": 0}
+
+    def _lock(self, symbol: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    @staticmethod
+    def normalizar(symbol: str) -> str:
+        return symbol.strip().upper()
+
+    def _ruta(self, symbol: str, extension: str) -> str:
+        return os.path.join(self.path, f"{self.normalizar(symbol).replace('/', '_')}.{extension}")
+
+    # ------------------------------------------------------------------
+    # Disco
+    # ------------------------------------------------------------------
+    def cargar(self, symbol: str, mmap: bool = True) -> Optional[np.ndarray]:
+        try:
+            return np.load(self._ruta(symbol, "npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def _meta(self, symbol: str) -> dict:
+        try:
+            with open(self._ruta(symbol, "json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar(self, symbol: str, precios: np.ndarray, meta: dict):
+        os.makedirs(self.path, exist_ok=True)
+        # Escritura atómica de los dos ficheros: primero los precios, después los metadatos
+        for extension, escribir in (("npy", lambda f: np.save(f, precios, allow_pickle=False)),
+                                    ("json", lambda f: f.write(json.dumps(meta).encode("utf-8")))):
+            ruta = self._ruta(symbol, extension)
+            temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporal, "wb") as f:
+                escribir(f)
+            os.replace(temporal, ruta)
+
+    # ------------------------------------------------------------------
+    # Conversión
+    # ------------------------------------------------------------------
+    @staticmethod
+    def desde_dataframe(history) -> np.ndarray:
+        precios = np.empty(len(history), dtype=PRECIOS)
+        if len(history) == 0:
+            return precios
+        indice = history.index.tz_localize(None) if history.index.tz is not None else history.index
+        precios["date"] = indice.values.astype("datetime64[D]")
+        for campo, columna in COLUMNAS_YFINANCE.items():
+            precios[campo] = history[columna].to_numpy(dtype="float64") if columna in history else np.nan
+        return precios
+
+    @staticmethod
+    def a_dataframe(precios: np.ndarray) -> pd.DataFrame:
+        """DataFrame con las mismas columnas que ticker.history() (índice de fechas sin zona horaria)."""
+        return pd.DataFrame({columna: np.asarray(precios[campo]) for campo, columna in COLUMNAS_YFINANCE.items()},
+                            index=pd.DatetimeIndex(np.asarray(precios["date"]), name="Date"))
+
+    @staticmethod
+    def fusionar(existente: Optional[np.ndarray], nuevos: np.ndarray) -> np.ndarray:
+        # Si una fecha está en los dos, gana la descarga nueva (la última sesión puede estar incompleta)
+        if existente is None or len(existente) == 0:
+            unidos = nuevos
+        else:
+            unidos = np.concatenate([np.asarray(existente), nuevos])
+        unidos = unidos[np.argsort(unidos["date"], kind="stable")]
+        ultimo = np.ones(len(unidos), dtype=bool)
+        ultimo[:-1] = unidos["date"][1:] != unidos["date"][:-1]
+        return unidos[ultimo]
+
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+    def actualizar(self, ticker, period: str = None) -> Optional[np.ndarray]:
+        """
+        Deja al día el histórico del ticker (yf.Ticker) y lo devuelve. Descarga todo solo si no hay
+        caché, si el periodo pedido empieza antes de lo guardado o si ha cambiado el ajuste.
+        """
+        symbol = self.normalizar(ticker.ticker)
+        with self._lock(symbol):
+            existente = self.cargar(symbol, mmap=False)
+            meta = self._meta(symbol)
+            hoy = pd.Timestamp.today().normalize()
+            period = period or self.history_inicial
+
+            inicio_pedido = _inicio_periodo(period, hoy)
+            inicio_guardado = meta.get("inicio_pedido")
+            cubierto = (existente is not None and len(existente) > 0 and meta.get("periodo") is not None
+                        and (meta["periodo"] == "max" or (inicio_pedido is not None and inicio_guardado is not None
+                                                          and inicio_pedido >= pd.Timestamp(inicio_guardado))))
+
+            if cubierto and time.time() - meta.get("actualizado", 0) < self.refresh:
+                self.stats["sin_red"] += 1
+                return existente
+            if cubierto:
+                precios = self._incremental(ticker, existente)
+                if precios is not None:
+                    meta["actualizado"] = time.time()
+                    meta["nombre"] = self._nombre(ticker) or meta.get("nombre")
+                    self._guardar(symbol, precios, meta)
+                    return precios
+
+            # Descarga completa: como mínimo PRICE_CACHE_HISTORY, o el periodo pedido si es más largo
+            periodo = _mas_largo(period, self.history_inicial)
+            precios = self.desde_dataframe(ticker.history(period=periodo))
+            if len(precios) == 0:
+                return existente
+            inicio = _inicio_periodo(periodo, hoy)
+            self._guardar(symbol, precios, {
+                "periodo": periodo,
+                "inicio_pedido": None if inicio is None else inicio.isoformat(),
+                "actualizado": time.time(),
+                "nombre": self._nombre(ticker) or meta.get("nombre"),
+            })
+            self.stats["completas"] += 1
+            return precios
+
+    @staticmethod
+    def _nombre(ticker) -> Optional[str]:
+        # Tras ticker.history() los metadatos ya están cargados: leerlos no hace otra petición
+        try:
+            metadatos = ticker.get_history_metadata() or {}
+            return metadatos.get("longName") or metadatos.get("shortName")
+        except Exception:
+            return None
+
+    def _incremental(self, ticker, existente: np.ndarray) -> Optional[np.ndarray]:
+        # Se pide desde la penúltima sesión: la última puede estar incompleta y la penúltima sirve
+        # para comprobar que el ajuste por dividendos/splits no ha cambiado
+        referencia = existente[-2] if len(existente) >= 2 else existente[-1]
+        inicio = pd.Timestamp(referencia["date"])
+        nuevos = self.desde_dataframe(ticker.history(start=inicio.strftime("%Y-%m-%d")))
+        if len(nuevos) == 0:
+            self.stats["incrementales"] += 1
+            return existente
+
+        mismo_dia = nuevos[nuevos["date"] == referencia["date"]]
+        if len(mismo_dia):
+            antes, ahora = referencia["close"], mismo_dia[0]["close"]
+            if abs(ahora - antes) > TOLERANCIA_AJUSTE * max(abs(antes), 1e-12):
+                print(f"Ajuste de precios cambiado para {ticker.ticker}: se descarga de nuevo el histórico",
+                      file=sys.stderr)
+                return None
+
+        precios = self.fusionar(existente, nuevos)
+        self.stats["incrementales"] += 1
+        self.stats["filas_nuevas"] += len(precios) - len(existente)
+        return precios
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def leer(self, symbol: str, desde=None, hasta=None, period: str = None) -> Optional[pd.DataFrame]:
+        """Ventana del histórico guardado, sin red: entre desde y hasta (incluidos) o el periodo pedido."""
+        precios = self.cargar(symbol)
+        if precios is None:
+            return None
+        fechas = precios["date"]
+        inicio = 0 if desde is None else int(np.searchsorted(fechas, np.datetime64(desde, "D"), side="left"))
+        fin = len(fechas) if hasta is None else int(np.searchsorted(fechas, np.datetime64(hasta, "D"), side="right"))
+        # Copia de la ventana: así se libera el memory-map al salir
+        history = self.a_dataframe(np.array(precios[inicio:fin]))
+        return recortar_periodo(history, period) if period else history
+
+    def history(self, ticker, period: str) -> pd.DataFrame:
+        """Sustituto de ticker.history(period=...) que pasa por la caché."""
+        precios = self.actualizar(ticker, period)
+        if precios is None or len(precios) == 0:
+            return ticker.history(period=period)
+        return recortar_periodo(self.a_dataframe(precios), period)
+
+    def nombre(self, symbol: str) -> Optional[str]:
+        """Nombre de la empresa guardado en la última descarga."""
+        return self._meta(symbol).get("nombre")
+
+    def simbolos(self) -> list:
+        try:
+            return sorted(n[:-4] for n in os.listdir(self.path) if n.endswith(".npy"))
+        except OSError:
+            return []
+
+
+_cache: Optional[PriceCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_price_cache() -> PriceCache:
+    """Devuelve la caché compartida del proceso (la crea la primera vez)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PriceCache()
+        return _cache
+
+
+def history_cacheado(ticker, period: str) -> pd.DataFrame:
+    """Punto de entrada para price_history: respeta PRICE_CACHE_ENABLED y el modo record/replay."""
+    if not PRICE_CACHE_ENABLED or fixtures_activas():
+        return ticker.history(period=period)
+    try:
+        return get_price_cache().history(ticker, period)
+    except Exception as e:
+        print(f"Error en la caché de precios de {ticker.ticker}: {e}", file=sys.stderr)
+        return ticker.history(period=period)
+
+
+def nombre_cacheado(symbol: str) -> Optional[str]:
+    if not PRICE_CACHE_ENABLED or fixtures_activas():
+        return None
+    return get_price_cache().nombre(symbol)
+
+
+def leer_precios(symbol: str, desde=None, hasta=None, period: str = None) -> Optional[pd.DataFrame]:
+    """Precios guardados de un símbolo (columnas Open/High/Low/Close/Volume), sin tocar la red."""
+    return get_price_cache().leer(symbol, desde, hasta, period)
+
+
+if __name__ == "__main__":
+    cache = get_price_cache()
+    if len(sys.argv) == 1:
+        print(json.dumps(cache.simbolos()))
+    else:
+        ventana = cache.leer(sys.argv[1], period=sys.argv[2] if len(sys.argv) > 2 else None)
+        print("Sin datos" if ventana is None else ventana.tail(20).to_string())
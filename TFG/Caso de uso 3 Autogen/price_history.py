@@ -0,0 +1,164 @@
+"""
+Precios históricos de yfinance en formato columnar.
+
+ticker.history() devuelve un DataFrame indexado por fecha. Antes se convertía con
+to_dict(orient='records'), que perdía la fecha y creaba un dict por fila que luego pydantic
+validaba y MCP volvía a serializar. Aquí se guarda una lista por columna:
+    {"dates": ["2025-01-02", ...], "open": [...], "high": [...], "low": [...],
+     "close": [...], "volume": [...]}
+que se serializa igual de bien como JSON, se convierte en arrays NumPy sin recorrer filas y,
+si pyarrow está instalado, en una tabla Arrow (HistoricalPrices.to_arrow()).
+
+El periodo descargado se configura con YFINANCE_HISTORY_PERIOD (1mo por defecto; 1y, 5y...).
+
+Para el modo rápido de yfinance (YFINANCE_MODE=fast) también se calculan aquí, a partir del
+histórico, el precio actual, el volumen y los máximos/mínimos de 52 semanas que antes salían
+de ticker.info (resumen_desde_historico).
+"""
+from dotenv import load_dotenv
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+load_dotenv()
+
+YFINANCE_HISTORY_PERIOD = os.getenv("YFINANCE_HISTORY_PERIOD", "1mo")
+# "full": ticker.info completo en cada consulta; "fast": solo datos de mercado (descargar_rapido)
+YFINANCE_MODE = os.getenv("YFINANCE_MODE", "full").lower()
+
+# Columnas del DataFrame de yfinance -> campos de HistoricalPrices
+COLUMNAS_OHLCV = {"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"}
+
+
+def _lista(valores: np.ndarray, decimales: int = None) -> list:
+    # NaN -> None para que el JSON sea válido
+    valores = np.asarray(valores, dtype="float64")
+    if decimales is not None:
+        valores = np.round(valores, decimales)
+    lista = valores.tolist()
+    if np.isnan(valores).any():
+        lista = [None if v != v else v for v in lista]
+    return lista
+
+
+def columnas_desde_dataframe(history) -> dict:
+    """Convierte el DataFrame de ticker.history() en listas por columna, fechas incluidas."""
+    if history is None or len(history) == 0:
+        return {"dates": [], **{campo: [] for campo in COLUMNAS_OHLCV.values()}}
+
+    indice = history.index
+    # Diario: solo la fecha; intradía: fecha y hora
+    formato = "%Y-%m-%d" if (indice.hour == 0).all() and (indice.minute == 0).all() else "%Y-%m-%dT%H:%M"
+    columnas = {"dates": list(indice.strftime(formato))}
+    for origen, campo in COLUMNAS_OHLCV.items():
+        if origen not in history:
+            columnas[campo] = [None] * len(history)
+        elif campo == "volume":
+            volumen = history[origen].to_numpy(dtype="float64")
+            columnas[campo] = [None if v != v else int(v) for v in volumen.tolist()]
+        else:
+            columnas[campo] = _lista(history[origen].to_numpy(dtype="float64"), 4)
+    return columnas
+
+
+def _history(ticker, period: str):
+    # Con PRICE_CACHE_ENABLED el histórico sale de la caché incremental en disco. El import es local
+    # porque price_cache usa las utilidades de este módulo
+    from price_cache import history_cacheado
+    return history_cacheado(ticker, period)
+
+
+def _nombre(ticker):
+    # El nombre de la empresa viene en los metadatos del histórico. Si el histórico salió de la
+    # caché, ticker.get_history_metadata() haría otra petición: se usa el nombre guardado en ella
+    from price_cache import nombre_cacheado
+    nombre = nombre_cacheado(ticker.ticker)
+    if nombre:
+        return nombre
+    try:
+        metadatos = ticker.get_history_metadata() or {}
+        return metadatos.get("longName") or metadatos.get("shortName")
+    except Exception:
+        return None
+
+
+def descargar_historico(ticker, period: str = None) -> dict:
+    """Histórico OHLCV del ticker en columnas para el periodo pedido (YFINANCE_HISTORY_PERIOD por defecto)."""
+    return columnas_desde_dataframe(_history(ticker, period or YFINANCE_HISTORY_PERIOD))
+
+
+def desplazamiento(period: str):
+    """pd.DateOffset equivalente a un periodo de yfinance ("5d", "1mo", "1y"...); None para "max" o "ytd"."""
+    coincidencia = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if coincidencia is None:
+        return None
+    cantidad, unidad = int(coincidencia.group(1)), coincidencia.group(2)
+    return {"d": pd.DateOffset(days=cantidad), "wk": pd.DateOffset(weeks=cantidad),
+            "mo": pd.DateOffset(months=cantidad), "y": pd.DateOffset(years=cantidad)}[unidad]
+
+
+def periodo_con_52_semanas(period: str) -> str:
+    # Periodo que hay que descargar para tener el pedido y, además, el último año completo
+    if period == "max":
+        return period
+    inicio = pd.Timestamp("2000-01-01")
+    offset = desplazamiento(period)
+    if offset is not None and inicio + offset >= inicio + pd.DateOffset(years=1):
+        return period
+    return "1y"
+
+
+def recortar_periodo(history, period: str):
+    """Filas del DataFrame que caen dentro del periodo, contado desde la última fecha."""
+    if history is None or len(history) == 0 or period == "max":
+        return history
+    ultima = history.index[-1]
+    if period == "ytd":
+        desde = ultima.normalize().replace(month=1, day=1)
+    else:
+        offset = desplazamiento(period)
+        if offset is None:
+            return history
+        desde = ultima - offset
+    return history[history.index > desde]
+
+
+def resumen_desde_historico(history) -> dict:
+    """
+    Campos de mercado calculados sobre el histórico (con las claves de ticker.info):
+    precio y volumen de la última sesión, volumen medio de 3 meses y máximo/mínimo de 52 semanas.
+    """
+    if history is None or len(history) == 0:
+        return {}
+    ultimo_año = recortar_periodo(history, "1y")
+    tres_meses = recortar_periodo(history, "3mo")
+    volumen = history["Volume"].iloc[-1] if "Volume" in history else np.nan
+    volumen_medio = tres_meses["Volume"].mean() if "Volume" in history else np.nan
+    resumen = {
+        "currentPrice": float(history["Close"].iloc[-1]),
+        "volume": None if pd.isna(volumen) else int(volumen),
+        "averageVolume": None if pd.isna(volumen_medio) else int(volumen_medio),
+        "fiftyTwoWeekHigh": float(ultimo_año["High"].max()),
+        "fiftyTwoWeekLow": float(ultimo_año["Low"].min()),
+    }
+    return {clave: (None if valor != valor else valor) for clave, valor in resumen.items()}
+
+
+def descargar_rapido(ticker, period: str = None) -> tuple:
+    """
+    Modo rápido: (info, histórico en columnas) sin llamar a ticker.info. Se descarga el histórico
+    una vez (como mínimo un año) y de él salen precio, volumen y 52 semanas; la capitalización se
+    calcula con fast_info.shares, que es una petición mucho más ligera que el quote summary.
+    """
+    period = period or YFINANCE_HISTORY_PERIOD
+    history = _history(ticker, periodo_con_52_semanas(period))
+    info = resumen_desde_historico(history)
+    info["longName"] = _nombre(ticker)
+    try:
+        if info.get("currentPrice") is not None:
+            info["marketCap"] = float(ticker.fast_info.shares * info["currentPrice"])
+    except Exception:
+        pass
+    return info, columnas_desde_dataframe(recortar_periodo(history, period))
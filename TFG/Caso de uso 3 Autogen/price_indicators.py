@@ -0,0 +1,269 @@
+"""
+Indicadores técnicos vectorizados sobre el histórico de precios.
+
+YFinanceData.historical_prices llegaba al LLM como decenas de filas OHLCV que el modelo tenía
+que "mirar". Aquí se calcula un resumen pequeño por símbolo:
+- sma_20 / sma_50 / sma_200 y ema_20: medias móviles simple y exponencial del cierre.
+- rsi_14: índice de fuerza relativa (suavizado de Wilder).
+- atr_14 y atr_pct: rango verdadero medio, en precio y en % del último cierre.
+- rendimiento: variación del cierre en todo el periodo.
+- volatilidad: desviación típica anualizada de los rendimientos logarítmicos diarios.
+- max_drawdown: mayor caída desde un máximo previo.
+- beta: sensibilidad frente al índice de referencia (INDICATORS_INDEX, SPY por defecto).
+
+Todos los símbolos (y el índice) se colocan en matrices símbolos x sesiones alineadas por fecha
+y rellenas con NaN, y cada indicador se calcula para todos a la vez.
+
+Uso desde la línea de comandos:
+    python price_indicators.py AAPL MSFT TSLA
+"""
+from dotenv import load_dotenv
+from typing import Dict, List, Optional, Union
+import os
+import sys
+import warnings
+
+import numpy as np
+
+load_dotenv()
+
+# Configuración de los indicadores (se puede ajustar en el .env)
+INDICATORS_ENABLED = os.getenv("INDICATORS_ENABLED", "true").lower() not in ("0", "false", "no")
+INDICATORS_PERIOD = os.getenv("INDICATORS_PERIOD", "1y")  # Histórico sobre el que se calculan
+INDICATORS_INDEX = os.getenv("INDICATORS_INDEX", "SPY")  # Índice de referencia para la beta ("" para no calcularla)
+
+SESIONES_POR_AÑO = 252
+CAMPOS = ("open", "high", "low", "close")
+
+
+def _columnas(historico) -> tuple:
+    # Acepta el DataFrame de ticker.history() o el dict de HistoricalPrices.to_numpy()
+    if isinstance(historico, dict):
+        fechas = np.asarray(historico["dates"]).astype("datetime64[D]")
+        return fechas, {campo: np.asarray(historico[campo], dtype="float64") for campo in CAMPOS}
+    indice = historico.index.tz_localize(None) if historico.index.tz is not None else historico.index
+    fechas = indice.values.astype("datetime64[D]")
+    return fechas, {campo: historico[campo.capitalize()].to_numpy(dtype="float64") for campo in CAMPOS}
+
+
+def matrices(historicos: Dict[str, object]) -> tuple:
+    """
+    Alinea los históricos {símbolo: histórico} por fecha: devuelve (símbolos, fechas, {campo: matriz})
+    con una fila por símbolo y NaN en las sesiones que le faltan.
+    """
+    simbolos, columnas = [], []
+    for simbolo, historico in historicos.items():
+        if historico is None or len(historico) == 0:
+            continue
+        simbolos.append(simbolo)
+        columnas.append(_columnas(historico))
+
+    fechas = np.unique(np.concatenate([f for f, _ in columnas])) if columnas else np.array([], dtype="datetime64[D]")
+    resultado = {campo: np.full((len(columnas), len(fechas)), np.nan) for campo in CAMPOS}
+    for i, (f, valores) in enumerate(columnas):
+        posiciones = np.searchsorted(fechas, f)
+        for campo in CAMPOS:
+            resultado[campo][i, posiciones] = valores[campo]
+    return simbolos, fechas, resultado
+
+
+def _suavizar(x: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Media exponencial por filas: e[t] = alpha * x[t] + (1 - alpha) * e[t-1], empezando en el primer
+    valor de cada fila. Los huecos (NaN) mantienen el último valor.
+    """
+    resultado = np.full(x.shape, np.nan)
+    actual = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        columna = x[:, t]
+        actual = np.where(np.isnan(actual), columna,
+                          np.where(np.isnan(columna), actual, alpha * columna + (1 - alpha) * actual))
+        resultado[:, t] = actual
+    return resultado
+
+
+def sma(x: np.ndarray, n: int) -> np.ndarray:
+    """Media móvil simple de n sesiones por filas (NaN si en la ventana falta algún valor)."""
+    validos = ~np.isnan(x)
+    suma = np.concatenate([np.zeros((x.shape[0], 1)), np.cumsum(np.where(validos, x, 0.0), axis=1)], axis=1)
+    cuenta = np.concatenate([np.zeros((x.shape[0], 1)), np.cumsum(validos, axis=1)], axis=1)
+    resultado = np.full(x.shape, np.nan)
+    if x.shape[1] >= n:
+        ventana = suma[:, n:] - suma[:, :-n]
+        completa = (cuenta[:, n:] - cuenta[:, :-n]) == n
+        resultado[:, n - 1:] = np.where(completa, ventana / n, np.nan)
+    return resultado
+
+
+def ema(x: np.ndarray, n: int) -> np.ndarray:
+    return _suavizar(x, 2 / (n + 1))
+
+
+def rsi(close: np.ndarray, n: int = 14) -> np.ndarray:
+    cambio = np.diff(close, axis=1)
+    subidas = _suavizar(np.where(np.isnan(cambio), np.nan, np.maximum(cambio, 0.0)), 1 / n)
+    bajadas = _suavizar(np.where(np.isnan(cambio), np.nan, np.maximum(-cambio, 0.0)), 1 / n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultado = np.where(bajadas == 0, 100.0, 100 - 100 / (1 + subidas / bajadas))
+    resultado[np.isnan(subidas) | np.isnan(bajadas)] = np.nan
+    # Se rellena la primera sesión para que tenga las mismas columnas que close
+    return np.concatenate([np.full((close.shape[0], 1), np.nan), resultado], axis=1)
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, n: int = 14) -> np.ndarray:
+    anterior = np.concatenate([np.full((close.shape[0], 1), np.nan), close[:, :-1]], axis=1)
+    with warnings.catch_warnings():
+        # Sesiones sin datos: nanmax de solo NaN avisa y devuelve NaN, que es lo que se quiere
+        warnings.simplefilter("ignore", RuntimeWarning)
+        rango = np.nanmax(np.stack([high - low, np.abs(high - anterior), np.abs(low - anterior)]), axis=0)
+    return _suavizar(rango, 1 / n)
+
+
+def rendimientos(close: np.ndarray) -> np.ndarray:
+    """Rendimientos logarítmicos diarios por filas (una columna menos que close)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultado = np.log(close[:, 1:] / close[:, :-1])
+    resultado[~np.isfinite(resultado)] = np.nan
+    return resultado
+
+
+def max_drawdown(close: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        # fmax ignora los NaN, así que los huecos no reinician el máximo acumulado
+        maximo = np.fmax.accumulate(close, axis=1)
+        return np.nanmin(close / maximo - 1, axis=1)
+
+
+def beta(r: np.ndarray, r_indice: np.ndarray) -> np.ndarray:
+    """Beta de cada fila de rendimientos frente a los rendimientos del índice (mismas columnas)."""
+    validos = ~np.isnan(r) & ~np.isnan(r_indice)[None, :]
+    n = validos.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.where(validos, r_indice[None, :], 0.0)
+        y = np.where(validos, r, 0.0)
+        x_media = x.sum(axis=1, keepdims=True) / n[:, None]
+        y_media = y.sum(axis=1, keepdims=True) / n[:, None]
+        dx = np.where(validos, x - x_media, 0.0)
+        dy = np.where(validos, y - y_media, 0.0)
+        resultado = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    resultado[n < 2] = np.nan
+    return resultado
+
+
+def _ultimo(x: np.ndarray) -> np.ndarray:
+    # Último valor no NaN de cada fila
+    validos = ~np.isnan(x)
+    indice = x.shape[1] - 1 - np.argmax(validos[:, ::-1], axis=1)
+    return np.where(validos.any(axis=1), x[np.arange(x.shape[0]), indice], np.nan)
+
+
+def _primero(x: np.ndarray) -> np.ndarray:
+    validos = ~np.isnan(x)
+    return np.where(validos.any(axis=1), x[np.arange(x.shape[0]), np.argmax(validos, axis=1)], np.nan)
+
+
+def calcular(precios: Dict[str, np.ndarray], indice: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Indicadores de todas las filas de las matrices {campo: símbolos x sesiones}. Si se pasa la
+    fila de cierres del índice (alineada con las mismas sesiones), también la beta.
+    """
+    close, high, low = precios["close"], precios["high"], precios["low"]
+    r = rendimientos(close)
+    ultimo = _ultimo(close)
+    with warnings.catch_warnings():
+        # Filas sin datos suficientes: NaN sin aviso
+        warnings.simplefilter("ignore", RuntimeWarning)
+        volatilidad = np.nanstd(r, axis=1, ddof=1) * np.sqrt(SESIONES_POR_AÑO)
+    volatilidad[(~np.isnan(r)).sum(axis=1) < 2] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        atr_14 = _ultimo(atr(high, low, close, 14))
+        indicadores = {
+            "ultimo": ultimo,
+            "rendimiento": ultimo / _primero(close) - 1,
+            "sma_20": _ultimo(sma(close, 20)),
+            "sma_50": _ultimo(sma(close, 50)),
+            "sma_200": _ultimo(sma(close, 200)),
+            "ema_20": _ultimo(ema(close, 20)),
+            "rsi_14": _ultimo(rsi(close, 14)),
+            "atr_14": atr_14,
+            "atr_pct": atr_14 / ultimo,
+            "volatilidad": volatilidad,
+            "max_drawdown": max_drawdown(close),
+            "sesiones": (~np.isnan(close)).sum(axis=1),
+        }
+    if indice is not None:
+        indicadores["beta"] = beta(r, rendimientos(indice[None, :])[0])
+    return indicadores
+
+
+def _redondear(valor: float):
+    if valor is None or not np.isfinite(valor):
+        return None
+    return float(f"{valor:.4g}")
+
+
+def resumen_indicadores(historicos: Dict[str, object], historico_indice=None) -> Dict[str, dict]:
+    """
+    Resumen de indicadores por símbolo a partir de sus históricos (DataFrame de ticker.history()
+    o HistoricalPrices.to_numpy()), calculado en una sola pasada para todos:
+        {"AAPL": {"ultimo": ..., "sma_20": ..., "rsi_14": ..., "beta": ..., ...}, ...}
+    """
+    entrada = dict(historicos)
+    clave_indice = object()
+    if historico_indice is not None and len(historico_indice):
+        entrada[clave_indice] = historico_indice
+    simbolos, fechas, precios = matrices(entrada)
+    if not simbolos:
+        return {}
+
+    indice = None
+    if clave_indice in simbolos:
+        fila = simbolos.index(clave_indice)
+        indice = precios["close"][fila]
+        simbolos = simbolos[:fila] + simbolos[fila + 1:]
+        precios = {campo: np.delete(matriz, fila, axis=0) for campo, matriz in precios.items()}
+        if not simbolos:
+            return {}
+
+    indicadores = calcular(precios, indice)
+    resumen = {}
+    for i, simbolo in enumerate(simbolos):
+        fila = {nombre: _redondear(valores[i]) for nombre, valores in indicadores.items() if nombre != "sesiones"}
+        fila["sesiones"] = int(indicadores["sesiones"][i])
+        resumen[simbolo] = fila
+    return resumen
+
+
+def indicadores_yfinance(symbols: Union[str, List[str]], period: str = None, index: str = None):
+    """
+    Descarga (o lee de la caché de precios) el histórico de los símbolos y del índice y devuelve
+    su resumen de indicadores. Con un solo símbolo devuelve directamente su resumen.
+    """
+    import yfinance as yf
+    from price_history import _history
+
+    period = period or INDICATORS_PERIOD
+    index = INDICATORS_INDEX if index is None else index
+    lista = [symbols] if isinstance(symbols, str) else list(symbols)
+    historicos = {symbol: _history(yf.Ticker(symbol), period) for symbol in lista}
+    historico_indice = None
+    if index:
+        try:
+            historico_indice = _history(yf.Ticker(index), period)
+        except Exception as e:
+            print(f"No se pudo descargar el índice {index} para la beta: {e}", file=sys.stderr)
+
+    resumen = resumen_indicadores(historicos, historico_indice)
+    for fila in resumen.values():
+        fila["periodo"] = period
+        if "beta" in fila:
+            fila["indice"] = index
+    if isinstance(symbols, str):
+        return resumen.get(symbols, {})
+    return resumen
+
+
+if __name__ == "__main__":
+    for simbolo, fila in indicadores_yfinance(sys.argv[1:] or ["AAPL", "MSFT", "TSLA"]).items():
+        print(simbolo, fila)
@@ -1,12 +1,17 @@
 
+import argparse
+import os
 from nameclass import CompanyParams
 from tools import (
     search_symbols_companys,
     extract_financial_information_company,
     extract_information_company_yfinance,
+    extract_financial_data_combined,
     transform_data_to_pdf
 )
 from mcp.server.fastmcp import FastMCP
+from fixtures import fixtures_activas
+from yfinance_session import precalentar_en_segundo_plano
 
 # https://github.com/jtanningbed/mcp-ag2-example/blob/main/server/mcp_server.py
 mcp = FastMCP("mcp_server")
@@ -20,14 +25,24 @@ async def search_symbols_companys_tool(company: str) -> dict:
 
 
 @mcp.tool()
-async def extract_financial_information_company_tool(symbol: str) -> dict:
-    result = await extract_financial_information_company(symbol)
+async def extract_financial_information_company_tool(symbol: str, fields: str = None) -> dict:
+    # fields: grupos (valuation, profitability, growth, leverage, liquidity, efficiency, dividends, market)
+    # o claves de Finnhub separados por comas; sin fields se devuelven todas las métricas
+    result = await extract_financial_information_company(symbol, fields=fields)
     return result.model_dump()
 
 
 @mcp.tool()
-async def extract_information_company_yfinance_tool(symbol: str) -> dict:
-    result = await extract_information_company_yfinance(symbol)
+async def extract_information_company_yfinance_tool(symbol: str, max_points: int = None) -> dict:
+    # max_points: sesiones como máximo en historical_prices (por defecto YFINANCE_MAX_POINTS)
+    result = await extract_information_company_yfinance(symbol, max_points=max_points)
+    return result.model_dump()
+
+
+@mcp.tool()
+async def extract_financial_data_combined_tool(symbol: str, max_points: int = None, fields: str = None) -> dict:
+    # Finnhub y Yahoo Finance en paralelo: se prefiere Finnhub y Yahoo Finance queda de respaldo
+    result = await extract_financial_data_combined(symbol, max_points=max_points, fields=fields)
     return result.model_dump()
 
 
@@ -37,4 +52,15 @@ async def transform_data_to_pdf_tool(data: dict) -> dict:
     return {"pdf_filename": result}
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    # Por defecto usa stdio (un servidor por cliente). Con --transport streamable-http o sse (o MCP_SERVER_TRANSPORT en el
+    # .env) arranca un servidor HTTP que pueden compartir muchos agentes; el host y el puerto se configuran con
+    # FASTMCP_HOST y FASTMCP_PORT. No se usa MCP_TRANSPORT, que es el transporte de los clientes: si no, un servidor
+    # lanzado por stdio desde un agente con MCP_TRANSPORT=streamable-http arrancaría HTTP y el agente se quedaría esperando.
+    parser = argparse.ArgumentParser(description="Servidor MCP de datos financieros")
+    parser.add_argument("--transport", choices=("stdio", "streamable-http", "sse"),
+                        default=os.getenv("MCP_SERVER_TRANSPORT", "stdio"))
+    argumentos = parser.parse_args()
+    # La cookie y el crumb de Yahoo Finance se negocian ya, en segundo plano, para que la primera tool no los espere
+    if not fixtures_activas():
+        precalentar_en_segundo_plano()
+    mcp.run(transport=argumentos.transport)
@@ -1,85 +1,94 @@
-from mcp.client.stdio import stdio_client, StdioServerParameters
-from mcp.client.session import ClientSession
+from mcp.client.stdio import StdioServerParameters
 
 from typing import List, Optional, Dict
 import json
-import asyncio
-import concurrent.futures
+import os
 from langchain_core.tools import tool
+from agents.mcp_session import ENTORNO_SERVIDOR_STDIO, PersistentMCPSession
 
 
 class FastMcpClient:
-    def __init__(self, mcp_server_command: str = "python", mcp_server_args: Optional[List[str]] = None):
+    """
+    Cliente MCP con una sesión persistente.
+    La sesión vive en un hilo dedicado con su propio event loop: el servidor se arranca una sola vez
+    y las llamadas síncronas (por ejemplo, desde las tools de LangChain) se envían como corrutinas a ese loop,
+    de modo que varias llamadas concurrentes comparten la misma conexión.
+    Con mcp_transport="streamable-http" o "sse" se conecta a un servidor compartido en mcp_server_url
+    en lugar de lanzar mcp_server.py como proceso propio.
+    """
+
+    def __init__(
+        self,
+        mcp_server_command: str = "python",
+        mcp_server_args: Optional[List[str]] = None,
+        mcp_transport: Optional[str] = None,
+        mcp_server_url: Optional[str] = None,
+    ):
 
         self.server_params = StdioServerParameters(
             command=mcp_server_command,
             args=mcp_server_args or ["mcp_server.py"],
+            env=ENTORNO_SERVIDOR_STDIO,
+        )
+        self.session = PersistentMCPSession(
+            self.server_params,
+            transport=mcp_transport or os.getenv("MCP_TRANSPORT", "stdio"),
+            server_url=mcp_server_url or os.getenv("MCP_SERVER_URL"),
         )
 
-    def call_tool(self, name: str, args: dict):
-        try:
-            async def _call_tool():
-                async with stdio_client(self.server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(name, args)
-                        print(result)
+    def _parse_result(self, result):
+        print(result)
 
-                        if not result:
-                            return {"status": "success"}
+        if not result:
+            return {"status": "success"}
 
-                        if hasattr(result, 'content') and result.content:
-                            content = result.content[0].text
-                            try:
-                                return json.loads(content)
-                            except json.JSONDecodeError:
-                                return {"result": content}
+        if hasattr(result, 'content') and result.content:
+            content = result.content[0].text
+            try:
+                return json.loads(content)
+            except json.JSONDecodeError:
+                return {"result": content}
 
-                        return result
+        return result
 
+    def call_tool(self, name: str, args: dict):
+        try:
+            return self._parse_result(self.session.call_tool(name, args))
         except Exception as e:
             print(f"Error calling tool {name}: {e}")
             return {"error": str(e)}
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future_sync = executor.submit(lambda: asyncio.run(_call_tool()))
-            return future_sync.result()
+    async def acall_tool(self, name: str, args: dict):
+        # Versión asíncrona: permite lanzar varias tools a la vez sobre la misma conexión (p. ej. con asyncio.gather)
+        try:
+            result = await self.session.arun(lambda session: session.call_tool(name, args))
+            return self._parse_result(result)
+        except Exception as e:
+            print(f"Error calling tool {name}: {e}")
+            return {"error": str(e)}
 
     def list_tools(self) -> List[Dict]:
-        async def _list_tools():
-            try:
-                async with stdio_client(self.server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        tools = await session.list_tools()
-                        if hasattr(tools, 'tools'):
-                            return [{"name": tool.name, "description": tool.description} for tool in tools.tools]
-                        else:
-                            return [{"name": str(tools), "description": "No description available"}
-                                    ]
-
-            except Exception as e:
-                print(f"Error listing tools: {e}")
-                return []
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future_sync = executor.submit(lambda: asyncio.run(_list_tools()))
-            return future_sync.result()
+        try:
+            tools = self.session.list_tools()
+            if hasattr(tools, 'tools'):
+                return [{"name": tool.name, "description": tool.description} for tool in tools.tools]
+            else:
+                return [{"name": str(tools), "description": "No description available"}
+                        ]
+
+        except Exception as e:
+            print(f"Error listing tools: {e}")
+            return []
 
     def read_resource(self, uri: str) -> str:
-        async def read_resource():
-            try:
-                async with stdio_client(self.server_params) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        content = await session.read_resource(uri)
-                        return content
-            except Exception as e:
-                print(f"Error reading resource {uri}: {e}")
+        try:
+            return self.session.read_resource(uri)
+        except Exception as e:
+            print(f"Error reading resource {uri}: {e}")
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future_sync = executor.submit(lambda: asyncio.run(read_resource()))
-            return future_sync.result()
+    def close(self):
+        """Cierra la sesión MCP y termina el proceso del servidor."""
+        self.session.close()
 
 
 fastmcp_client = FastMcpClient()
@@ -88,6 +97,7 @@ fastmcp_client = FastMcpClient()
 def initialize_fastmcp() -> bool:
     """
     Inicializa el cliente FastMCP y verifica la conexión.
+    La sesión que se abre aquí queda activa y la reutilizan después todas las tools.
 
     Returns:
         bool: True si la inicialización fue exitosa, False en caso contrario
@@ -96,10 +106,10 @@ def initialize_fastmcp() -> bool:
         tools = fastmcp_client.list_tools()
 
         if isinstance(tools, list):
-            for tool in tools:
-                if isinstance(tool, dict):
-                    name = tool.get('name', 'Desconocido')
-                    desc = tool.get('description', 'Sin descripción')[:50]
+            for herramienta in tools:
+                if isinstance(herramienta, dict):
+                    name = herramienta.get('name', 'Desconocido')
+                    desc = herramienta.get('description', 'Sin descripción')[:50]
                     print(f"   - {name}: {desc}...")
 
         return True
@@ -169,6 +179,26 @@ def extract_yahoo_data_fastmcp(symbol: str) -> dict:
         return {"error": str(e)}
 
 
+@tool
+def extract_financial_data_fastmcp(symbol: str) -> dict:
+    """
+    Extrae información financiera de Finnhub y Yahoo Finance en paralelo y devuelve un único registro.
+    Se usa Finnhub si trae datos válidos; si no, Yahoo Finance.
+
+    Args:
+        symbol: Símbolo bursátil (ej: 'AAPL', 'MSFT')
+
+    Returns:
+        dict: Diccionario con el proveedor usado (source) y sus datos (finnhub o yfinance), o el error si fallan los dos
+    """
+    try:
+        result = fastmcp_client.call_tool(
+            "extract_financial_data_combined_tool", {"symbol": symbol})
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @tool
 def create_pdf_report_fastmcp(data: dict) -> dict:
     """
@@ -3,8 +3,7 @@ import os
 from langgraph.prebuilt import create_react_agent
 from mcp_server import (
     search_symbols_companys_tool,
-    extract_financial_information_company_tool,
-    extract_information_company_yfinance_tool,
+    extract_financial_data_combined_tool,
     transform_data_to_pdf_tool
 )
 from typing import Annotated
@@ -16,8 +15,7 @@ from langchain_core.messages import HumanMessage, ToolMessage
 from agents.FastMcpClient import (
     initialize_fastmcp,
     search_company_symbol_fastmcp,
-    extract_finnhub_data_fastmcp,
-    extract_yahoo_data_fastmcp,
+    extract_financial_data_fastmcp,
     create_pdf_report_fastmcp
 )
 
@@ -74,8 +72,7 @@ class FinancialAgent:
             print("FastMCP inicializado correctamente. Usando herramientas FastMCP.")
             research_tools = [
                 search_company_symbol_fastmcp,
-                extract_finnhub_data_fastmcp,
-                extract_yahoo_data_fastmcp,
+                extract_financial_data_fastmcp,
                 transfer_to_analysis_agent,
             ]
             traspaso_tools = [transfer_to_visualization_agent]
@@ -84,8 +81,7 @@ class FinancialAgent:
 
             tool_prefix = "fastmcp"
             self.search_tool_name = "search_company_symbol_fastmcp"
-            self.finnhub_tool_name = "extract_finnhub_data_fastmcp"
-            self.yahoo_tool_name = "extract_yahoo_data_fastmcp"
+            self.data_tool_name = "extract_financial_data_fastmcp"
             self.pdf_tool_name = "create_pdf_report_fastmcp"
             self.agente_investigador = create_react_agent(
                 model=self.llm,
@@ -94,15 +90,12 @@ class FinancialAgent:
                 prompt=f"""Eres un agente de investigación financiera. EJECUTA estos pasos EN ORDEN:
 
                 PASO 1: {self.search_tool_name}({{ "company": "<EMPRESA>" }})
-                PASO 2: {self.finnhub_tool_name}({{ "symbol": "<SIMBOLO>" }})
-                PASO 3: EVALUAR los datos de Finnhub:
-                   - SI Finnhub devuelve datos financieros válidos → CONTINUAR al PASO 4
-                   - SI Finnhub NO devuelve datos o está vacío → Ejecutar {self.yahoo_tool_name}({{ "symbol": "<SIMBOLO>" }})
-                PASO 4: transfer_to_FinancialAnalysisAgent()
+                PASO 2: {self.data_tool_name}({{ "symbol": "<SIMBOLO>" }})
+                PASO 3: transfer_to_FinancialAnalysisAgent()
 
                 IMPORTANTE: 
-                - Prioriza Finnhub sobre Yahoo
-                - Solo usa Yahoo si Finnhub falla o no devuelve datos útiles
+                - PASO 2 consulta Finnhub y Yahoo Finance a la vez y ya elige el proveedor (campo "source");
+                  NO hace falta llamar a ninguna otra herramienta de datos
 
                 Empresa solicitada: Usa el nombre de empresa del mensaje humano."""
             )
@@ -110,8 +103,7 @@ class FinancialAgent:
             print("  FastMCP falló. Usando herramientas mcp_server como fallback.")
             research_tools = [
                 search_symbols_companys_tool,
-                extract_financial_information_company_tool,
-                extract_information_company_yfinance_tool,
+                extract_financial_data_combined_tool,
                 transfer_to_analysis_agent,
             ]
             traspaso_tools = [transfer_to_visualization_agent]
@@ -121,8 +113,7 @@ class FinancialAgent:
             print(f"   Nombre: {getattr(pdf_tool, 'name', 'Sin nombre')}")
             tool_prefix = "mcp_server"
             self.search_tool_name = "search_symbols_companys_tool"
-            self.finnhub_tool_name = "extract_financial_information_company_tool"
-            self.yahoo_tool_name = "extract_information_company_yfinance_tool"
+            self.data_tool_name = "extract_financial_data_combined_tool"
             self.pdf_tool_name = "transform_data_to_pdf_tool"
             self.agente_investigador = create_react_agent(
                 model=self.llm,
@@ -131,15 +122,12 @@ class FinancialAgent:
                 prompt=f"""Eres un agente de investigación financiera. EJECUTA estos pasos EN ORDEN:
 
         PASO 1: {self.search_tool_name}({{ "company": "<EMPRESA>" }})
-        PASO 2: {self.finnhub_tool_name}({{ "symbol": "<SIMBOLO>" }})
-        PASO 3: EVALUAR los datos de Finnhub:
-           - SI Finnhub devuelve datos financieros válidos → CONTINUAR al PASO 4
-           - SI Finnhub NO devuelve datos o está vacío → Ejecutar {self.yahoo_tool_name}({{ "symbol": "<SIMBOLO>" }})
-        PASO 4: transfer_to_FinancialAnalysisAgent()
+        PASO 2: {self.data_tool_name}({{ "symbol": "<SIMBOLO>" }})
+        PASO 3: transfer_to_FinancialAnalysisAgent()
 
         IMPORTANTE: 
-        - Prioriza Finnhub sobre Yahoo
-        - Solo usa Yahoo si Finnhub falla o no devuelve datos útiles
+        - PASO 2 consulta Finnhub y Yahoo Finance a la vez y ya elige el proveedor (campo "source");
+          NO hace falta llamar a ninguna otra herramienta de datos
         - INCLUYE TODOS los datos obtenidos en tu mensaje final
         - El agente de análisis NO tiene acceso a herramientas de datos
 
@@ -176,10 +164,12 @@ REGLAS ABSOLUTAS:
 }
 
 3. EJECUTAR: transfer_to_FinancialVisualizationAgent()
-PROHIBIDO: Usar search_company_symbol_fastmcp, extract_finnhub_data_fastmcp, etc.
+PROHIBIDO: Usar search_company_symbol_fastmcp, extract_financial_data_fastmcp, etc.
 PERMITIDO: SOLO transfer_to_FinancialVisualizationAgent
 Importante:
 - El analisis debe ser exhaustivo y basado en datos reales y basados en datos de Finnhub o Yahoo Finance.
+- Las tendencias de Finnhub ya vienen calculadas en la tabla "features" (CAGR, YoY, QoQ, pendiente, volatilidad y cv por serie): úsalas, no las recalcules.
+- Los indicadores técnicos de Yahoo Finance ya vienen calculados en "indicators" (medias móviles, RSI, ATR, volatilidad, drawdown máximo y beta): úsalos en lugar de recorrer "historical_prices".
 - Si la situación financiera es muy mala, no dudes en poner muy mala nota.
 - En tu analisis muy detallado de la empresa, quiero que incluyas los datos que has sacado para ese analisis.
 - En la puntuación tienes que ser super serio con el tema de su analisis financiero
@@ -0,0 +1,133 @@
+from dotenv import load_dotenv
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import atexit
+import functools
+import os
+import sys
+import threading
+import weakref
+
+import httpx
+
+from fixtures import con_fixture, peticion_http
+from rate_limiter import espera_backoff, get_rate_limiter_for_url, proveedor_de_url, RATE_LIMIT_MAX_RETRIES
+
+load_dotenv()
+
+# Configuración del cliente HTTP y del pool de yfinance (se puede ajustar en el .env)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # Segundos máximos de espera por respuesta
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # Segundos máximos para abrir la conexión
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))  # Conexiones simultáneas del pool
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))  # Conexiones que se mantienen abiertas (keep-alive)
+YFINANCE_MAX_WORKERS = int(os.getenv("YFINANCE_MAX_WORKERS", "16"))  # Hilos máximos para las llamadas a yfinance
+
+# Un cliente por event loop: un httpx.AsyncClient no se puede compartir entre loops distintos
+_clientes_http = weakref.WeakKeyDictionary()
+_yfinance_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Event loop de fondo para el código que no tiene uno de larga duración (ver get_background_loop)
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Devuelve el cliente HTTP asíncrono compartido del event loop actual (pool de conexiones con keep-alive)."""
+    loop = asyncio.get_running_loop()
+    client = _clientes_http.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        _clientes_http[loop] = client
+    return client
+
+
+async def get_json(url: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+                   priority: Optional[int] = None) -> Any:
+    """
+    Hace una petición GET sin bloquear el event loop y devuelve el JSON de la respuesta.
+    Las peticiones a Finnhub y NewsAPI pasan por el limitador de su proveedor y se reintentan tras un 429.
+    Con FIXTURES_MODE=record/replay la respuesta se graba o se lee de disco (ver fixtures.py).
+    """
+    tipo = proveedor_de_url(url) or "http"
+    return await con_fixture(tipo, peticion_http(url, params),
+                             lambda: _get_json_red(url, params, headers, priority))
+
+
+async def _get_json_red(url: str, params: Optional[dict], headers: Optional[dict], priority: Optional[int]) -> Any:
+    limitador = get_rate_limiter_for_url(url)
+    for intento in range(RATE_LIMIT_MAX_RETRIES + 1):
+        if limitador is not None:
+            await limitador.adquirir(priority)
+        response = await get_http_client().get(url, params=params, headers=headers)
+        if response.status_code != 429 or limitador is None or intento == RATE_LIMIT_MAX_RETRIES:
+            break
+
+        espera = espera_backoff(intento, response.headers.get("Retry-After"))
+        print(f"{limitador.nombre} devolvió 429, reintentando en {espera:.1f} s", file=sys.stderr)
+        limitador.penalizar(espera)
+        limitador.registrar_reintento()
+    return response.json()
+
+
+def get_yfinance_executor() -> ThreadPoolExecutor:
+    """Pool de hilos acotado para yfinance, que solo ofrece una API bloqueante."""
+    global _yfinance_executor
+    with _executor_lock:
+        if _yfinance_executor is None:
+            _yfinance_executor = ThreadPoolExecutor(
+                max_workers=YFINANCE_MAX_WORKERS, thread_name_prefix="yfinance")
+        return _yfinance_executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Ejecuta una función bloqueante en el pool de yfinance sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_yfinance_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def close_http_client():
+    """Cierra el cliente HTTP del event loop actual."""
+    client = _clientes_http.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop de larga duración en un hilo propio. Con asyncio.run cada llamada crea y cierra su
+    loop: el cliente HTTP de ese loop no se reutiliza y las tareas pendientes se cancelan al salir.
+    Lo que se ejecuta aquí conserva el pool de conexiones entre llamadas y puede seguir en segundo
+    plano (p. ej. los refrescos de la caché de Finnhub).
+    """
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="http-background", daemon=True).start()
+            atexit.register(_cerrar_background_loop)
+        return _background_loop
+
+
+def run_in_background(corrutina: Awaitable[Any]) -> Future:
+    """Lanza la corrutina en el loop de fondo y devuelve un concurrent.futures.Future con su resultado."""
+    return asyncio.run_coroutine_threadsafe(corrutina, get_background_loop())
+
+
+def run_sync(corrutina: Awaitable[Any]) -> Any:
+    """Ejecuta la corrutina en el loop de fondo y espera su resultado (para código síncrono)."""
+    return run_in_background(corrutina).result()
+
+
+def _cerrar_background_loop():
+    # Cierra el cliente HTTP del loop de fondo antes de salir (el hilo es daemon y muere con el proceso)
+    try:
+        run_in_background(close_http_client()).result(timeout=5)
+    except Exception as e:
+        print(f"Error cerrando el cliente HTTP de fondo: {e}", file=sys.stderr)
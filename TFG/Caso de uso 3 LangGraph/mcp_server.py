@@ -1,10 +1,15 @@
+import argparse
+import os
 from mcp.server.fastmcp import FastMCP
+from fixtures import fixtures_activas
+from yfinance_session import precalentar_en_segundo_plano
 from nameclass import CompanyParams, SymbolInput
 
 from tools import (
     search_symbols_companys,
     extract_financial_information_company,
     extract_information_company_yfinance,
+    extract_financial_data_combined,
     transform_data_to_pdf
 )
 
@@ -29,7 +34,7 @@ async def search_symbols_companys_tool(company: str) -> dict:
     """
     try:
         params = CompanyParams(company=company)
-        result = search_symbols_companys(params)
+        result = await search_symbols_companys(params)
         resultado = result.model_dump()
         return resultado
     except Exception as e:
@@ -37,18 +42,20 @@ async def search_symbols_companys_tool(company: str) -> dict:
 
 
 @mcp.tool()
-async def extract_financial_information_company_tool(symbol: str) -> dict:
+async def extract_financial_information_company_tool(symbol: str, fields: str = None) -> dict:
     """
     Extrae información financiera completa desde la API de Finnhub.
 
     Args:
         symbol: Símbolo bursátil de la empresa
+        fields: Grupos de métricas (valuation, profitability, growth, leverage, liquidity, efficiency,
+            dividends, market) o claves de Finnhub separados por comas; sin fields se devuelven todas
 
     Returns:
         Diccionario con métricas financieras y datos de Finnhub
     """
     try:
-        result = extract_financial_information_company(symbol)
+        result = await extract_financial_information_company(symbol, fields=fields)
         resultado = result.model_dump()
         return resultado
     except Exception as e:
@@ -56,19 +63,43 @@ async def extract_financial_information_company_tool(symbol: str) -> dict:
 
 
 @mcp.tool()
-async def extract_information_company_yfinance_tool(symbol: str) -> dict:
+async def extract_information_company_yfinance_tool(symbol: str, max_points: int = None) -> dict:
     """
     Extrae información financiera desde Yahoo Finance.
 
     Args:
         symbol: Símbolo bursátil (ej: 'AAPL', 'MSFT')
+        max_points: Sesiones como máximo en historical_prices (por defecto YFINANCE_MAX_POINTS)
 
     Returns:
         Diccionario con información de la empresa, ratios financieros y datos de mercado desde Yahoo Finance
     """
     try:
         params = SymbolInput(symbol=symbol)
-        result = extract_information_company_yfinance(params)
+        result = await extract_information_company_yfinance(params, max_points=max_points)
+        resultado = result.model_dump()
+        return resultado
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@mcp.tool()
+async def extract_financial_data_combined_tool(symbol: str, max_points: int = None, fields: str = None) -> dict:
+    """
+    Extrae la información financiera de Finnhub y Yahoo Finance en paralelo y devuelve un único registro.
+    Se usa Finnhub si trae datos válidos; si no, Yahoo Finance.
+
+    Args:
+        symbol: Símbolo bursátil (ej: 'AAPL', 'MSFT')
+        max_points: Sesiones como máximo en historical_prices de Yahoo Finance (por defecto YFINANCE_MAX_POINTS)
+        fields: Grupos de métricas (valuation, profitability, growth, leverage, liquidity, efficiency,
+            dividends, market) o claves de Finnhub separados por comas; sin fields se devuelven todas
+
+    Returns:
+        Diccionario con el proveedor usado (source) y sus datos (finnhub o yfinance), o el error si fallan los dos
+    """
+    try:
+        result = await extract_financial_data_combined(symbol, max_points=max_points, fields=fields)
         resultado = result.model_dump()
         return resultado
     except Exception as e:
@@ -94,4 +125,15 @@ async def transform_data_to_pdf_tool(data: dict) -> dict:
 
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    # Por defecto usa stdio (un servidor por cliente). Con --transport streamable-http o sse (o MCP_SERVER_TRANSPORT en el
+    # .env) arranca un servidor HTTP que pueden compartir muchos agentes; el host y el puerto se configuran con
+    # FASTMCP_HOST y FASTMCP_PORT. No se usa MCP_TRANSPORT, que es el transporte de los clientes: si no, un servidor
+    # lanzado por stdio desde un agente con MCP_TRANSPORT=streamable-http arrancaría HTTP y el agente se quedaría esperando.
+    parser = argparse.ArgumentParser(description="Servidor MCP de datos financieros")
+    parser.add_argument("--transport", choices=("stdio", "streamable-http", "sse"),
+                        default=os.getenv("MCP_SERVER_TRANSPORT", "stdio"))
+    argumentos = parser.parse_args()
+    # La cookie y el crumb de Yahoo Finance se negocian ya, en segundo plano, para que la primera tool no los espere
+    if not fixtures_activas():
+        precalentar_en_segundo_plano()
+    mcp.run(transport=argumentos.transport)